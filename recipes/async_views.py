@@ -0,0 +1,124 @@
+"""
+Async versions of the read-only recipe endpoints, for ASGI deployments.
+
+These are plain Django async views rather than DRF views (DRF's views are
+sync only), so a request that's waiting on the database or on auth doesn't
+tie up a worker. They return the same data as their sync counterparts in
+`recipes/views.py`; writes, search and pagination stay on the sync API.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from recipes_api.authentication import aauthenticate
+
+from .cache import aload_recipe_detail, get_recipe_detail, load_recipe_detail
+from .conditional import aget_recipe_list_etag, get_not_modified_response, set_validators
+from .models import Recipe
+from .serializers import RecipeSerializer, RecipeSummarySerializer, RecipeTagSerializer
+from .tags import aget_tag_counts, get_count_params
+
+# Query params that are only supported by the sync recipes list
+SYNC_ONLY_PARAMS = ['q', 'cursor', 'page_size']
+
+
+def render(data, status=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+    )
+
+
+def not_authenticated():
+    return render(
+        {'detail': 'Authentication credentials were not provided.'},
+        status=status.HTTP_401_UNAUTHORIZED,
+    )
+
+
+async def recipe_list(request):
+    """
+    List the Recipes the current user has access to.
+    Supports the `tags`, `view` and `fields` query params.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    request.user = await aauthenticate(request)
+    if request.user is None:
+        return not_authenticated()
+    if any(param in request.GET for param in SYNC_ONLY_PARAMS):
+        return render(
+            {'detail': 'Search and pagination are only supported by /recipes/.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    queryset = request.user.get_recipes().order_by('name', 'id')
+    tags = request.GET.get('tags')
+    if tags:
+        queryset = queryset.filter(tags__slug__in=tags.split(',')).distinct()
+
+    etag = await aget_recipe_list_etag(request, queryset)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    serializer_class = RecipeSummarySerializer if request.GET.get('view') == 'summary' else RecipeSerializer
+    fields = request.GET.get('fields')
+    fields = ['id', *fields.split(',')] if fields else None
+    queryset = serializer_class.prepare_queryset(queryset, fields=fields)
+    recipes = [recipe async for recipe in queryset]
+
+    kwargs = {} if fields is None else {'fields': fields}
+    response = render(serializer_class(recipes, many=True, **kwargs).data)
+    response['ETag'] = etag
+    return response
+
+
+async def recipe_detail(request, pk):
+    """
+    Fetch a Recipe by its id or slug. Viewing a single Recipe is public,
+    and anonymous requests are served from the recipe detail cache.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    lookup = Recipe.get_lookup(pk)
+
+    request.user = await aauthenticate(request)
+    if request.user is None:
+        (field, value), = lookup.items()
+        detail = await sync_to_async(get_recipe_detail)(
+            field, value, lambda: load_recipe_detail(lookup)
+        )
+    else:
+        detail = await aload_recipe_detail(lookup)
+    if detail is None:
+        return render({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag, last_modified = detail['etag'], detail['last_modified']
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return set_validators(render(detail['data']), etag, last_modified)
+
+
+async def recipe_tags(request):
+    """
+    Fetch all RecipeTags for Recipes that the current user
+    has access to, with their counts.
+    Supports the `min_count` and `limit` query params.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    request.user = await aauthenticate(request)
+    if request.user is None:
+        return not_authenticated()
+    try:
+        min_count, limit = get_count_params(request.GET)
+    except ValueError as e:
+        return render({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    counts = await aget_tag_counts(request.user, min_count, limit)
+    return render(RecipeTagSerializer(counts, many=True).data)
@@ -0,0 +1,332 @@
+"""
+Synthetic datasets and a benchmark runner, for measuring the API's
+performance and comparing it across commits.
+
+`seed()` bulk inserts users, recipes with realistic text sizes, tags drawn
+from a Zipfian distribution, and a random sharing graph. `run()` drives
+the main endpoints through the test client and reports latency
+percentiles and query counts. Both are deterministic for a given seed.
+"""
+import platform
+import random
+import statistics
+import subprocess
+import time
+import uuid
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.text import slugify
+from rest_framework.authtoken.models import Token
+
+from .bulk import chunked
+from .factories import RecipeFactory, ShareConfigFactory
+from .models import Recipe, RecipeAccess, RecipeTag, ShareConfig, TaggedRecipe
+
+# Bench users' emails end with this, so they can be told apart (and cleared)
+EMAIL_DOMAIN = 'bench.test'
+
+WORDS = (
+    'apple basil bean beef braised broth butter cabbage caramel carrot cheese '
+    'chicken chickpea chili chocolate cinnamon coconut cream crispy cumin curry '
+    'dal egg fennel fig garlic ginger glazed green grilled herb honey kale lamb '
+    'leek lemon lentil lime maple miso mushroom mustard noodle oat olive onion '
+    'orange paprika parsley pasta peanut pear pepper pesto pork potato pumpkin '
+    'quick rice roasted rosemary saffron salad salmon sesame smoked soup spiced '
+    'spinach squash stew sweet tahini thyme toasted tofu tomato turmeric vanilla '
+    'walnut yogurt zucchini'
+).split()
+
+UNITS = ['g', 'ml', 'tbsp', 'tsp', 'cup', 'cups', 'cloves', 'pinch', '']
+
+VERBS = (
+    'add bake blend boil chop combine cook drain fold heat mix pour reduce '
+    'rest roast season serve simmer slice stir toss whisk'
+).split()
+
+
+def email(i):
+    return f'bench-{i}@{EMAIL_DOMAIN}'
+
+
+def bench_users():
+    return get_user_model().objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+class TextGenerator:
+    """
+    Generates recipe text sized like real recipes: a few words of name,
+    10 or so ingredient lines, a handful of instruction paragraphs, and
+    notes on about a third of recipes.
+    """
+    def __init__(self, rng):
+        self.rng = rng
+
+    def words(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def name(self):
+        return self.words(2, 6).capitalize()
+
+    def ingredients(self):
+        return '\n'.join(
+            f'{self.rng.randint(1, 500)} {self.rng.choice(UNITS)} {self.words(1, 3)}'.replace('  ', ' ')
+            for _ in range(self.rng.randint(5, 18))
+        )
+
+    def instructions(self):
+        return '\n\n'.join(
+            '. '.join(
+                f'{self.rng.choice(VERBS).capitalize()} the {self.words(1, 4)}'
+                for _ in range(self.rng.randint(2, 5))
+            ) + '.'
+            for _ in range(self.rng.randint(3, 9))
+        )
+
+    def notes(self):
+        if self.rng.random() > 0.35:
+            return ''
+        return self.words(10, 60)
+
+    def tag_names(self, count):
+        names = set()
+        while len(names) < count:
+            names.add(self.words(1, 2))
+        return sorted(names)
+
+
+def zipf_weights(count, exponent):
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def clear():
+    """
+    Deletes the bench users, and with them their recipes and shares.
+    """
+    user_ids = list(bench_users().values_list('pk', flat=True))
+    TaggedRecipe.objects.filter(
+        object_id__in=Recipe.objects.filter(author_id__in=user_ids).values('pk'),
+    ).delete()
+    bench_users().delete()
+    return len(user_ids)
+
+
+def seed(
+    users=100,
+    recipes_per_user=50,
+    fanout=3,
+    tags=200,
+    tags_per_recipe=3,
+    zipf_exponent=1.1,
+    batch_size=1000,
+    random_seed=0,
+    log=lambda message: None,
+):
+    """
+    Bulk inserts a dataset:
+    - `users` users, each with `recipes_per_user` recipes
+    - a vocabulary of `tags` tags, used with a Zipfian distribution, and
+      up to `tags_per_recipe` tags per recipe
+    - each user sharing with `fanout` random other users
+    Returns the number of rows inserted per model.
+    """
+    rng = random.Random(random_seed)
+    text = TextGenerator(rng)
+    counts = {}
+
+    User = get_user_model()
+    with transaction.atomic():
+        created = User.objects.bulk_create(
+            [User(username=email(i), email=email(i)) for i in range(users)],
+            batch_size=batch_size,
+        )
+        user_ids = list(
+            User.objects.filter(email__in=[user.email for user in created])
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        counts['users'] = len(user_ids)
+    log(f'{len(user_ids)} users')
+
+    names = text.tag_names(tags)
+    RecipeTag.objects.bulk_create(
+        [RecipeTag(name=name, slug=slugify(name)) for name in names],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    tag_ids = dict(RecipeTag.objects.filter(name__in=names).values_list('name', 'pk'))
+    vocabulary = [tag_ids[name] for name in names]
+    weights = zipf_weights(len(vocabulary), zipf_exponent)
+    counts['tags'] = len(vocabulary)
+    log(f'{len(vocabulary)} tags')
+
+    def recipes():
+        for user_id in user_ids:
+            for _ in range(recipes_per_user):
+                recipe = RecipeFactory.build(
+                    id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    author_id=user_id,
+                    name=text.name(),
+                    ingredients=text.ingredients(),
+                    instructions=text.instructions(),
+                    notes=text.notes(),
+                    active_time=f'{rng.randint(5, 60)} mins',
+                    total_time=f'{rng.randint(15, 240)} mins',
+                )
+                recipe.slug = Recipe.generate_slug(recipe.pk, recipe.name)
+                yield recipe
+
+    content_type = ContentType.objects.get_for_model(Recipe)
+    counts['recipes'] = counts['taggings'] = 0
+    for chunk in chunked(recipes(), batch_size):
+        taggings = []
+        for recipe in chunk:
+            tag_ids = set(rng.choices(vocabulary, weights, k=rng.randint(0, tags_per_recipe)))
+            taggings += [
+                TaggedRecipe(content_type=content_type, object_id=recipe.pk, tag_id=tag_id)
+                for tag_id in tag_ids
+            ]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(chunk)
+            TaggedRecipe.objects.bulk_create(taggings)
+        counts['recipes'] += len(chunk)
+        counts['taggings'] += len(taggings)
+        log(f'{counts["recipes"]} recipes')
+
+    pairs = set()
+    fanout = min(fanout, len(user_ids) - 1)
+    for granter_id in user_ids:
+        grantee_ids = set()
+        while len(grantee_ids) < fanout:
+            grantee_id = rng.choice(user_ids)
+            if grantee_id != granter_id:
+                grantee_ids.add(grantee_id)
+        pairs.update((granter_id, grantee_id) for grantee_id in grantee_ids)
+    ShareConfig.objects.bulk_create(
+        [ShareConfigFactory.build(granter_id=g, grantee_id=e) for g, e in sorted(pairs)],
+        batch_size=batch_size,
+    )
+    # bulk_create doesn't send the signals that maintain RecipeAccess
+    RecipeAccess.rebuild()
+    counts['shares'] = len(pairs)
+    log(f'{len(pairs)} shares')
+    return counts
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(len(values) * percent / 100 + 0.5) - 1)
+    return values[max(index, 0)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_scenarios(user, rng, samples=20):
+    """
+    Returns {name: (method, urls)} for each benchmarked endpoint. Requests
+    cycle through a sample of recipes (and tags), so they don't all hit
+    the same rows.
+    """
+    recipes = list(user.get_recipes().order_by('id').values_list('pk', 'slug'))
+    recipes = rng.sample(recipes, min(samples, len(recipes)))
+    tags = sorted(
+        RecipeTag.objects.filter(recipe__id__in=user.get_recipe_ids())
+        .values_list('slug', flat=True).distinct()
+    )
+    tags = rng.sample(tags, min(samples, len(tags)))
+
+    def detail(name, keys):
+        return [reverse(name, kwargs={'pk': key}) for key in keys]
+
+    return {
+        'list': ('get', [reverse('recipes-list')]),
+        'retrieve_by_id': ('get', detail('recipes-detail', [pk for pk, _ in recipes])),
+        'retrieve_by_slug': ('get', detail('recipes-detail', [slug for _, slug in recipes])),
+        'tag_list': ('get', [reverse('recipe-tags')]),
+        'tag_filter': ('get', [f'{reverse("recipes-list")}?tags={tag}' for tag in tags]),
+        'can_user_edit': ('get', detail('recipes-can-user-edit', [slug for _, slug in recipes])),
+        'copy': ('get', detail('recipes-copy-for-user', [pk for pk, _ in recipes])),
+    }
+
+
+def measure(client, method, urls, iterations, warmup):
+    durations = []
+    queries = []
+    statuses = set()
+    for i in range(warmup + iterations):
+        url = urls[i % len(urls)]
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            resp = getattr(client, method)(url)
+            duration = time.perf_counter() - start
+        if i >= warmup:
+            durations.append(duration * 1000)
+            queries.append(len(ctx.captured_queries))
+            statuses.add(resp.status_code)
+    return {
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p90_ms': round(percentile(durations, 90), 3),
+        'p99_ms': round(percentile(durations, 99), 3),
+        'mean_ms': round(statistics.mean(durations), 3),
+        'queries': max(queries),
+        'statuses': sorted(statuses),
+    }
+
+
+def run(user=None, iterations=50, warmup=5, only=None, random_seed=0):
+    """
+    Runs the benchmarks as `user` (by default, the bench user with the most
+    accessible recipes) and returns the results. Everything runs in a
+    transaction that's rolled back, so copies aren't kept.
+    """
+    rng = random.Random(random_seed)
+    results = {}
+    with transaction.atomic():
+        if user is None:
+            user = max(bench_users(), key=lambda u: u.get_recipes().count(), default=None)
+            if user is None:
+                raise ValueError('No bench users. Run seed_bench first.')
+        token, _ = Token.objects.get_or_create(user=user)
+        host = '127.0.0.1' if '*' in settings.ALLOWED_HOSTS else settings.ALLOWED_HOSTS[0]
+        client = Client(
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+            HTTP_HOST=host,
+            raise_request_exception=False,
+        )
+
+        dataset = {
+            'users': get_user_model().objects.count(),
+            'recipes': Recipe.objects.count(),
+            'tags': RecipeTag.objects.count(),
+            'shares': ShareConfig.objects.count(),
+            'user_recipes': user.get_recipes().count(),
+        }
+        for name, (method, urls) in get_scenarios(user, rng).items():
+            if only and name not in only:
+                continue
+            if not urls:
+                continue
+            results[name] = measure(client, method, urls, iterations, warmup)
+        transaction.set_rollback(True)
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'iterations': iterations,
+        'dataset': dataset,
+        'results': results,
+    }
@@ -0,0 +1,289 @@
+"""
+Bulk create, update and delete of recipes, for cookbook imports and
+syncing from the mobile client.
+
+Items are processed in chunks of RECIPES_BULK_BATCH_SIZE. Each chunk is
+written with a handful of queries (`bulk_create` / `bulk_update`, one
+RecipeTag insert and one TaggedRecipe insert) in its own transaction, so
+a large request never holds one long transaction open. Items that fail
+validation are reported by their index and don't stop the others.
+"""
+from itertools import islice
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_recipe_detail
+from .models import Recipe, RecipeTag, TaggedRecipe
+from .permissions import CanEditRecipe
+from .tags import invalidate_tag_counts
+
+
+class BulkResult:
+    """
+    Collects the outcome of every item in a bulk request.
+    """
+    def __init__(self, success_status=status.HTTP_200_OK):
+        self.success_status = success_status
+        self.results = []
+        self.errors = []
+
+    def add_result(self, index, recipe):
+        self.results.append({'index': index, 'id': str(recipe.pk), 'slug': recipe.slug})
+
+    def add_error(self, index, errors):
+        self.errors.append({'index': index, 'errors': errors})
+
+    @property
+    def status(self):
+        if not self.errors:
+            return self.success_status
+        if not self.results:
+            return status.HTTP_400_BAD_REQUEST
+        return status.HTTP_207_MULTI_STATUS
+
+    @property
+    def data(self):
+        def by_index(item):
+            return item['index']
+        return {
+            'results': sorted(self.results, key=by_index),
+            'errors': sorted(self.errors, key=by_index),
+        }
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of up to `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_id(item):
+    """
+    Returns the recipe id of a bulk update or delete item, which is either
+    an object with an `id` or (for deletes) just the id.
+    """
+    value = item.get('id') if isinstance(item, dict) else item
+    try:
+        return UUID(str(value))
+    except ValueError:
+        raise ValidationError({'id': ['A valid recipe id is required.']})
+
+
+def get_or_create_tags(names):
+    """
+    Returns a {name: RecipeTag} dict for `names`, inserting the missing
+    tags with a single query.
+    """
+    new_tags = []
+    for name in names:
+        tag = RecipeTag(name=name)
+        tag.slug = tag.slugify(name)
+        new_tags.append(tag)
+    RecipeTag.objects.bulk_create(new_tags, ignore_conflicts=True)
+
+    tags = {tag.name: tag for tag in RecipeTag.objects.filter(name__in=names)}
+    for name in set(names) - set(tags):
+        # The slug was taken by a differently spelled tag.
+        # taggit's save() picks a unique one.
+        tags[name] = RecipeTag.objects.create(name=name)
+    return tags
+
+
+def set_tags(recipe_tags, replace=False):
+    """
+    Tags recipes in bulk. `recipe_tags` maps Recipe pks to lists of tag
+    names. With `replace`, the recipes' existing tags are removed first.
+    """
+    if not recipe_tags:
+        return
+    invalidate_tag_counts(
+        Recipe.objects.filter(pk__in=list(recipe_tags)).values_list('author_id', flat=True).distinct()
+    )
+    content_type = ContentType.objects.get_for_model(Recipe)
+    if replace:
+        TaggedRecipe.objects.filter(
+            content_type=content_type,
+            object_id__in=list(recipe_tags),
+        ).delete()
+
+    names = {name for tag_names in recipe_tags.values() for name in tag_names}
+    if not names:
+        return
+    tags = get_or_create_tags(names)
+    TaggedRecipe.objects.bulk_create([
+        TaggedRecipe(content_type=content_type, object_id=pk, tag=tags[name])
+        for pk, tag_names in recipe_tags.items()
+        for name in dict.fromkeys(tag_names)
+    ])
+
+
+def validate(serializer, index, item, result):
+    """
+    Validates one item with the list serializer's child, recording
+    any errors. Returns the validated data, or None.
+    """
+    try:
+        return serializer.child.run_validation(item)
+    except ValidationError as exc:
+        result.add_error(index, exc.detail)
+        return None
+
+
+def save_chunk(indexes, result, save):
+    """
+    Runs `save` in a transaction. If the database rejects the chunk,
+    every item in it is reported as failed.
+    """
+    try:
+        with transaction.atomic():
+            save()
+        return True
+    except DatabaseError:
+        for index in indexes:
+            result.add_error(index, {'non_field_errors': ['Unable to save this recipe.']})
+        return False
+
+
+def bulk_create_recipes(serializer, items, author=None, batch_size=None, ids=None):
+    """
+    Creates a Recipe for every valid item. `serializer` is a
+    `RecipeSerializer(many=True)` for the request. If `author` is given it's
+    used instead of the serializer's `author` (for serializers without one).
+    `ids`, if given, are the new Recipes' ids, one per item. Items whose id
+    already exists were created by an earlier run, and are reported as
+    created without being inserted again.
+    """
+    result = BulkResult(success_status=status.HTTP_201_CREATED)
+    batch_size = batch_size or settings.RECIPES_BULK_BATCH_SIZE
+    for chunk in chunked(enumerate(items), batch_size):
+        created = []
+        recipe_tags = {}
+        for index, item in chunk:
+            data = validate(serializer, index, item, result)
+            if data is None:
+                continue
+            tag_names = data.pop('tags', [])
+            if author is not None:
+                data['author'] = author
+            if ids is not None:
+                data['id'] = ids[index]
+            recipe = Recipe(**data)
+            recipe.slug = Recipe.generate_slug(recipe.pk, recipe.name)
+            created.append((index, recipe))
+            recipe_tags[recipe.pk] = tag_names
+
+        if ids is not None and created:
+            existing = set(Recipe.objects.filter(
+                pk__in=[recipe.pk for _, recipe in created]
+            ).values_list('pk', flat=True))
+            for index, recipe in created:
+                if recipe.pk in existing:
+                    result.add_result(index, recipe)
+                    del recipe_tags[recipe.pk]
+            created = [(index, recipe) for index, recipe in created if recipe.pk not in existing]
+
+        def save():
+            Recipe.objects.bulk_create([recipe for _, recipe in created])
+            set_tags(recipe_tags)
+
+        if created and save_chunk([index for index, _ in created], result, save):
+            for index, recipe in created:
+                result.add_result(index, recipe)
+    return result
+
+
+def bulk_update_recipes(serializer, items, queryset):
+    """
+    Partially updates the Recipes in `queryset` identified by each item's
+    `id`. `serializer` is a `RecipeSerializer(many=True, partial=True)`.
+    Items with tags replace the recipe's tags. `queryset` is annotated by
+    `with_can_edit()`, and read-only recipes are reported as errors.
+    """
+    result = BulkResult()
+    for chunk in chunked(enumerate(items), settings.RECIPES_BULK_BATCH_SIZE):
+        ids = {}
+        for index, item in chunk:
+            try:
+                ids[index] = parse_id(item)
+            except ValidationError as exc:
+                result.add_error(index, exc.detail)
+        recipes = queryset.in_bulk(list(ids.values()))
+
+        updated = []
+        fields = {'updated_at'}
+        recipe_tags = {}
+        now = timezone.now()
+        for index, item in chunk:
+            if index not in ids:
+                continue
+            recipe = recipes.get(ids[index])
+            if recipe is None:
+                result.add_error(index, {'id': ['Not found.']})
+                continue
+            if not recipe.can_edit:
+                result.add_error(index, {'id': [CanEditRecipe.message]})
+                continue
+            data = validate(serializer, index, item, result)
+            if data is None:
+                continue
+            if 'tags' in data:
+                recipe_tags[recipe.pk] = data.pop('tags')
+            data.pop('author', None)
+            for name, value in data.items():
+                setattr(recipe, name, value)
+            recipe.updated_at = now
+            fields.update(data)
+            updated.append((index, recipe))
+
+        def save():
+            Recipe.objects.bulk_update([recipe for _, recipe in updated], fields)
+            set_tags(recipe_tags, replace=True)
+            invalidate_recipe_detail(*[recipe for _, recipe in updated])
+
+        if updated and save_chunk([index for index, _ in updated], result, save):
+            for index, recipe in updated:
+                result.add_result(index, recipe)
+    return result
+
+
+def bulk_delete_recipes(items, queryset):
+    """
+    Deletes the Recipes in `queryset` whose ids are listed in `items`.
+    `queryset` is annotated by `with_can_edit()`, and read-only recipes
+    are reported as errors.
+    """
+    result = BulkResult()
+    for chunk in chunked(enumerate(items), settings.RECIPES_BULK_BATCH_SIZE):
+        ids = {}
+        for index, item in chunk:
+            try:
+                ids[index] = parse_id(item)
+            except ValidationError as exc:
+                result.add_error(index, exc.detail)
+        recipes = queryset.only('id', 'slug').in_bulk(list(ids.values()))
+
+        deleted = []
+        for index, pk in ids.items():
+            if pk not in recipes:
+                result.add_error(index, {'id': ['Not found.']})
+            elif not recipes[pk].can_edit:
+                result.add_error(index, {'id': [CanEditRecipe.message]})
+            else:
+                deleted.append((index, recipes[pk]))
+
+        def save():
+            Recipe.objects.filter(pk__in=[recipe.pk for _, recipe in deleted]).delete()
+
+        if deleted and save_chunk([index for index, _ in deleted], result, save):
+            for index, recipe in deleted:
+                result.add_result(index, recipe)
+    return result
@@ -0,0 +1,189 @@
+"""
+Response cache for public (anonymous) recipe detail pages.
+
+Shared recipe links get bursts of anonymous traffic, so the serialized
+recipe and its validators are cached under both the recipe's id and its
+slug. Entries are invalidated when the recipe is saved, deleted or
+re-tagged, and when one of its tags or its author's email changes (see
+signals.py). They're filled from the primary database, so a lagging read
+replica can't cache a recipe's old version again.
+
+A miss is filled by a single caller ("single flight"): threads in the
+same process wait on a per-key lock, and other processes wait on a lock
+entry in the cache, so a stampede on a cold recipe costs one DB fetch.
+"""
+import threading
+import time
+import uuid
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from recipes_api.replicas import use_primary
+
+from .conditional import recipe_validators
+from . import slugs
+from .models import Recipe
+from .serializers import RecipeSerializer
+
+KEY_PREFIX = 'recipe-detail:'
+
+# How often waiters check whether the fetching process is done
+POLL_INTERVAL = 0.05
+
+_local_locks = weakref.WeakValueDictionary()
+_local_locks_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RECIPES_DETAIL_CACHE_ALIAS]
+
+
+def cache_key(field, value):
+    """
+    `field` is the field the recipe was looked up by, 'pk' or 'slug'.
+    """
+    return f'{KEY_PREFIX}{field}:{value}'
+
+
+def _local_lock(key):
+    with _local_locks_lock:
+        lock = _local_locks.get(key)
+        if lock is None:
+            lock = _local_locks[key] = threading.Lock()
+        return lock
+
+
+def recipe_detail_queryset():
+    return RecipeSerializer.prepare_queryset(
+        Recipe.objects.all(),
+        extra_columns=['updated_at'],
+    )
+
+
+def build_recipe_detail(recipe):
+    """
+    Builds the detail entry for a Recipe loaded by `recipe_detail_queryset()`.
+    """
+    etag, last_modified = recipe_validators(recipe)
+    return {
+        'pk': str(recipe.pk),
+        'slug': recipe.slug,
+        'data': dict(RecipeSerializer(recipe).data),
+        'etag': etag,
+        'last_modified': last_modified,
+    }
+
+
+def load_recipe_detail(lookup):
+    """
+    Returns the detail entry for the Recipe matching `lookup`, or None.
+    Reads from the request's database, see `get_recipe_detail()`.
+    """
+    recipe = recipe_detail_queryset().filter(**slugs.narrow(lookup)).first()
+    if recipe is None:
+        return None
+    slugs.remember(recipe)
+    return build_recipe_detail(recipe)
+
+
+async def aload_recipe_detail(lookup):
+    recipe = await recipe_detail_queryset().filter(**slugs.narrow(lookup)).afirst()
+    if recipe is None:
+        return None
+    slugs.remember(recipe)
+    return build_recipe_detail(recipe)
+
+
+def get_recipe_detail(field, value, fetch):
+    """
+    Returns the cached detail entry for the recipe with `field` == `value`,
+    calling `fetch()` to build it on a miss. `fetch` returns a dict with
+    at least `pk` and `slug`, or None if there's no such recipe.
+    Missing recipes aren't cached. The fetch that fills the cache reads
+    from the primary.
+    """
+    cache = get_cache()
+    key = cache_key(field, value)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+
+    with _local_lock(key):
+        # Another thread may have filled the entry while we waited
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+        lock_key = f'{key}:lock'
+        lock_timeout = settings.RECIPES_DETAIL_CACHE_LOCK_TIMEOUT
+        if not cache.add(lock_key, 1, lock_timeout):
+            # Another process is fetching. Wait for it to finish, and only
+            # fetch here if it didn't store anything (missing recipe) or
+            # its lock expired.
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry
+                if cache.get(lock_key) is None:
+                    break
+            return fetch()
+
+        try:
+            version = cache.get(version_key(key))
+            with use_primary():
+                entry = fetch()
+            if entry is not None:
+                set_recipe_detail(entry)
+                # If the recipe was invalidated while it was being fetched,
+                # the entry may be stale. The version is checked after
+                # storing the entry, so an invalidation that lands between
+                # the check and the store is caught too.
+                if cache.get(version_key(key)) != version:
+                    cache.delete_many(entry_keys(entry['pk'], entry['slug']))
+            return entry
+        finally:
+            cache.delete(lock_key)
+
+
+def version_key(key):
+    return f'{key}:version'
+
+
+def entry_keys(pk, slug):
+    return [cache_key('pk', pk), cache_key('slug', slug)]
+
+
+def set_recipe_detail(entry):
+    get_cache().set_many(
+        dict.fromkeys(entry_keys(entry['pk'], entry['slug']), entry),
+        settings.RECIPES_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_recipe_detail(*recipes):
+    """
+    Drops the cached detail entries of `recipes` once the current
+    transaction commits. Invalidating any earlier would let a concurrent
+    request cache the old version again. The entries' versions are
+    changed too, so requests that were fetching a recipe when it changed
+    don't store what they fetched (see `get_recipe_detail()`).
+    """
+    keys = []
+    for recipe in recipes:
+        keys += entry_keys(str(recipe.pk), recipe.slug)
+
+    def invalidate():
+        cache = get_cache()
+        version = uuid.uuid4().hex
+        cache.set_many(
+            {version_key(key): version for key in keys},
+            settings.RECIPES_DETAIL_CACHE_TIMEOUT,
+        )
+        cache.delete_many(keys)
+
+    transaction.on_commit(invalidate)
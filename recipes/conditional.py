@@ -0,0 +1,134 @@
+"""
+Validators for conditional GETs of recipes, so polling clients get a
+304 from a cheap aggregate query instead of a full payload.
+"""
+import hashlib
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Max, Subquery, Value
+from django.db.models.functions import JSONObject
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from users.models import User
+
+from .models import Recipe, RecipeAccess, TaggedRecipe
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def get_recipe_validators(queryset):
+    """
+    Returns (etag, last_modified) for the single Recipe in `queryset`,
+    or None if there isn't one, without loading the Recipe.
+    The ETag covers `updated_at` and the recipe's tags.
+    """
+    row = queryset.annotate(
+        tag_ids=ArrayAgg('tags__id'),
+    ).values_list('id', 'updated_at', 'tag_ids').first()
+    if row is None:
+        return None
+
+    recipe_id, updated_at, tag_ids = row
+    tag_ids = [tag_id for tag_id in tag_ids if tag_id is not None]
+    return _recipe_validators(recipe_id, updated_at, tag_ids)
+
+
+def recipe_validators(recipe):
+    """
+    Same as `get_recipe_validators()`, for a Recipe that's already loaded
+    (with its tags prefetched).
+    """
+    tag_ids = [tag.id for tag in recipe.tags.all()]
+    return _recipe_validators(recipe.id, recipe.updated_at, tag_ids)
+
+
+def _recipe_validators(recipe_id, updated_at, tag_ids):
+    etag = make_etag(str(recipe_id), updated_at.isoformat(), sorted(tag_ids))
+    return etag, updated_at
+
+
+def get_recipe_list_etag(request, queryset):
+    """
+    Returns an ETag for a list of recipes, built from aggregates that
+    change whenever the list's contents could:
+    - the number of recipes and the latest `updated_at` (adds, edits, deletes)
+    - the number of taggings and the newest one (tag changes)
+    - the number of users sharing with the user and the newest share
+      (grants and revokes)
+    The aggregates are selected with a single query. The request's full
+    path is included, since query params change which recipes and fields
+    are returned.
+    """
+    return _list_etag(request, _list_etag_aggregates(request.user, queryset).get())
+
+
+async def aget_recipe_list_etag(request, queryset):
+    """
+    Async version of `get_recipe_list_etag()`.
+    """
+    return _list_etag(request, await _list_etag_aggregates(request.user, queryset).aget())
+
+
+def _aggregate(queryset, **aggregates):
+    """
+    Returns a subquery selecting `aggregates` over all of `queryset`'s
+    rows, as a JSON object.
+    """
+    if queryset.query.is_sliced:
+        # Slices (search results) can't be reordered or aggregated over
+        # directly
+        queryset = Recipe.objects.filter(pk__in=queryset.values('pk'))
+    # Grouping by a constant keeps the aggregates from being grouped by pk
+    return Subquery(
+        queryset.order_by().annotate(all=Value(1)).values('all').values(
+            aggregates=JSONObject(**aggregates),
+        )
+    )
+
+
+def _list_etag_aggregates(user, queryset):
+    counts = {'count': Count('pk'), 'latest': Max('pk')}
+    return User.objects.filter(pk=user.pk).values(
+        recipes=_aggregate(
+            queryset,
+            # Tag filters join (and can repeat) recipes
+            count=Count('pk', distinct=queryset.query.distinct),
+            last_modified=Max('updated_at'),
+        ),
+        taggings=_aggregate(TaggedRecipe.objects.filter(object_id__in=user.get_recipe_ids()), **counts),
+        sharing=_aggregate(RecipeAccess.objects.filter(user_id=user.pk), **counts),
+    )
+
+
+def _list_etag(request, aggregates):
+    return make_etag(
+        request.user.pk,
+        request.get_full_path(),
+        sorted(aggregates['recipes'].items()),
+        sorted(aggregates['taggings'].items()),
+        sorted(aggregates['sharing'].items()),
+    )
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412) response if the client's copy of the recipe
+    is current, otherwise None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()),
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
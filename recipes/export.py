@@ -0,0 +1,45 @@
+"""
+Streams a user's recipe book as NDJSON, one recipe per line.
+
+Recipes are read through a server-side cursor and serialized a chunk at a
+time, with one query per chunk for the chunk's tags, so memory use stays
+flat however many recipes there are.
+"""
+from django.contrib.contenttypes.models import ContentType
+from rest_framework.utils.encoders import JSONEncoder
+
+from .bulk import chunked
+from .models import Recipe, TaggedRecipe
+from .serializers import RecipeSerializer
+
+
+def get_tag_names(recipe_ids):
+    """
+    Returns a {recipe id: [tag name, ...]} dict for `recipe_ids`.
+    """
+    tag_names = {recipe_id: [] for recipe_id in recipe_ids}
+    taggings = TaggedRecipe.objects.filter(
+        content_type=ContentType.objects.get_for_model(Recipe),
+        object_id__in=recipe_ids,
+    ).order_by('pk').values_list('object_id', 'tag__name')
+    for recipe_id, name in taggings:
+        tag_names[recipe_id].append(name)
+    return tag_names
+
+
+def iter_recipe_lines(queryset, chunk_size):
+    """
+    Yields the recipes in `queryset` as NDJSON lines.
+    """
+    fields = [name for name in RecipeSerializer.Meta.fields if name != 'tags']
+    queryset = RecipeSerializer.prepare_queryset(queryset, fields=fields)
+    encoder = JSONEncoder()
+
+    for recipes in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        tag_names = get_tag_names([recipe.pk for recipe in recipes])
+        serializer = RecipeSerializer(recipes, many=True, fields=fields)
+        lines = []
+        for recipe, data in zip(recipes, serializer.data):
+            data['tags'] = tag_names[recipe.pk]
+            lines.append(encoder.encode(data) + '\n')
+        yield ''.join(lines)
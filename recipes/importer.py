@@ -0,0 +1,220 @@
+"""
+Imports recipes from NDJSON files or files holding a JSON array of
+recipes, as written by the recipe export.
+
+Files are parsed incrementally, one recipe at a time, and imported in
+chunks (see `bulk_create_recipes`), so memory use is bounded by the chunk
+size rather than the file size. The byte offset after each committed
+chunk can be saved in a checkpoint, so an interrupted import can resume
+where it stopped. Checkpoints are saved after the chunk commits, so an
+import that resumes may import a chunk again; recipe ids derived from the
+import's id make that a no-op (see `import_recipes`).
+"""
+import codecs
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+from .bulk import bulk_create_recipes, chunked
+from .serializers import RecipeSerializer
+
+# Bytes read from the file at a time
+READ_SIZE = 64 * 1024
+
+# A single recipe larger than this (in characters) is rejected rather
+# than buffered
+MAX_ITEM_SIZE = 1024 * 1024
+
+# Only the first errors are kept in ImportStats.errors
+MAX_REPORTED_ERRORS = 100
+
+# Recipes are imported for a given author, so the serializer's `author`
+# (which defaults to the request's user) isn't used.
+IMPORT_FIELDS = [name for name in RecipeSerializer.Meta.fields if name != 'author']
+
+
+class RecipeFileError(Exception):
+    pass
+
+
+class RecipeFileReader:
+    """
+    Iterates over the recipes in a binary file object holding either NDJSON
+    or a JSON array. `offset` tracks the byte offset just past the last
+    recipe returned; pass it (and `in_array`) back in to resume reading.
+    """
+    def __init__(self, stream, offset=0, in_array=None, read_size=READ_SIZE):
+        self.stream = stream
+        self.offset = offset
+        # Whether the recipes are wrapped in a JSON array. Unknown until
+        # the start of the file has been read.
+        self.in_array = in_array
+        self.read_size = read_size
+        if offset:
+            stream.seek(offset)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        # When resuming, the last thing read was a recipe
+        self._after_item = bool(offset)
+
+    def _fill(self):
+        data = self.stream.read(self.read_size)
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(data, final=not data)
+        self._pos = 0
+        self._eof = not data
+
+    def _consume(self, end):
+        self.offset += len(self._buffer[self._pos:end].encode())
+        self._pos = end
+
+    def _peek(self):
+        """
+        Skips whitespace and returns the next character, or '' at the
+        end of the file.
+        """
+        while True:
+            end = json.decoder.WHITESPACE.match(self._buffer, self._pos).end()
+            self._consume(end)
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def _error(self, message):
+        raise RecipeFileError(f'{message} at byte {self.offset}')
+
+    def _decode(self):
+        while True:
+            try:
+                item, end = self._json.raw_decode(self._buffer, self._pos)
+                # A value that runs to the end of the buffer (like a number)
+                # might continue in the next read.
+                if end < len(self._buffer) or self._eof:
+                    self._consume(end)
+                    return item
+            except json.JSONDecodeError as exc:
+                if self._eof:
+                    self._error(f'Invalid JSON ({exc.msg})')
+            if len(self._buffer) - self._pos > MAX_ITEM_SIZE:
+                self._error('Recipe is too large')
+            self._fill()
+
+    def __iter__(self):
+        if self.in_array is None:
+            self.in_array = self._peek() == '['
+            if self.in_array:
+                self._consume(self._pos + 1)
+
+        while True:
+            char = self._peek()
+            if self.in_array:
+                if char == ']':
+                    self._consume(self._pos + 1)
+                    if self._peek():
+                        self._error('Unexpected data after the end of the array')
+                    return
+                if self._after_item:
+                    if char and char != ',':
+                        self._error('Expected "," or "]"')
+                    self._consume(self._pos + 1)
+                    char = self._peek()
+                if not char:
+                    self._error('Unexpected end of file, expected "]"')
+            elif not char:
+                return
+            yield self._decode()
+            self._after_item = True
+
+
+class ImportStats:
+    def __init__(self, imported=0, failed=0, clock=time.monotonic):
+        self.imported = imported
+        self.failed = failed
+        self.errors = []
+        # Rows processed by this run, for the import rate
+        self.rows = 0
+        self._clock = clock
+        self._started = clock()
+
+    def add(self, result, first_item):
+        """
+        Adds a chunk's BulkResult. `first_item` is the chunk's position
+        in the file, so errors report which recipe they're about.
+        """
+        self.imported += len(result.results)
+        self.failed += len(result.errors)
+        self.rows += len(result.results) + len(result.errors)
+        for error in result.errors:
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({
+                    'item': first_item + error['index'],
+                    'errors': error['errors'],
+                })
+
+    @property
+    def rate(self):
+        """
+        Rows processed per second.
+        """
+        elapsed = self._clock() - self._started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+class Checkpoint:
+    """
+    Saves the progress of an import to a JSON file. Saves are atomic, so a
+    checkpoint is never left half written.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, **state):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def import_recipes(reader, author, batch_size=None, stats=None, on_chunk=None, import_id=None):
+    """
+    Imports the recipes from a RecipeFileReader for `author`, one
+    transaction per `batch_size` recipes. `on_chunk(stats)` is called after
+    each chunk commits, when `reader.offset` is just past the chunk.
+
+    With an `import_id` (a UUID kept for the whole import of a file), each
+    recipe's id is derived from it and the recipe's position in the file,
+    so a resumed import skips the recipes it already created.
+    """
+    batch_size = batch_size or settings.RECIPES_BULK_BATCH_SIZE
+    serializer = RecipeSerializer(many=True, fields=IMPORT_FIELDS)
+    stats = stats or ImportStats()
+    for items in chunked(reader, batch_size):
+        first_item = stats.imported + stats.failed
+        ids = None
+        if import_id is not None:
+            ids = [uuid.uuid5(import_id, str(first_item + i)) for i in range(len(items))]
+        result = bulk_create_recipes(serializer, items, author=author, batch_size=batch_size, ids=ids)
+        stats.add(result, first_item=first_item)
+        if on_chunk is not None:
+            on_chunk(stats)
+    return stats
@@ -0,0 +1,21 @@
+from django.db.models import Lookup
+
+
+class IPrefix(Lookup):
+    """
+    Case-insensitive prefix match, compiled to `ILIKE 'value%'`.
+
+    Unlike `istartswith` (which compiles to `UPPER(col) LIKE UPPER(...)`),
+    this can be answered by a pg_trgm GIN index on the column.
+    Pass the value through `connection.ops.prep_for_like_query()` first.
+    """
+    lookup_name = 'iprefix'
+
+    def process_rhs(self, compiler, connection):
+        rhs, params = super().process_rhs(compiler, connection)
+        return rhs, [f'{param}%' for param in params]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
@@ -0,0 +1,94 @@
+import os
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importer import Checkpoint, ImportStats, RecipeFileError, RecipeFileReader, import_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Import recipes for a user from an NDJSON or JSON array file. '
+        'Progress is checkpointed, and re-running an interrupted import '
+        'resumes it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or JSON file to import.')
+        parser.add_argument('--author', required=True, help='Email of the user to import recipes for.')
+        parser.add_argument('--batch-size', type=int, help='Recipes imported per transaction.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file to save progress in. Defaults to PATH.checkpoint.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and import the whole file.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            author = get_user_model().objects.get(email=options['author'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["author"]}')
+
+        checkpoint = Checkpoint(options['checkpoint'] or f'{path}.checkpoint')
+        state = None if options['restart'] else checkpoint.load()
+        size = os.path.getsize(path)
+        if state is not None:
+            if state['size'] != size:
+                raise CommandError(
+                    f'{path} changed since the checkpoint in {checkpoint.path} '
+                    'was saved. Use --restart to import it from the start.'
+                )
+            self.stdout.write(
+                f'Resuming from byte {state["offset"]} '
+                f'({state["imported"]} imported, {state["failed"]} failed).'
+            )
+        state = state or {'offset': 0, 'in_array': None, 'imported': 0, 'failed': 0}
+        if 'import_id' not in state:
+            # Saved before anything is imported, so a chunk that commits
+            # before its checkpoint is saved isn't imported twice on resume
+            state['import_id'] = uuid.uuid4().hex
+            checkpoint.save(**{**state, 'size': size})
+        import_id = uuid.UUID(state['import_id'])
+
+        def on_chunk(stats):
+            checkpoint.save(
+                size=size,
+                offset=reader.offset,
+                in_array=reader.in_array,
+                imported=stats.imported,
+                failed=stats.failed,
+                import_id=import_id.hex,
+            )
+            self.stdout.write(
+                f'{stats.imported} imported, {stats.failed} failed '
+                f'({stats.rate:.0f} rows/s, {reader.offset / size:.0%})'
+            )
+
+        with open(path, 'rb') as f:
+            reader = RecipeFileReader(f, offset=state['offset'], in_array=state['in_array'])
+            stats = ImportStats(imported=state['imported'], failed=state['failed'])
+            try:
+                import_recipes(
+                    reader,
+                    author,
+                    batch_size=options['batch_size'],
+                    stats=stats,
+                    on_chunk=on_chunk,
+                    import_id=import_id,
+                )
+            except RecipeFileError as e:
+                raise CommandError(f'{path}: {e}. Fix the file and re-run to resume.')
+
+        for error in stats.errors:
+            self.stderr.write(f'Recipe {error["item"]}: {error["errors"]}')
+        checkpoint.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats.imported} recipes ({stats.failed} failed) '
+            f'at {stats.rate:.0f} rows/s.'
+        ))
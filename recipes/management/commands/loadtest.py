@@ -0,0 +1,96 @@
+import statistics
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+
+def percentile(latencies, percent):
+    """
+    Returns the `percent` percentile of a sorted list of latencies.
+    """
+    if not latencies:
+        return 0.0
+    index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+    return latencies[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent GET requests to a URL for a while, and report the '
+        'throughput and latency. Used to compare the sync and async views '
+        'under the WSGI and ASGI servers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='+', help='URL(s) to request, in turn.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run for.')
+        parser.add_argument('--timeout', type=float, default=30, help='Request timeout, in seconds.')
+        parser.add_argument(
+            '--token',
+            help='API token to authenticate with. Sent as "Token TOKEN", '
+                 'or as is if it starts with "Bearer ".',
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        token = options['token']
+        if token:
+            headers['Authorization'] = token if token.startswith('Bearer ') else f'Token {token}'
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def client(offset):
+            urls = options['url']
+            session = requests.Session()
+            session.headers.update(headers)
+            i = offset
+            while time.monotonic() < deadline:
+                url = urls[i % len(urls)]
+                i += 1
+                start = time.monotonic()
+                try:
+                    resp = session.get(url, timeout=options['timeout'])
+                    error = None if resp.status_code < 400 else f'HTTP {resp.status_code}'
+                except requests.RequestException as e:
+                    error = type(e).__name__
+                elapsed = time.monotonic() - start
+                with lock:
+                    if error is None:
+                        latencies.append(elapsed)
+                    else:
+                        errors.append(error)
+
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=client, args=(i,), daemon=True)
+            for i in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        self.stdout.write(
+            f'{len(latencies)} requests in {elapsed:.1f}s '
+            f'with {options["concurrency"]} clients: '
+            f'{len(latencies) / elapsed:.1f} req/s'
+        )
+        if latencies:
+            self.stdout.write(
+                'latency (ms): '
+                f'mean {statistics.mean(latencies) * 1000:.0f}, '
+                f'p50 {percentile(latencies, 50) * 1000:.0f}, '
+                f'p95 {percentile(latencies, 95) * 1000:.0f}, '
+                f'p99 {percentile(latencies, 99) * 1000:.0f}'
+            )
+        if errors:
+            counts = {error: errors.count(error) for error in set(errors)}
+            self.stderr.write(f'{len(errors)} errors: {counts}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import RecipeAccess
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized RecipeAccess table from ShareConfig.'
+
+    def handle(self, *args, **options):
+        RecipeAccess.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {RecipeAccess.objects.count()} recipe access rows.'
+        ))
@@ -0,0 +1,62 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import bench, replay
+from recipes_api.traffic import read_capture
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay traffic captured with TRAFFIC_CAPTURE_PATH against a running '
+        'server, or through the test client. Captured users and recipes are '
+        'mapped onto the seed_bench dataset. Prints throughput, error rates '
+        'and latencies as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('captures', nargs='+', help='Capture files, replayed in timestamp order.')
+        parser.add_argument('--url', help='Base URL of a running server. Defaults to the test client.')
+        parser.add_argument(
+            '--speed', type=float, default=1,
+            help='Replay this many times faster than captured. 0 sends requests as fast as possible.',
+        )
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of concurrent clients.')
+        parser.add_argument('--read-only', action='store_true', help='Only replay GET, HEAD and OPTIONS requests.')
+        parser.add_argument('--limit', type=int, help='Only replay this many requests.')
+        parser.add_argument('--users', nargs='+', help='Emails of the users to map onto. Defaults to bench users.')
+        parser.add_argument('--output', help='Write the report to this file.')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError('--speed must be 0 or more')
+        if options['users']:
+            users = get_user_model().objects.filter(email__in=options['users'])
+        else:
+            users = bench.bench_users()
+        users = list(users.order_by('pk'))
+        if not users:
+            raise CommandError('No users to replay as. Run seed_bench first, or pass --users.')
+
+        records = sorted(
+            (record for path in options['captures'] for record in read_capture(path)),
+            key=lambda record: record['ts'],
+        )[:options['limit']]
+        if not records:
+            raise CommandError('No requests in the capture files')
+
+        requests = replay.prepare(records, users, read_only=options['read_only'])
+        target = replay.HTTPTarget(options['url']) if options['url'] else replay.ClientTarget()
+        report = replay.replay(
+            requests,
+            target,
+            speed=options['speed'],
+            concurrency=options['concurrency'],
+        )
+
+        output = json.dumps(report.as_dict(), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
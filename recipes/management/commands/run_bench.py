@@ -0,0 +1,64 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the main recipe endpoints against the seed_bench dataset, '
+        'through the test client. Prints latency percentiles and query '
+        'counts as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per benchmark.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per benchmark.')
+        parser.add_argument('--only', nargs='+', help='Benchmarks to run.')
+        parser.add_argument('--user', help='Email of the user to run as. Defaults to a bench user.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument('--output', help='Write the results to this file.')
+        parser.add_argument('--compare', help='Results file from an earlier run, to show changes against.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {options["user"]}')
+
+        try:
+            report = bench.run(
+                user=user,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['only'],
+                random_seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.write_comparison(baseline, report)
+
+    def write_comparison(self, baseline, report):
+        for name, result in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0
+            self.stderr.write(
+                f'{name}: p50 {before["p50_ms"]:.2f}ms -> {result["p50_ms"]:.2f}ms ({change:+.0%}), '
+                f'queries {before["queries"]} -> {result["queries"]}'
+            )
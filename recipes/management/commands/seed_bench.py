@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset for benchmarking: users, recipes with '
+        'realistic text, Zipf-distributed tags and a sharing graph. '
+        f'Bench users have @{bench.EMAIL_DOMAIN} emails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=50)
+        parser.add_argument('--fanout', type=int, default=3, help='Users each user shares with.')
+        parser.add_argument('--tags', type=int, default=200, help='Size of the tag vocabulary.')
+        parser.add_argument('--tags-per-recipe', type=int, default=3, help='Most tags on a recipe.')
+        parser.add_argument('--zipf-exponent', type=float, default=1.1, help='Skew of tag popularity.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument('--clear', action='store_true', help='Delete an existing bench dataset first.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f'Deleted {bench.clear()} bench users.')
+        elif bench.bench_users().exists():
+            raise CommandError('A bench dataset already exists. Use --clear to replace it.')
+
+        start = time.monotonic()
+        counts = bench.seed(
+            users=options['users'],
+            recipes_per_user=options['recipes_per_user'],
+            fanout=options['fanout'],
+            tags=options['tags'],
+            tags_per_recipe=options['tags_per_recipe'],
+            zipf_exponent=options['zipf_exponent'],
+            batch_size=options['batch_size'],
+            random_seed=options['seed'],
+            log=self.stdout.write,
+        )
+        elapsed = time.monotonic() - start
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {elapsed:.1f}s.'))
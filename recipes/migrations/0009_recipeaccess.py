@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_recipe_access(apps, schema_editor):
+    ShareConfig = apps.get_model('recipes', 'ShareConfig')
+    RecipeAccess = apps.get_model('recipes', 'RecipeAccess')
+
+    pairs = set()
+    for granter_id, grantee_id in ShareConfig.objects.values_list('granter_id', 'grantee_id'):
+        if granter_id != grantee_id:
+            pairs.add((granter_id, grantee_id))
+            pairs.add((grantee_id, granter_id))
+
+    RecipeAccess.objects.bulk_create(
+        [RecipeAccess(user_id=u, author_id=a) for u, a in pairs],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_remove_recipe_recipes_rec_public__59482a_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'author'), name='unique_recipe_access')],
+            },
+        ),
+        migrations.RunPython(populate_recipe_access, migrations.RunPython.noop),
+    ]
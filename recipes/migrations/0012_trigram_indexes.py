@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='recipe_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='recipetag_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
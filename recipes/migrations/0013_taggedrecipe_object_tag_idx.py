@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taggedrecipe',
+            index=models.Index(fields=['object_id', 'tag'], name='taggedrecipe_object_tag_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:20
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def populate_can_edit(apps, schema_editor):
+    ShareConfig = apps.get_model('recipes', 'ShareConfig')
+    RecipeAccess = apps.get_model('recipes', 'RecipeAccess')
+
+    # The author's grant to the user decides; a grant only the other way
+    # applies both ways
+    granted = ShareConfig.objects.filter(granter_id=OuterRef('author_id'), grantee_id=OuterRef('user_id'))
+    received = ShareConfig.objects.filter(granter_id=OuterRef('user_id'), grantee_id=OuterRef('author_id'))
+    RecipeAccess.objects.update(can_edit=(
+        Exists(granted.filter(role='Editor'))
+        | (~Exists(granted) & Exists(received.filter(role='Editor')))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_taggedrecipe_object_tag_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeaccess',
+            name='can_edit',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(populate_can_edit, migrations.RunPython.noop),
+    ]
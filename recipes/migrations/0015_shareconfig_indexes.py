@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+def delete_duplicate_share_configs(apps, schema_editor):
+    """
+    Keeps one ShareConfig per (granter, grantee), preferring an Editor one
+    so nobody loses edit access (see RecipeAccess.can_edit).
+    """
+    ShareConfig = apps.get_model('recipes', 'ShareConfig')
+
+    kept = {}
+    duplicate_ids = []
+    for pk, granter_id, grantee_id, role in ShareConfig.objects.order_by('pk').values_list(
+        'pk', 'granter_id', 'grantee_id', 'role'
+    ).iterator():
+        pair = (granter_id, grantee_id)
+        if pair not in kept:
+            kept[pair] = (pk, role)
+        elif role == 'Editor' and kept[pair][1] != 'Editor':
+            duplicate_ids.append(kept[pair][0])
+            kept[pair] = (pk, role)
+        else:
+            duplicate_ids.append(pk)
+    ShareConfig.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipeaccess_can_edit'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_share_configs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shareconfig',
+            constraint=models.UniqueConstraint(fields=('granter', 'grantee'), name='unique_share_config'),
+        ),
+        migrations.AddIndex(
+            model_name='shareconfig',
+            index=models.Index(fields=['grantee', 'granter'], name='shareconfig_grantee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'name', 'id'], name='recipe_author_name_id_idx'),
+        ),
+    ]
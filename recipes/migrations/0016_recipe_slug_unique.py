@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_slugs(apps, schema_editor):
+    """
+    Gives every Recipe sharing a slug with an older one a numbered suffix,
+    keeping the id prefix that slugs start with.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    max_length = Recipe._meta.get_field('slug').max_length
+
+    duplicates = Recipe.objects.values('slug').annotate(count=Count('*')).filter(count__gt=1)
+    for slug in duplicates.values_list('slug', flat=True):
+        recipes = list(Recipe.objects.filter(slug=slug).order_by('created_at', 'pk'))
+        for recipe in recipes[1:]:
+            n = 2
+            while True:
+                suffix = f'-{n}'
+                candidate = slug[:max_length - len(suffix)] + suffix
+                if not Recipe.objects.filter(slug=candidate).exists():
+                    break
+                n += 1
+            Recipe.objects.filter(pk=recipe.pk).update(slug=candidate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_shareconfig_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=75, unique=True),
+        ),
+    ]
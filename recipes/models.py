@@ -1,8 +1,10 @@
 import uuid
 
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils.text import slugify
 from taggit.managers import TaggableManager
 from taggit.models import GenericUUIDTaggedItemBase, TagBase, TaggedItemBase
@@ -16,6 +18,10 @@ class RecipeTag(TagBase):
     class Meta:
         verbose_name = "Tag"
         verbose_name_plural = "Tags"
+        indexes = [
+            # Backs tag autocomplete
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='recipetag_name_trgm_idx'),
+        ]
 
 
 class TaggedRecipe(GenericUUIDTaggedItemBase, TaggedItemBase):
@@ -25,6 +31,12 @@ class TaggedRecipe(GenericUUIDTaggedItemBase, TaggedItemBase):
         related_name="%(app_label)s_%(class)s_items",
     )
 
+    class Meta:
+        indexes = [
+            # Lets tag counts over a set of recipes be read from the index alone
+            models.Index(fields=['object_id', 'tag'], name='taggedrecipe_object_tag_idx'),
+        ]
+
 
 class Recipe(models.Model):
     id = models.UUIDField(
@@ -39,7 +51,7 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
-    slug = models.SlugField(blank=True, max_length=75, db_index=True)
+    slug = models.SlugField(blank=True, max_length=75, unique=True)
     ingredients = models.TextField(blank=True)
     instructions = models.TextField(blank=True)
     notes = models.TextField(blank=True)
@@ -49,10 +61,35 @@ class Recipe(models.Model):
     total_time = models.CharField(max_length=25, blank=True)
     servings = models.CharField(max_length=25, blank=True)
     tags = TaggableManager(blank=True, through=TaggedRecipe)
+    # Maintained by a database trigger (see migration 0011) from
+    # `name`, `ingredients`, `instructions` and `notes`.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the recipes list
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+            # Backs listing the recipes of a set of authors, in list order
+            models.Index(fields=['author', 'name', 'id'], name='recipe_author_name_id_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+            # Backs recipe name autocomplete
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='recipe_name_trgm_idx'),
+        ]
 
     @staticmethod
     def generate_slug(recipe_pk, recipe_name):
-        return f'{str(recipe_pk)[:8]}-{slugify(recipe_name)}'
+        slug = f'{str(recipe_pk)[:8]}-{slugify(recipe_name)}'
+        return slug[:Recipe._meta.get_field('slug').max_length]
+
+    @staticmethod
+    def get_lookup(id_or_slug):
+        """
+        Returns the filter kwargs for finding a Recipe by its id or its slug.
+        """
+        try:
+            return {'pk': str(uuid.UUID(id_or_slug))}
+        except ValueError:
+            return {'slug': id_or_slug}
 
     def save(self, *args, **kwargs):
         # TODO: test slug is set correctly
@@ -62,30 +99,57 @@ class Recipe(models.Model):
 
     @staticmethod
     def copy_for_user(recipe_id, user_id):
-        # TODO: might want to also copy over recipe.tags
-        recipe = Recipe.objects.get(pk=recipe_id)
-        user = get_user_model().objects.get(pk=user_id)
-
-        # Copy the model instance
-        # See: https://docs.djangoproject.com/en/4.0/topics/db/queries/#copying-model-instances
-        recipe.pk = uuid.uuid4()
-        recipe.author = user
-        recipe.slug = Recipe.generate_slug(recipe.pk, recipe.name)
-        recipe._state.adding = True
-        recipe.save()
-        return recipe
-
+        """
+        Copies the Recipe with the given id or slug to the given user.
+        Raises Recipe.DoesNotExist if there's no such Recipe.
+        """
+        lookup = Recipe.get_lookup(str(recipe_id))
+        copies = Recipe.copy_many_for_user(Recipe.objects.filter(**lookup), user_id)
+        if not copies:
+            raise Recipe.DoesNotExist
+        return copies[0]
 
     @staticmethod
-    def can_user_edit_recipe(recipe_id, user_id):
-        recipe_author_id = Recipe.objects.filter(
-            slug=recipe_id
-        ).values_list('author_id', flat=True).get()
+    def copy_many_for_user(recipes, user_id):
+        """
+        Copies `recipes` (a queryset or list of Recipes), and their tags,
+        to the given user.
+        Returns the copies, each with a `copied_from` attribute set to the
+        original's pk. The copies are inserted with one query, and so are
+        their tags.
+        """
+        recipes = list(recipes)
+        if not recipes:
+            return []
+        taggings = TaggedRecipe.objects.filter(
+            content_type=ContentType.objects.get_for_model(Recipe),
+            object_id__in=[recipe.pk for recipe in recipes],
+        ).values_list('object_id', 'tag_id')
 
-        if recipe_author_id == user_id:
-            return True
+        copies = {}
+        for recipe in recipes:
+            # See: https://docs.djangoproject.com/en/4.0/topics/db/queries/#copying-model-instances
+            recipe.copied_from = recipe.pk
+            recipe.pk = uuid.uuid4()
+            recipe.author_id = user_id
+            recipe.slug = Recipe.generate_slug(recipe.pk, recipe.name)
+            recipe._state.adding = True
+            copies[recipe.copied_from] = recipe
 
-        return ShareConfig.sharing_exists(recipe_author_id, user_id)
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            TaggedRecipe.objects.bulk_create([
+                TaggedRecipe(
+                    content_type=ContentType.objects.get_for_model(Recipe),
+                    object_id=copies[object_id].pk,
+                    tag_id=tag_id,
+                )
+                for object_id, tag_id in taggings
+            ])
+        # Imported here, as recipes.tags depends on this module
+        from .tags import invalidate_tag_counts
+        invalidate_tag_counts([user_id])
+        return recipes
 
     def __str__(self):
         return f'Recipe <{self.name}>'
@@ -119,12 +183,127 @@ class ShareConfig(models.Model):
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=EDITOR)
 
+    class Meta:
+        constraints = [
+            # Also backs lookups by granter, and by (granter, grantee)
+            models.UniqueConstraint(
+                fields=['granter', 'grantee'],
+                name='unique_share_config',
+            ),
+        ]
+        indexes = [
+            # The same lookups the other way around, since sharing works
+            # in both directions
+            models.Index(fields=['grantee', 'granter'], name='shareconfig_grantee_idx'),
+        ]
+
     @staticmethod
-    def sharing_exists(user_1_id, user_2_id):
+    def between(user_1_id, user_2_id):
         """
-        Check if user_1 has access to user_2's recipes, and vice versa.
+        ShareConfigs between two users, in either direction.
         """
         return ShareConfig.objects.filter(
             (models.Q(granter_id=user_1_id) & models.Q(grantee_id=user_2_id))
             | (models.Q(granter_id=user_2_id) & models.Q(grantee_id=user_1_id))
-        ).exists()
+        )
+
+    @staticmethod
+    def sharing_exists(user_1_id, user_2_id):
+        """
+        Check if user_1 has access to user_2's recipes, and vice versa.
+        """
+        return ShareConfig.between(user_1_id, user_2_id).exists()
+
+
+class RecipeAccess(models.Model):
+    """
+    Denormalized view of ShareConfig, with a row for every (user, author)
+    pair where `user` can access `author`'s recipes through sharing.
+    Sharing works in both directions, so each ShareConfig produces two rows.
+    `can_edit` follows the role `author` granted `user`. When only `user`
+    granted `author` access, that grant's role applies both ways.
+
+    Kept in sync by the ShareConfig signals in `recipes.signals`, and can be
+    rebuilt from scratch with `manage.py rebuild_recipe_access`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='recipe_access',
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    can_edit = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_recipe_access',
+            ),
+        ]
+
+    @staticmethod
+    def sync_pair(user_1_id, user_2_id):
+        """
+        Make the access rows between two users match their ShareConfigs.
+        """
+        if user_1_id == user_2_id:
+            return
+
+        roles = dict(ShareConfig.between(user_1_id, user_2_id).values_list('granter_id', 'role'))
+        if roles:
+            RecipeAccess.objects.bulk_create(
+                [
+                    RecipeAccess(
+                        user_id=user_1_id,
+                        author_id=user_2_id,
+                        can_edit=roles.get(user_2_id, roles.get(user_1_id)) == ShareConfig.EDITOR,
+                    ),
+                    RecipeAccess(
+                        user_id=user_2_id,
+                        author_id=user_1_id,
+                        can_edit=roles.get(user_1_id, roles.get(user_2_id)) == ShareConfig.EDITOR,
+                    ),
+                ],
+                update_conflicts=True,
+                unique_fields=['user', 'author'],
+                update_fields=['can_edit'],
+            )
+        else:
+            RecipeAccess.objects.filter(
+                (models.Q(user_id=user_1_id) & models.Q(author_id=user_2_id))
+                | (models.Q(user_id=user_2_id) & models.Q(author_id=user_1_id))
+            ).delete()
+
+    @staticmethod
+    def rebuild():
+        """
+        Recreate every access row from ShareConfig.
+        """
+        roles = {
+            (grantee_id, granter_id): role
+            for granter_id, grantee_id, role in ShareConfig.objects.values_list(
+                'granter_id', 'grantee_id', 'role'
+            ).iterator()
+            if granter_id != grantee_id
+        }
+        # Keyed by (user, author), like the rows
+        pairs = {}
+        for user_id, author_id in roles:
+            for pair in [(user_id, author_id), (author_id, user_id)]:
+                role = roles.get(pair, roles.get(pair[::-1]))
+                pairs[pair] = role == ShareConfig.EDITOR
+
+        with transaction.atomic():
+            RecipeAccess.objects.all().delete()
+            RecipeAccess.objects.bulk_create(
+                [
+                    RecipeAccess(user_id=u, author_id=a, can_edit=can_edit)
+                    for (u, a), can_edit in pairs.items()
+                ],
+                batch_size=1000,
+            )
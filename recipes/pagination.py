@@ -0,0 +1,141 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from uuid import UUID
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RecipeCursorPagination(BasePagination):
+    """
+    Keyset pagination over (name, id).
+
+    Unlike OFFSET based paging, every page is a range scan on the
+    (name, id) index that starts right after the previous page, so deep
+    pages cost the same as the first one. Cursors are opaque to clients.
+
+    Pagination is opt-in: it's only applied when the request includes a
+    `cursor` or `page_size` query param, so existing clients keep getting
+    a plain list.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            self.reverse = False
+            queryset = queryset.order_by('name', 'id')
+        else:
+            name, pk, self.reverse = cursor
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(name__lt=name) | (Q(name=name) & Q(id__lt=pk))
+                ).order_by('-name', '-id')
+            else:
+                queryset = queryset.filter(
+                    Q(name__gt=name) | (Q(name=name) & Q(id__gt=pk))
+                ).order_by('name', 'id')
+
+        # Fetch one extra row to find out if there's another page
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        self.has_next = has_more if not self.reverse else cursor is not None
+        self.has_previous = has_more if self.reverse else cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=settings.RECIPES_MAX_PAGE_SIZE,
+            )
+        except (KeyError, ValueError):
+            return settings.RECIPES_PAGE_SIZE
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            name, pk, reverse = json.loads(urlsafe_b64decode(encoded.encode()))
+            pk = UUID(pk)
+        except (TypeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(name, str):
+            raise NotFound(self.invalid_cursor_message)
+        return name, pk, bool(reverse)
+
+    def encode_cursor(self, recipe, reverse):
+        data = json.dumps([recipe.name, str(recipe.pk), int(reverse)])
+        encoded = urlsafe_b64encode(data.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
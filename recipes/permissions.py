@@ -0,0 +1,44 @@
+"""
+Who can edit a Recipe: its author, and users it's shared with by an
+Editor ShareConfig (see RecipeAccess.can_edit). Anyone can view a single
+Recipe, and lists only include the Recipes a user has access to (see
+User.get_recipes()).
+
+Edit access is resolved in the same query that fetches the Recipes, with
+an EXISTS subquery on RecipeAccess.
+"""
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .models import RecipeAccess
+
+
+def can_edit_recipe(user):
+    """
+    Returns a condition that's true for the Recipes `user` can edit.
+    """
+    return Q(author_id=user.pk) | Exists(RecipeAccess.objects.filter(
+        user_id=user.pk,
+        author_id=OuterRef('author_id'),
+        can_edit=True,
+    ))
+
+
+def with_can_edit(queryset, user):
+    """
+    Annotates each Recipe in `queryset` with whether `user` can edit it.
+    """
+    return queryset.annotate(
+        can_edit=ExpressionWrapper(can_edit_recipe(user), output_field=BooleanField()),
+    )
+
+
+class CanEditRecipe(BasePermission):
+    """
+    Allows writes to Recipes annotated by `with_can_edit()` for users who
+    can edit them.
+    """
+    message = 'You do not have permission to edit this recipe.'
+
+    def has_object_permission(self, request, view, obj):
+        return request.method in SAFE_METHODS or obj.can_edit
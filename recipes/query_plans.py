@@ -0,0 +1,59 @@
+"""
+Checks that the API's hot queries are answered from indexes.
+
+`sequential_scans()` runs EXPLAIN on a query with sequential scans
+disabled, so on any dataset (even a small one, where reading a whole table
+would be cheaper) the planner only falls back to one when no index can
+serve the query. `get_hot_queries()` returns the queries behind the
+recipes list and detail, access checks and tag counts.
+"""
+import json
+
+from django.db import connections, router, transaction
+
+from .models import Recipe, RecipeAccess, ShareConfig
+from .permissions import with_can_edit
+from .tags import tag_counts_queryset
+
+
+def get_hot_queries(user, other_user, recipe):
+    """
+    Returns {name: queryset} for the hot queries, as run by `user`.
+    `other_user` is someone `user` shares with, and `recipe` one of
+    `user`'s recipes.
+    """
+    return {
+        'recipe_list': user.get_recipes().order_by('name', 'id')[:20],
+        'recipe_ids': user.get_recipe_ids(),
+        'author_recipes': Recipe.objects.filter(author_id=user.pk).order_by('name', 'id')[:20],
+        'recipe_by_id': Recipe.objects.filter(pk=recipe.pk),
+        'recipe_by_slug': Recipe.objects.filter(slug=recipe.slug),
+        'can_edit': with_can_edit(Recipe.objects.filter(pk=recipe.pk), user),
+        'sharing_exists': ShareConfig.between(user.pk, other_user.pk),
+        'shares_granted': ShareConfig.objects.filter(granter_id=user.pk),
+        'shares_received': ShareConfig.objects.filter(grantee_id=user.pk),
+        'shared_user_ids': RecipeAccess.objects.filter(user_id=user.pk).values('author_id'),
+        'tag_counts': tag_counts_queryset(user),
+    }
+
+
+def find_nodes(plan, node_type):
+    if plan['Node Type'] == node_type:
+        yield plan
+    for child in plan.get('Plans', []):
+        yield from find_nodes(child, node_type)
+
+
+def sequential_scans(queryset):
+    """
+    Returns the tables `queryset` reads with a sequential scan, even with
+    sequential scans disabled.
+    """
+    connection = connections[router.db_for_read(queryset.model)]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        try:
+            plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+        finally:
+            cursor.execute('SET LOCAL enable_seqscan = on')
+    return sorted({node['Relation Name'] for node in find_nodes(plan, 'Seq Scan')})
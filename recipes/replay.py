@@ -0,0 +1,317 @@
+"""
+Replays captured API traffic (see `recipes_api.traffic`) against a server
+or the in-process test client, and reports throughput, error rates and
+latencies.
+
+Captured users, recipes and tags don't exist in the database being tested,
+so they're mapped onto local (usually seed_bench) data: each captured user
+becomes a local user, and each recipe or tag they used becomes one of the
+local user's recipes or tags. The mapping is deterministic, so replays of
+the same capture against the same data send the same requests.
+"""
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from django.db import connections
+from django.http import QueryDict
+from django.test import Client
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+
+from recipes_api.performance import DURATION_BUCKETS
+
+from .bench import percentile
+from .models import RecipeTag
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class DataMapper:
+    """
+    Maps captured user ids, recipe ids or slugs, and tag slugs onto local
+    data, in the order they're first seen.
+    """
+    def __init__(self, users):
+        self.users = list(users)
+        self._users = {}
+        self._recipes = {}
+        self._recipe_keys = defaultdict(dict)
+        self._tags = None
+        self._tag_slugs = {}
+
+    def user(self, captured_id):
+        if captured_id is None or not self.users:
+            return None
+        if captured_id not in self._users:
+            self._users[captured_id] = self.users[len(self._users) % len(self.users)]
+        return self._users[captured_id]
+
+    def recipe(self, user, key):
+        """
+        Returns the local recipe id (or slug, if `key` is a slug) for a
+        captured recipe `key`. Anonymous requests map onto the first user's
+        recipes.
+        """
+        user = user or self.users[0]
+        if user.pk not in self._recipes:
+            self._recipes[user.pk] = list(
+                user.get_recipes().order_by('id').values_list('pk', 'slug')
+            )
+        recipes = self._recipes[user.pk]
+        if not recipes:
+            return key
+        keys = self._recipe_keys[user.pk]
+        if key not in keys:
+            keys[key] = recipes[len(keys) % len(recipes)]
+        pk, slug = keys[key]
+        return str(pk) if is_uuid(key) else slug
+
+    def tag(self, slug):
+        if self._tags is None:
+            self._tags = list(RecipeTag.objects.order_by('id').values_list('slug', flat=True))
+        if not self._tags:
+            return slug
+        if slug not in self._tag_slugs:
+            self._tag_slugs[slug] = self._tags[len(self._tag_slugs) % len(self._tags)]
+        return self._tag_slugs[slug]
+
+    def map(self, record):
+        """
+        Returns a ReplayRequest for a captured request.
+        """
+        user = self.user(record.get('user'))
+        path = record['path']
+        route = 'unknown'
+        try:
+            match = resolve(path)
+            route = match.view_name
+            key = match.kwargs.get('pk')
+            if key is not None:
+                path = path.replace(f'/{key}/', f'/{self.recipe(user, key)}/', 1)
+        except Resolver404:
+            pass
+
+        query = QueryDict(record.get('query', ''), mutable=True)
+        if query.get('tags'):
+            query['tags'] = ','.join(self.tag(slug) for slug in query['tags'].split(','))
+        if query:
+            path = f'{path}?{query.urlencode(safe=",")}'
+
+        body = record.get('body')
+        if isinstance(body, dict) and isinstance(body.get('ids'), list):
+            body = {**body, 'ids': [self.recipe(user, str(key)) for key in body['ids']]}
+
+        return ReplayRequest(
+            ts=record['ts'],
+            method=record['method'],
+            path=path,
+            body=body,
+            user=user,
+            route=route,
+        )
+
+
+def is_uuid(value):
+    return len(value) == 36 and value.count('-') == 4
+
+
+class ReplayRequest:
+    def __init__(self, ts, method, path, body, user, route):
+        self.ts = ts
+        self.method = method
+        self.path = path
+        self.body = body
+        self.user = user
+        self.route = route
+        self.token = None
+
+
+class ClientTarget:
+    """
+    Sends requests through the in-process test client, one per thread.
+    Requests change the database for real.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self.host = '127.0.0.1' if '*' in settings.ALLOWED_HOSTS else settings.ALLOWED_HOSTS[0]
+
+    def send(self, request):
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client(HTTP_HOST=self.host, raise_request_exception=False)
+        extra = {} if request.token is None else {'HTTP_AUTHORIZATION': f'Token {request.token}'}
+        kwargs = {}
+        if request.body is not None:
+            kwargs = {'data': json.dumps(request.body), 'content_type': 'application/json'}
+        method = getattr(self._local.client, request.method.lower())
+        return method(request.path, **kwargs, **extra).status_code
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTarget:
+    """
+    Sends requests to a running server, with a session per thread.
+    """
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def send(self, request):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        headers = {} if request.token is None else {'Authorization': f'Token {request.token}'}
+        return self._local.session.request(
+            request.method,
+            self.base_url + request.path,
+            json=request.body,
+            headers=headers,
+            timeout=self.timeout,
+        ).status_code
+
+    def close(self):
+        pass
+
+
+class ReplayReport:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.exceptions = defaultdict(int)
+        self.lags = []
+        self.duration = None
+
+    def add(self, route, status, latency, lag):
+        with self._lock:
+            self.latencies[route].append(latency)
+            self.statuses[route][status] += 1
+            self.lags.append(lag)
+
+    def add_exception(self, route, exc):
+        with self._lock:
+            self.exceptions[type(exc).__name__] += 1
+            self.statuses[route]['exception'] += 1
+
+    @staticmethod
+    def summarize(latencies, statuses):
+        count = sum(statuses.values())
+        errors = sum(n for status, n in statuses.items() if status == 'exception' or status >= 500)
+        summary = {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'client_errors': sum(
+                n for status, n in statuses.items() if status != 'exception' and 400 <= status < 500
+            ),
+        }
+        if latencies:
+            summary.update({
+                f'p{percent}_ms': round(percentile(latencies, percent) * 1000, 3)
+                for percent in (50, 95, 99)
+            })
+        return summary
+
+    def histogram(self, latencies):
+        buckets = {f'<={bound * 1000:g}ms': 0 for bound in DURATION_BUCKETS}
+        buckets['slower'] = 0
+        for latency in latencies:
+            for bound in DURATION_BUCKETS:
+                if latency <= bound:
+                    buckets[f'<={bound * 1000:g}ms'] += 1
+                    break
+            else:
+                buckets['slower'] += 1
+        return buckets
+
+    def as_dict(self):
+        latencies = [latency for route in self.latencies.values() for latency in route]
+        statuses = defaultdict(int)
+        for route_statuses in self.statuses.values():
+            for status, count in route_statuses.items():
+                statuses[status] += count
+        total = self.summarize(latencies, statuses)
+        return {
+            **total,
+            'duration_s': round(self.duration, 3),
+            'throughput_rps': round(total['requests'] / self.duration, 2) if self.duration else 0.0,
+            'max_lag_ms': round(max(self.lags, default=0) * 1000, 3),
+            'histogram': self.histogram(latencies),
+            'exceptions': dict(self.exceptions),
+            'routes': {
+                route: self.summarize(self.latencies[route], route_statuses)
+                for route, route_statuses in sorted(self.statuses.items())
+            },
+        }
+
+
+def replay(requests, target, speed=1.0, concurrency=10, clock=time.monotonic, sleep=time.sleep):
+    """
+    Sends `requests` (ReplayRequests, in capture order) to `target` from
+    `concurrency` threads. Requests are sent at their captured times
+    relative to the first one, `speed` times faster, or as fast as
+    possible if `speed` is 0. Returns a ReplayReport. `max_lag_ms` in the
+    report shows how far behind schedule requests were sent, when there
+    weren't enough threads to keep up.
+    """
+    report = ReplayReport()
+    pending = queue.Queue(maxsize=concurrency * 2)
+
+    def worker():
+        try:
+            while (item := pending.get()) is not None:
+                request, due = item
+                sent = clock()
+                try:
+                    status = target.send(request)
+                except Exception as exc:
+                    report.add_exception(request.route, exc)
+                    continue
+                report.add(request.route, status, clock() - sent, max(0.0, sent - due))
+        finally:
+            target.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    start = clock()
+    first_ts = None
+    for request in requests:
+        first_ts = request.ts if first_ts is None else first_ts
+        due = start + ((request.ts - first_ts) / speed if speed else 0)
+        delay = due - clock()
+        if delay > 0:
+            sleep(delay)
+        pending.put((request, due))
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+    report.duration = clock() - start
+    return report
+
+
+def prepare(records, users, read_only=False):
+    """
+    Maps captured `records` onto `users` and their data, and gives every
+    mapped user an API token. Returns the ReplayRequests.
+    """
+    mapper = DataMapper(users)
+    replay_requests = [
+        mapper.map(record) for record in records
+        if not read_only or record['method'] in SAFE_METHODS
+    ]
+    tokens = {}
+    for request in replay_requests:
+        if request.user is not None:
+            if request.user.pk not in tokens:
+                tokens[request.user.pk] = Token.objects.get_or_create(user=request.user)[0].key
+            request.token = tokens[request.user.pk]
+    return replay_requests
@@ -1,10 +1,30 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from taggit.serializers import TagListSerializerField, TaggitSerializer
 
+from recipes_api.performance import TimedListSerializer, TimedSerializerMixin
+
 from .models import Recipe, RecipeTag
 
 
-class RecipeSerializer(TaggitSerializer, serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Lets callers limit which fields get serialized by passing `fields`.
+    Unknown field names are ignored.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(
+    TimedSerializerMixin,
+    SparseFieldsetMixin,
+    TaggitSerializer,
+    serializers.ModelSerializer,
+):
     author = serializers.HiddenField(
         default=serializers.CurrentUserDefault()
     )
@@ -12,8 +32,17 @@ class RecipeSerializer(TaggitSerializer, serializers.ModelSerializer):
     owner = serializers.SerializerMethodField()
     tags = TagListSerializerField(required=False)
 
+    # The columns each non-model field reads, for limiting queries
+    # with `.only()`. `None` means no Recipe columns are needed.
+    field_columns = {
+        'author': None,
+        'owner': 'author__email',
+        'tags': None,
+    }
+
     class Meta:
         model = Recipe
+        list_serializer_class = TimedListSerializer
         fields = [
             'id',
             'active_time',
@@ -37,8 +66,65 @@ class RecipeSerializer(TaggitSerializer, serializers.ModelSerializer):
     def get_owner(self, obj):
         return obj.author.email
 
+    @classmethod
+    def prepare_queryset(cls, queryset, fields=None, extra_columns=()):
+        """
+        Limit `queryset` to the columns needed to serialize `fields` (all of
+        the serializer's fields by default) plus `extra_columns`, and join or
+        prefetch everything else they read, so serializing N recipes doesn't
+        take N queries.
+        """
+        field_names = [
+            name for name in cls.Meta.fields
+            if fields is None or name in fields
+        ]
+        columns = {'id', *extra_columns}
+        for name in field_names:
+            column = cls.field_columns.get(name, name)
+            if column is not None:
+                columns.add(column)
+
+        if 'author__email' in columns:
+            columns.add('author')
+            queryset = queryset.select_related('author')
+        if 'tags' in field_names:
+            queryset = queryset.prefetch_related(Prefetch('tags'))
+        return queryset.only(*columns)
+
+
+class RecipeSummarySerializer(RecipeSerializer):
+    """
+    Just what's needed to list recipes on the recipe index page.
+    """
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            'id',
+            'name',
+            'owner',
+            'slug',
+            'tags',
+        ]
+
+
+class RecipeCopySerializer(serializers.Serializer):
+    """
+    Selects the recipes to copy: either by id or slug, or every recipe
+    (that the user has access to) with one of the given tag slugs.
+    """
+    ids = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    tags = serializers.ListField(child=serializers.SlugField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('tags' in attrs):
+            raise serializers.ValidationError('Provide either `ids` or `tags`.')
+        return attrs
+
+
+class RecipeTagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # How many of the user's accessible recipes have the tag
+    count = serializers.IntegerField(read_only=True)
 
-class RecipeTagSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeTag
-        fields = ['name', 'slug']
+        list_serializer_class = TimedListSerializer
+        fields = ['name', 'slug', 'count']
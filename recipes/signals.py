@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import slugs
+from .cache import invalidate_recipe_detail
+from .models import Recipe, RecipeAccess, RecipeTag, ShareConfig, TaggedRecipe
+from .tags import invalidate_tag_counts
+
+
+@receiver(pre_save, sender=ShareConfig)
+def remember_share_config_pair(sender, instance, **kwargs):
+    # If an existing ShareConfig is moved to a different pair of users,
+    # the old pair's access needs to be re-synced after saving.
+    instance._previous_pair = ShareConfig.objects.filter(
+        pk=instance.pk
+    ).values_list('granter_id', 'grantee_id').first()
+
+
+@receiver(post_save, sender=ShareConfig)
+def sync_access_on_share_config_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pair = (instance.granter_id, instance.grantee_id)
+    previous_pair = getattr(instance, '_previous_pair', None)
+    if previous_pair and previous_pair != pair:
+        RecipeAccess.sync_pair(*previous_pair)
+    RecipeAccess.sync_pair(*pair)
+    invalidate_tag_counts({*pair, *(previous_pair or ())})
+
+
+@receiver(post_delete, sender=ShareConfig)
+def sync_access_on_share_config_delete(sender, instance, **kwargs):
+    RecipeAccess.sync_pair(instance.granter_id, instance.grantee_id)
+    invalidate_tag_counts([instance.granter_id, instance.grantee_id])
+
+
+@receiver(m2m_changed, sender=TaggedRecipe)
+def touch_recipe_on_tag_change(sender, instance, action, pk_set=None, **kwargs):
+    # Tags are part of a recipe, so changing them bumps `updated_at`,
+    # which the recipe's Last-Modified header is based on.
+    if action in ('post_add', 'post_remove') and not pk_set:
+        return
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Recipe):
+        instance.updated_at = timezone.now()
+        Recipe.objects.filter(pk=instance.pk).update(updated_at=instance.updated_at)
+        invalidate_recipe_detail(instance)
+
+
+def touch_recipes(recipes):
+    """
+    Bumps `updated_at` and drops the cached details of a queryset of
+    Recipes, when something their details show that isn't stored on the
+    Recipe (a tag's name, the owner's email) changes.
+    """
+    recipes = list(recipes.only('pk', 'slug'))
+    if recipes:
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).update(updated_at=timezone.now())
+        invalidate_recipe_detail(*recipes)
+
+
+@receiver(m2m_changed, sender=TaggedRecipe)
+def touch_recipes_on_tag_side_change(sender, instance, action, pk_set=None, **kwargs):
+    # Tagged from the tag's side, so `pk_set` holds recipe ids
+    if isinstance(instance, Recipe):
+        return
+    if action in ('post_add', 'post_remove') and pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_save, sender=RecipeTag)
+def remember_tag_name(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_name = RecipeTag.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=RecipeTag)
+def touch_recipes_on_tag_rename(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    if getattr(instance, '_previous_name', instance.name) != instance.name:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=RecipeTag)
+def touch_recipes_on_tag_delete(sender, instance, **kwargs):
+    # Deleting the tag cascades to its TaggedRecipes without m2m_changed
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_user_email(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or (update_fields is not None and 'email' not in update_fields):
+        return
+    instance._previous_email = sender.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_recipes_on_email_change(sender, instance, created, raw=False, **kwargs):
+    # Recipe details show their author's email as `owner`
+    if raw or created:
+        return
+    if getattr(instance, '_previous_email', instance.email) != instance.email:
+        touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(m2m_changed, sender=TaggedRecipe)
+def invalidate_tag_counts_on_tag_change(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Recipe):
+        invalidate_tag_counts([instance.author_id])
+    elif pk_set:
+        # Tagged from the tag's side, so `pk_set` holds recipe ids
+        invalidate_tag_counts(
+            Recipe.objects.filter(pk__in=pk_set).values_list('author_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_tag_counts_on_delete(sender, instance, **kwargs):
+    invalidate_tag_counts([instance.author_id])
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_slug_on_delete(sender, instance, **kwargs):
+    slugs.forget(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_detail_on_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_recipe_detail(instance)
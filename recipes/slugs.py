@@ -0,0 +1,69 @@
+"""
+Cheap lookups of Recipes by slug.
+
+Slugs never change, so once a slug has been looked up, its id is kept in
+a per-process LRU cache, and later lookups go through the primary key.
+Before that, lookups use the unique slug index. Lookups by a cached id
+still check the slug, so a stale entry (for a Recipe that's been deleted)
+can't return the wrong Recipe.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+class SlugCache:
+    """
+    Bounded, per-process LRU cache of slug -> Recipe id.
+    """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, slug):
+        with self._lock:
+            pk = self._entries.get(slug)
+            if pk is not None:
+                self._entries.move_to_end(slug)
+            return pk
+
+    def set(self, slug, pk):
+        with self._lock:
+            self._entries[slug] = pk
+            self._entries.move_to_end(slug)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, slug):
+        with self._lock:
+            self._entries.pop(slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slug_cache = SlugCache(max_size=settings.RECIPES_SLUG_CACHE_SIZE)
+
+
+def narrow(lookup):
+    """
+    Returns the cheapest filter kwargs for a lookup from
+    `Recipe.get_lookup()`.
+    """
+    if 'slug' not in lookup:
+        return lookup
+    slug = lookup['slug']
+    pk = slug_cache.get(slug)
+    if pk is None:
+        return lookup
+    return {'pk': pk, 'slug': slug}
+
+
+def remember(recipe):
+    slug_cache.set(recipe.slug, recipe.pk)
+
+
+def forget(recipe):
+    slug_cache.delete(recipe.slug)
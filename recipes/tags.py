@@ -0,0 +1,110 @@
+"""
+Per-tag recipe counts over the recipes a user has access to, for the
+recipe-tags endpoints.
+
+Counts are computed with a single grouped query over TaggedRecipe (see
+`taggedrecipe_object_tag_idx`). They can be cached per user by setting
+RECIPES_TAG_COUNTS_CACHE_TIMEOUT. Cached counts are dropped when recipes
+are tagged, untagged, copied or deleted, and when sharing changes (see
+signals.py), for every user who can see the affected recipes. Cached
+counts are read from the primary database.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F
+
+from recipes_api.replicas import use_primary
+
+from .models import RecipeAccess, TaggedRecipe
+
+KEY_PREFIX = 'recipe-tag-counts:'
+
+
+def get_cache():
+    return caches[settings.RECIPES_TAG_COUNTS_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def get_count_params(params):
+    """
+    Returns `min_count` and `limit` from a request's query params.
+    Raises ValueError if either isn't a positive integer.
+    """
+    values = {}
+    for name in ('min_count', 'limit'):
+        value = params.get(name)
+        if value is not None and not (value.isdigit() and int(value) >= 1):
+            raise ValueError(f'`{name}` must be a positive integer.')
+        values[name] = None if value is None else int(value)
+    return values['min_count'] or 1, values['limit']
+
+
+def tag_counts_queryset(user, min_count=1, limit=None):
+    """
+    Returns {name, slug, count} rows for the tags on recipes `user` has
+    access to, most used first.
+    """
+    queryset = TaggedRecipe.objects.filter(
+        object_id__in=user.get_recipe_ids()
+    ).values(
+        name=F('tag__name'),
+        slug=F('tag__slug'),
+    ).annotate(
+        count=Count('*'),
+    ).order_by('-count', 'name')
+    if min_count > 1:
+        queryset = queryset.filter(count__gte=min_count)
+    return queryset[:limit]
+
+
+def filter_counts(counts, min_count, limit):
+    return [row for row in counts if row['count'] >= min_count][:limit]
+
+
+def get_tag_counts(user, min_count=1, limit=None):
+    timeout = settings.RECIPES_TAG_COUNTS_CACHE_TIMEOUT
+    if not timeout:
+        return list(tag_counts_queryset(user, min_count, limit))
+
+    # All of the user's counts are cached, and filtered here
+    key = cache_key(user.pk)
+    counts = get_cache().get(key)
+    if counts is None:
+        with use_primary():
+            counts = list(tag_counts_queryset(user))
+        get_cache().set(key, counts, timeout)
+    return filter_counts(counts, min_count, limit)
+
+
+async def aget_tag_counts(user, min_count=1, limit=None):
+    timeout = settings.RECIPES_TAG_COUNTS_CACHE_TIMEOUT
+    if not timeout:
+        return [row async for row in tag_counts_queryset(user, min_count, limit)]
+
+    key = cache_key(user.pk)
+    counts = await get_cache().aget(key)
+    if counts is None:
+        with use_primary():
+            counts = [row async for row in tag_counts_queryset(user)]
+        await get_cache().aset(key, counts, timeout)
+    return filter_counts(counts, min_count, limit)
+
+
+def invalidate_tag_counts(author_ids):
+    """
+    Drops the cached tag counts of the users who can see recipes by
+    `author_ids` (which may be a queryset), once the current transaction
+    commits.
+    """
+    if not settings.RECIPES_TAG_COUNTS_CACHE_TIMEOUT:
+        return
+    user_ids = set(author_ids)
+    user_ids.update(
+        RecipeAccess.objects.filter(author_id__in=user_ids).values_list('user_id', flat=True)
+    )
+    keys = [cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
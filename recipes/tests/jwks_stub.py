@@ -0,0 +1,80 @@
+"""
+A local stand-in for Auth0's JWKS endpoint, plus helpers for minting
+tokens signed by the keys it publishes.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from jose import jwk, jwt
+
+
+def generate_signing_key(kid):
+    """
+    Returns (private_pem, public_jwk) for a fresh RSA key.
+    1024 bits keeps the tests fast; Auth0 uses 2048.
+    """
+    _, private_key = rsa.newkeys(1024)
+    private_pem = private_key.save_pkcs1().decode()
+    public_jwk = jwk.construct(private_pem, 'RS256').public_key().to_dict()
+    public_jwk.update({'kid': kid, 'use': 'sig'})
+    return private_pem, public_jwk
+
+
+def make_token(private_pem, kid, claims):
+    return jwt.encode(claims, private_pem, algorithm='RS256', headers={'kid': kid})
+
+
+class StubJWKSServer:
+    """
+    Serves `keys` as a JWKS document on a random local port.
+    Set `status` to make the endpoint fail, `delay` to make it slow, or
+    `drop` to close connections without responding.
+    """
+    def __init__(self, keys=None):
+        self.keys = list(keys or [])
+        self.status = 200
+        self.delay = 0
+        self.drop = False
+        self.request_count = 0
+        self.connection_count = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                stub.connection_count += 1
+
+            def do_GET(self):
+                stub.request_count += 1
+                time.sleep(stub.delay)
+                if stub.drop:
+                    self.close_connection = True
+                    return
+                body = json.dumps({'keys': stub.keys}).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        # Clients that time out close the connection while a slow response
+        # is being written; that's expected, so don't print the tracebacks.
+        self.server.handle_error = lambda request, client_address: None
+        self.url = f'http://127.0.0.1:{self.server.server_port}/.well-known/jwks.json'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
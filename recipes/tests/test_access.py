@@ -0,0 +1,134 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.factories import RecipeFactory, ShareConfigFactory
+from recipes.models import RecipeAccess, ShareConfig
+from users.models import User
+
+
+class RecipeAccessConsistencyTestCase(TestCase):
+    """
+    RecipeAccess must always match what ShareConfig says.
+    """
+    def setUp(self) -> None:
+        self.user1 = User.objects.create(email='user1@test.com', username='user1@test.com')
+        self.user2 = User.objects.create(email='user2@test.com', username='user2@test.com')
+        self.user3 = User.objects.create(email='user3@test.com', username='user3@test.com')
+
+    def access_pairs(self):
+        return set(RecipeAccess.objects.values_list('user_id', 'author_id'))
+
+    def assertMatchesRebuild(self):
+        rows = set(RecipeAccess.objects.values_list('user_id', 'author_id', 'can_edit'))
+        RecipeAccess.rebuild()
+        self.assertEqual(rows, set(RecipeAccess.objects.values_list('user_id', 'author_id', 'can_edit')))
+
+    def test_grant_gives_access_in_both_directions(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user2)
+
+        self.assertEqual(self.access_pairs(), {
+            (self.user1.id, self.user2.id),
+            (self.user2.id, self.user1.id),
+        })
+        self.assertEqual(self.user1.get_shared_user_ids(), {self.user2.id})
+        self.assertEqual(self.user2.get_shared_user_ids(), {self.user1.id})
+        self.assertMatchesRebuild()
+
+    def test_revoke_removes_access(self):
+        share_config = ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        share_config.delete()
+
+        self.assertEqual(self.access_pairs(), set())
+        self.assertEqual(self.user1.get_shared_user_ids(), set())
+        self.assertMatchesRebuild()
+
+    def test_revoking_one_of_two_share_configs_keeps_access(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        reverse_config = ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        reverse_config.delete()
+
+        self.assertEqual(self.user1.get_shared_user_ids(), {self.user2.id})
+        self.assertEqual(self.user2.get_shared_user_ids(), {self.user1.id})
+        self.assertMatchesRebuild()
+
+    def test_moving_share_config_to_another_user(self):
+        share_config = ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        share_config.grantee = self.user3
+        share_config.save()
+
+        self.assertEqual(self.user1.get_shared_user_ids(), {self.user3.id})
+        self.assertEqual(self.user2.get_shared_user_ids(), set())
+        self.assertEqual(self.user3.get_shared_user_ids(), {self.user1.id})
+        self.assertMatchesRebuild()
+
+    def test_sharing_with_self_grants_nothing(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user1)
+
+        self.assertEqual(self.access_pairs(), set())
+        self.assertMatchesRebuild()
+
+    def test_deleting_user_removes_their_access(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        ShareConfigFactory(granter=self.user1, grantee=self.user3)
+        self.user2.delete()
+
+        self.assertEqual(self.user1.get_shared_user_ids(), {self.user3.id})
+        self.assertMatchesRebuild()
+
+    def test_get_recipes_follows_grants_and_revokes(self):
+        r1 = RecipeFactory(author=self.user1)
+        r2 = RecipeFactory(author=self.user2)
+        RecipeFactory(author=self.user3)
+
+        self.assertCountEqual(self.user1.get_recipe_ids(), [r1.id])
+
+        share_config = ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        self.assertCountEqual(self.user1.get_recipe_ids(), [r1.id, r2.id])
+        self.assertCountEqual(self.user2.get_recipe_ids(), [r1.id, r2.id])
+
+        share_config.delete()
+        self.assertCountEqual(self.user1.get_recipe_ids(), [r1.id])
+        self.assertCountEqual(self.user2.get_recipe_ids(), [r2.id])
+
+    def test_get_recipes_is_a_single_query(self):
+        RecipeFactory(author=self.user1)
+        RecipeFactory(author=self.user2)
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.user1.get_recipes()), 2)
+
+    def test_can_edit_follows_share_config_roles(self):
+        def can_edit():
+            return set(RecipeAccess.objects.values_list('user_id', 'author_id', 'can_edit'))
+
+        share_config = ShareConfigFactory(granter=self.user1, grantee=self.user2, role=ShareConfig.VIEWER)
+        self.assertEqual(can_edit(), {(self.user1.id, self.user2.id, False), (self.user2.id, self.user1.id, False)})
+
+        # The author's grant decides: user2 granted user1 the Editor role,
+        # but user1 only lets user2 view their recipes
+        editor_config = ShareConfigFactory(granter=self.user2, grantee=self.user1, role=ShareConfig.EDITOR)
+        self.assertEqual(can_edit(), {(self.user1.id, self.user2.id, True), (self.user2.id, self.user1.id, False)})
+        self.assertMatchesRebuild()
+        editor_config.delete()
+        self.assertEqual(can_edit(), {(self.user1.id, self.user2.id, False), (self.user2.id, self.user1.id, False)})
+
+        # With a grant one way only, its role applies both ways
+        share_config.role = ShareConfig.EDITOR
+        share_config.save()
+        self.assertEqual(can_edit(), {(self.user1.id, self.user2.id, True), (self.user2.id, self.user1.id, True)})
+
+        share_config.role = ShareConfig.VIEWER
+        share_config.save()
+        rows = can_edit()
+        RecipeAccess.rebuild()
+        self.assertEqual(can_edit(), rows)
+
+    def test_rebuild_command_restores_missing_rows(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        ShareConfig.objects.create(granter=self.user1, grantee=self.user3)
+        RecipeAccess.objects.all().delete()
+
+        call_command('rebuild_recipe_access', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(self.user1.get_shared_user_ids(), {self.user2.id, self.user3.id})
@@ -0,0 +1,109 @@
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from recipes.cache import get_cache
+from recipes.factories import RecipeFactory
+from recipes.models import ShareConfig
+
+from .test_views import BaseRecipesTestCase
+
+
+class AsyncRecipeViewsTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.token = Token.objects.create(user=self.user1)
+        self.recipe = RecipeFactory(author=self.user1, name='Dal', tags=['indian', 'lentils'])
+        RecipeFactory(author=self.user1, name='Chana masala', tags=['indian'])
+        RecipeFactory(author=self.user2, name='Goulash', tags=['stew'])
+        ShareConfig.objects.create(granter=self.user2, grantee=self.user1)
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    async def get(self, url, authenticated=True, etag=None):
+        headers = {} if etag is None else {'If-None-Match': etag}
+        if authenticated:
+            headers['Authorization'] = f'Token {self.token.key}'
+        return await self.async_client.get(url, headers=headers)
+
+    async def get_sync(self, url):
+        return await sync_to_async(self.client.get)(url)
+
+    async def test_list_matches_sync_list(self):
+        for params in ['', '?tags=indian', '?view=summary', '?fields=name,tags']:
+            with self.subTest(params=params):
+                resp = await self.get(reverse('async-recipes-list') + params)
+                expected = await self.get_sync(reverse('recipes-list') + params)
+
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                self.assertEqual(resp.json(), expected.json())
+
+    async def test_list_conditional_get(self):
+        url = reverse('async-recipes-list')
+        etag = (await self.get(url))['ETag']
+
+        resp = await self.get(url, etag=etag)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_list_rejects_search_and_pagination(self):
+        resp = await self.get(reverse('async-recipes-list') + '?q=dal')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_authentication_is_required(self):
+        for url in [reverse('async-recipes-list'), reverse('async-recipe-tags')]:
+            with self.subTest(url=url):
+                resp = await self.get(url, authenticated=False)
+                self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+                resp = await self.async_client.get(url, headers={'Authorization': 'Token invalid'})
+                self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_detail_matches_sync_detail(self):
+        for authenticated in [True, False]:
+            for key in [self.recipe.pk, self.recipe.slug]:
+                with self.subTest(authenticated=authenticated, key=key):
+                    resp = await self.get(
+                        reverse('async-recipes-detail', kwargs={'pk': key}),
+                        authenticated=authenticated,
+                    )
+                    expected = await self.get_sync(reverse('recipes-detail', kwargs={'pk': key}))
+
+                    self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                    self.assertEqual(resp.json(), expected.json())
+                    self.assertEqual(resp['ETag'], expected['ETag'])
+
+    async def test_detail_conditional_get(self):
+        url = reverse('async-recipes-detail', kwargs={'pk': self.recipe.pk})
+        etag = (await self.get(url, authenticated=False))['ETag']
+
+        resp = await self.get(url, authenticated=False, etag=etag)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail_not_found(self):
+        resp = await self.get(reverse('async-recipes-detail', kwargs={'pk': 'no-such-recipe'}))
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_detail_is_read_only(self):
+        resp = await self.async_client.delete(reverse('async-recipes-detail', kwargs={'pk': self.recipe.pk}))
+
+        self.assertEqual(resp.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_tags_match_sync_tags(self):
+        for params in ['', '?min_count=2', '?limit=2']:
+            with self.subTest(params=params):
+                resp = await self.get(reverse('async-recipe-tags') + params)
+                expected = await self.get_sync(reverse('recipe-tags') + params)
+
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                self.assertEqual(resp.json(), expected.json())
+        self.assertEqual(resp.json()[0], {'name': 'indian', 'slug': 'indian', 'count': 2})
+
+    async def test_tags_reject_invalid_params(self):
+        resp = await self.get(reverse('async-recipe-tags') + '?limit=none')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,331 @@
+import asyncio
+import os
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from jose import jwt
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from recipes.cache import get_cache
+from recipes.factories import RecipeFactory
+from recipes.views import RecipeViewSet
+from recipes_api.authentication import DRFAuth0Authentication
+from recipes_api.http_client import AsyncHTTPClient, HTTPClient
+from recipes_api.jwks import JWKSKeyStore
+from recipes_api.token_cache import DjangoTokenCache, LocalTokenCache
+from users.models import User
+
+from .jwks_stub import StubJWKSServer, generate_signing_key, make_token
+
+
+PRIVATE_PEM_1, PUBLIC_JWK_1 = generate_signing_key('key-1')
+PRIVATE_PEM_2, PUBLIC_JWK_2 = generate_signing_key('key-2')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JWKSKeyStoreTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.jwks = StubJWKSServer(keys=[PUBLIC_JWK_1]).__enter__()
+        self.addCleanup(self.jwks.__exit__)
+        self.store = JWKSKeyStore(
+            self.jwks.url,
+            ttl=600,
+            refresh_margin=60,
+            min_refresh_interval=30,
+            clock=self.clock,
+        )
+
+    def test_keys_are_fetched_once_and_indexed_by_kid(self):
+        for _ in range(5):
+            key = self.store.get_key('key-1')
+
+        self.assertEqual(key['kid'], 'key-1')
+        self.assertEqual(key['n'], PUBLIC_JWK_1['n'])
+        self.assertEqual(self.jwks.request_count, 1)
+
+    def test_keys_are_refetched_after_ttl(self):
+        self.store.get_key('key-1')
+        self.clock.now += 600
+        self.store.get_key('key-1')
+
+        self.assertEqual(self.jwks.request_count, 2)
+
+    def test_keys_are_refreshed_in_background_before_ttl(self):
+        self.store.get_key('key-1')
+        self.clock.now += 550
+        with mock.patch('recipes_api.jwks.threading.Thread') as thread:
+            self.assertIsNotNone(self.store.get_key('key-1'))
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_unknown_kid_triggers_refetch(self):
+        self.store.get_key('key-1')
+        self.jwks.keys.append(PUBLIC_JWK_2)
+        self.clock.now += 30
+
+        key = self.store.get_key('key-2')
+
+        self.assertEqual(key['kid'], 'key-2')
+        self.assertEqual(self.jwks.request_count, 2)
+
+    def test_unknown_kid_refetches_are_rate_limited(self):
+        self.store.get_key('key-1')
+        for _ in range(10):
+            self.assertIsNone(self.store.get_key('bad-kid'))
+
+        self.assertEqual(self.jwks.request_count, 1)
+
+    def test_stale_keys_are_served_when_fetch_fails(self):
+        self.store.get_key('key-1')
+        self.jwks.status = 503
+        self.clock.now += 600
+
+        key = self.store.get_key('key-1')
+
+        self.assertEqual(key['kid'], 'key-1')
+        self.assertEqual(self.jwks.request_count, 2)
+
+    def test_failed_refreshes_are_rate_limited(self):
+        self.store.get_key('key-1')
+        self.jwks.status = 503
+        self.clock.now += 600
+
+        for _ in range(10):
+            self.assertEqual(self.store.get_key('key-1')['kid'], 'key-1')
+        self.assertEqual(self.jwks.request_count, 2)
+
+        self.clock.now += 30
+        self.store.get_key('key-1')
+        self.assertEqual(self.jwks.request_count, 3)
+
+    def test_async_failed_refreshes_are_rate_limited(self):
+        store = JWKSKeyStore(self.jwks.url, async_client=AsyncHTTPClient(), clock=self.clock)
+        store.get_key('key-1')
+        self.jwks.status = 503
+        self.clock.now += 600
+
+        async def get_keys():
+            try:
+                return await asyncio.gather(*[store.aget_key('key-1') for _ in range(10)])
+            finally:
+                await store.async_client.aclose()
+
+        keys = asyncio.run(get_keys())
+
+        self.assertEqual([key['kid'] for key in keys], ['key-1'] * 10)
+        self.assertEqual(self.jwks.request_count, 2)
+
+    def test_slow_provider_does_not_hang_requests(self):
+        store = JWKSKeyStore(
+            self.jwks.url,
+            client=HTTPClient(read_timeout=0.2),
+            clock=self.clock,
+        )
+        self.jwks.delay = 1
+
+        start = time.monotonic()
+        self.assertIsNone(store.get_key('key-1'))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_failing_provider_is_not_called_while_circuit_is_open(self):
+        store = JWKSKeyStore(
+            self.jwks.url,
+            min_refresh_interval=0,
+            client=HTTPClient(failure_threshold=2, clock=self.clock),
+            clock=self.clock,
+        )
+        self.jwks.status = 503
+        for _ in range(5):
+            self.assertIsNone(store.get_key('key-1'))
+
+        self.assertEqual(self.jwks.request_count, 2)
+
+    def test_async_concurrent_fetches_are_shared(self):
+        store = JWKSKeyStore(self.jwks.url, async_client=AsyncHTTPClient(), clock=self.clock)
+        self.jwks.delay = 0.1
+
+        async def get_keys():
+            try:
+                return await asyncio.gather(*[store.aget_key('key-1') for _ in range(5)])
+            finally:
+                await store.async_client.aclose()
+
+        keys = asyncio.run(get_keys())
+
+        self.assertEqual([key['kid'] for key in keys], ['key-1'] * 5)
+        self.assertEqual(self.jwks.request_count, 1)
+
+
+@mock.patch.dict(os.environ, {
+    'DJANGO_AUTH0_DOMAIN': 'recipes.test',
+    'DJANGO_AUTH0_AUDIENCE': 'recipes-api',
+})
+class DRFAuth0AuthenticationTestCase(TestCase):
+    def setUp(self) -> None:
+        self.jwks = StubJWKSServer(keys=[PUBLIC_JWK_1]).__enter__()
+        self.addCleanup(self.jwks.__exit__)
+        store = JWKSKeyStore(self.jwks.url)
+        patcher = mock.patch(
+            'recipes_api.authentication.get_jwks_store',
+            return_value=store,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token_cache = LocalTokenCache()
+        patcher = mock.patch(
+            'recipes_api.authentication.get_token_cache',
+            return_value=self.token_cache,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_token(self, **claims):
+        return make_token(PRIVATE_PEM_1, 'key-1', {
+            'aud': 'recipes-api',
+            'iss': 'https://recipes.test/',
+            'exp': int(time.time()) + 3600,
+            'https://recipes/email': 'user1@test.com',
+            **claims,
+        })
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get(
+            '/recipes/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        return DRFAuth0Authentication().authenticate(request)
+
+    def test_valid_token_authenticates_user(self):
+        token = self.make_token()
+
+        user, _ = self.authenticate(token)
+
+        self.assertEqual(user.email, 'user1@test.com')
+        self.assertTrue(User.objects.filter(email='user1@test.com').exists())
+
+    def test_token_signed_with_unknown_key_is_rejected(self):
+        token = make_token(PRIVATE_PEM_2, 'key-2', {
+            'aud': 'recipes-api',
+            'iss': 'https://recipes.test/',
+            'https://recipes/email': 'user1@test.com',
+        })
+
+        self.assertIsNone(self.authenticate(token))
+
+    def test_jwks_is_fetched_once_for_many_requests(self):
+        token = self.make_token()
+
+        for _ in range(3):
+            self.authenticate(token)
+
+        self.assertEqual(self.jwks.request_count, 1)
+
+    def test_verified_token_is_cached_until_it_expires(self):
+        token = self.make_token()
+
+        with mock.patch('recipes_api.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            user, _ = self.authenticate(token)
+            with self.assertNumQueries(1):
+                cached_user, _ = self.authenticate(token)
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(cached_user, user)
+
+    def test_tokens_without_exp_are_not_cached(self):
+        token = make_token(PRIVATE_PEM_1, 'key-1', {
+            'aud': 'recipes-api',
+            'iss': 'https://recipes.test/',
+            'https://recipes/email': 'user1@test.com',
+        })
+
+        with mock.patch('recipes_api.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            self.authenticate(token)
+            self.authenticate(token)
+
+        self.assertEqual(decode.call_count, 2)
+
+
+class TokenCacheTestCase(SimpleTestCase):
+    def test_local_cache_evicts_least_recently_used(self):
+        cache = LocalTokenCache(max_size=2)
+        expires_at = time.time() + 60
+        cache.set('a', 1, expires_at)
+        cache.set('b', 2, expires_at)
+        cache.get('a')
+        cache.set('c', 3, expires_at)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_local_cache_entries_expire(self):
+        clock = FakeClock()
+        cache = LocalTokenCache(clock=clock)
+        cache.set('a', 1, clock.now + 10)
+        clock.now += 10
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_django_cache_backend(self):
+        cache = DjangoTokenCache()
+        self.addCleanup(cache.cache.delete, cache.key_prefix + 'a')
+        cache.set('a', {'user_id': 1}, time.time() + 60)
+        cache.set('expired', {'user_id': 2}, time.time() - 1)
+
+        self.assertEqual(cache.get('a'), {'user_id': 1})
+        self.assertIsNone(cache.get('expired'))
+        # Clearing would drop everything else in the shared alias
+        self.assertFalse(hasattr(cache, 'clear'))
+
+
+class RecipeDetailsAuthenticationTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(email='user1@test.com', username='user1@test.com')
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = RecipeFactory(author=self.user)
+        self.url = reverse('recipes-detail', kwargs={'pk': self.recipe.pk})
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def test_anonymous_detail_skips_token_authentication(self):
+        with mock.patch.object(TokenAuthentication, 'authenticate') as token_auth, \
+                mock.patch.object(DRFAuth0Authentication, '_authenticate') as auth0:
+            resp = self.client.get(self.url)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        token_auth.assert_not_called()
+        auth0.assert_not_called()
+
+    def test_detail_with_credentials_is_authenticated(self):
+        with mock.patch.object(RecipeViewSet, 'retrieve_cached') as retrieve_cached:
+            resp = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        retrieve_cached.assert_not_called()
+
+    def test_only_detail_gets_are_public(self):
+        for method, url in [
+            ('delete', self.url),
+            ('get', reverse('recipes-list')),
+            ('get', reverse('recipes-can-user-edit', kwargs={'pk': self.recipe.pk})),
+        ]:
+            with self.subTest(method=method, url=url):
+                resp = getattr(self.client, method)(url)
+                self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_missing_credentials_are_not_logged_as_errors(self):
+        with self.assertNoLogs(level='ERROR'):
+            self.client.get(reverse('recipes-list'))
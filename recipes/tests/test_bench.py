@@ -0,0 +1,77 @@
+import io
+import json
+from collections import Counter
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from recipes import bench
+from recipes.models import Recipe, RecipeAccess, ShareConfig, TaggedRecipe
+
+
+class SeedBenchTestCase(TestCase):
+    def seed(self, **kwargs):
+        return bench.seed(users=10, recipes_per_user=5, fanout=2, tags=20, **kwargs)
+
+    def test_seed(self):
+        counts = self.seed()
+
+        self.assertEqual(counts['users'], 10)
+        self.assertEqual(counts['recipes'], 50)
+        self.assertEqual(counts['shares'], 20)
+        self.assertEqual(Recipe.objects.count(), 50)
+        self.assertEqual(TaggedRecipe.objects.count(), counts['taggings'])
+        self.assertFalse(ShareConfig.objects.filter(granter=F('grantee')).exists())
+        # Sharing works both ways, so each share gives a user access
+        self.assertGreaterEqual(RecipeAccess.objects.count(), counts['shares'])
+        recipe = Recipe.objects.first()
+        self.assertEqual(recipe.slug, Recipe.generate_slug(recipe.pk, recipe.name))
+        self.assertGreater(len(recipe.ingredients.splitlines()), 1)
+
+    def test_seed_is_deterministic(self):
+        self.seed()
+        first = list(Recipe.objects.order_by('pk').values_list('pk', 'name'))
+        bench.clear()
+        self.seed()
+
+        self.assertEqual(list(Recipe.objects.order_by('pk').values_list('pk', 'name')), first)
+
+    def test_tags_are_zipf_distributed(self):
+        bench.seed(users=10, recipes_per_user=50, tags=50, tags_per_recipe=3)
+
+        uses = sorted(Counter(TaggedRecipe.objects.values_list('tag_id', flat=True)).values(), reverse=True)
+        self.assertGreater(uses[0], 5 * uses[len(uses) // 2])
+
+    def test_command_refuses_to_seed_twice(self):
+        call_command('seed_bench', '--users', '2', '--recipes-per-user', '1', stdout=io.StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_bench', '--users', '2', stdout=io.StringIO())
+        call_command('seed_bench', '--users', '3', '--recipes-per-user', '1', '--clear', stdout=io.StringIO())
+        self.assertEqual(bench.bench_users().count(), 3)
+
+
+class RunBenchTestCase(TestCase):
+    def test_run_bench(self):
+        bench.seed(users=5, recipes_per_user=3, fanout=1, tags=10)
+        recipe_count = Recipe.objects.count()
+        stdout = io.StringIO()
+
+        call_command('run_bench', '--iterations', '2', '--warmup', '0', stdout=stdout)
+
+        report = json.loads(stdout.getvalue())
+        self.assertCountEqual(report['results'], [
+            'list', 'retrieve_by_id', 'retrieve_by_slug', 'tag_list',
+            'tag_filter', 'can_user_edit', 'copy',
+        ])
+        self.assertEqual(report['results']['copy']['statuses'], [201])
+        for result in report['results'].values():
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['p50_ms'], 0)
+        # Copies are rolled back
+        self.assertEqual(Recipe.objects.count(), recipe_count)
+
+    def test_requires_dataset(self):
+        with self.assertRaises(CommandError):
+            call_command('run_bench', stdout=io.StringIO())
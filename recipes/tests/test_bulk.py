@@ -0,0 +1,160 @@
+import json
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from recipes.factories import RecipeFactory, ShareConfigFactory
+from recipes.models import Recipe, RecipeTag, ShareConfig
+from users.models import User
+
+from .test_views import BaseRecipesTestCase
+
+
+class RecipeBulkTestCase(BaseRecipesTestCase):
+    url = reverse('recipes-bulk')
+
+    def post(self, items):
+        return self.client.post(self.url, items, format='json')
+
+    def test_bulk_create(self):
+        resp = self.post([
+            {'name': 'Red lentils', 'tags': ['indian', 'lentils']},
+            {'ingredients': 'no name'},
+            {'name': 'Chana masala', 'tags': ['indian']},
+        ])
+
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        results = resp.json()['results']
+        self.assertEqual([r['index'] for r in results], [0, 2])
+        self.assertEqual(resp.json()['errors'], [
+            {'index': 1, 'errors': {'name': ['This field is required.']}},
+        ])
+
+        recipe = Recipe.objects.get(pk=results[0]['id'])
+        self.assertEqual(recipe.author, self.user1)
+        self.assertEqual(recipe.slug, Recipe.generate_slug(recipe.pk, 'Red lentils'))
+        self.assertEqual(recipe.slug, results[0]['slug'])
+        self.assertCountEqual(recipe.tags.names(), ['indian', 'lentils'])
+        self.assertEqual(RecipeTag.objects.filter(name='indian').count(), 1)
+
+    def test_bulk_create_ndjson(self):
+        body = '\n'.join(json.dumps({'name': f'recipe {i}'}) for i in range(3))
+
+        resp = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(author=self.user1).count(), 3)
+
+    def test_bulk_create_ndjson_parse_error(self):
+        resp = self.client.post(self.url, '{"name": "ok"}\n{oops', content_type='application/x-ndjson')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('line 2', resp.json()['detail'])
+
+    def test_bulk_create_uses_existing_tags(self):
+        RecipeFactory(author=self.user2, tags=['indian'])
+
+        self.post([{'name': 'Dal', 'tags': ['indian', 'indian', 'dal']}])
+
+        self.assertEqual(RecipeTag.objects.filter(name='indian').count(), 1)
+        self.assertCountEqual(Recipe.objects.get(name='Dal').tags.names(), ['indian', 'dal'])
+
+    def test_bulk_create_query_count_does_not_grow_with_items(self):
+        def items(count):
+            return [{'name': f'recipe {i}', 'tags': [f'tag {i}', 'shared']} for i in range(count)]
+
+        self.post(items(1))
+        # Savepoint, recipe insert, tag insert, tag select, tagging insert, release
+        with self.assertNumQueries(6):
+            resp = self.post(items(50))
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(RECIPES_BULK_BATCH_SIZE=2)
+    def test_bulk_create_in_batches(self):
+        resp = self.post([{'name': f'recipe {i}'} for i in range(5)])
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['index'] for r in resp.json()['results']], [0, 1, 2, 3, 4])
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    @override_settings(RECIPES_BULK_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        resp = self.post([{'name': f'recipe {i}'} for i in range(3)])
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    def test_body_must_be_a_list(self):
+        resp = self.post({'name': 'not a list'})
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        own = RecipeFactory(author=self.user1, name='mine', tags=['old'])
+        shared = RecipeFactory(author=self.user2, name='shared')
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        user3 = User.objects.create(email='user3@test.com', username='user3@test.com')
+        other = RecipeFactory(author=user3, name='not mine')
+        updated_at = own.updated_at
+
+        resp = self.client.patch(self.url, [
+            {'id': str(own.pk), 'name': 'still mine', 'tags': ['new']},
+            {'id': str(shared.pk), 'notes': 'edited'},
+            {'id': str(other.pk), 'name': 'stolen'},
+            {'name': 'no id'},
+        ], format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['index'] for r in resp.json()['results']], [0, 1])
+        self.assertEqual(resp.json()['errors'], [
+            {'index': 2, 'errors': {'id': ['Not found.']}},
+            {'index': 3, 'errors': {'id': ['A valid recipe id is required.']}},
+        ])
+        own.refresh_from_db()
+        shared.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(own.name, 'still mine')
+        self.assertEqual(list(own.tags.names()), ['new'])
+        self.assertGreater(own.updated_at, updated_at)
+        self.assertEqual(shared.name, 'shared')
+        self.assertEqual(shared.notes, 'edited')
+        self.assertEqual(shared.author, self.user2)
+        self.assertEqual(other.name, 'not mine')
+
+    def test_bulk_update_validates_items(self):
+        recipe = RecipeFactory(author=self.user1)
+
+        resp = self.client.patch(self.url, [
+            {'id': str(recipe.pk), 'name': ''},
+        ], format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', resp.json()['errors'][0]['errors'])
+
+    def test_bulk_delete(self):
+        own = RecipeFactory(author=self.user1, tags=['soup'])
+        other = RecipeFactory(author=self.user2)
+
+        resp = self.client.delete(self.url, [str(own.pk), {'id': str(other.pk)}], format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(resp.json()['results'], [
+            {'index': 0, 'id': str(own.pk), 'slug': own.slug},
+        ])
+        self.assertFalse(Recipe.objects.filter(pk=own.pk).exists())
+        self.assertTrue(Recipe.objects.filter(pk=other.pk).exists())
+
+    def test_viewers_cant_bulk_update_or_delete(self):
+        recipe = RecipeFactory(author=self.user2, name='shared')
+        ShareConfigFactory(granter=self.user2, grantee=self.user1, role=ShareConfig.VIEWER)
+        error = {'index': 0, 'errors': {'id': ['You do not have permission to edit this recipe.']}}
+
+        resp = self.client.patch(self.url, [{'id': str(recipe.pk), 'name': 'edited'}], format='json')
+        self.assertEqual(resp.json()['errors'], [error])
+
+        resp = self.client.delete(self.url, [str(recipe.pk)], format='json')
+        self.assertEqual(resp.json()['errors'], [error])
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'shared')
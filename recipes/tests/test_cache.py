@@ -0,0 +1,287 @@
+import tempfile
+import threading
+import time
+
+from django.db.models.signals import m2m_changed
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from recipes import tags
+from recipes.cache import (
+    cache_key,
+    get_cache,
+    get_recipe_detail,
+    invalidate_recipe_detail,
+    load_recipe_detail,
+)
+from recipes.factories import RecipeFactory, ShareConfigFactory
+from recipes.models import Recipe, RecipeTag, TaggedRecipe
+
+from .test_views import BaseRecipesTestCase
+
+
+class RecipeDetailCacheTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_authenticate(None)
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def get(self, recipe, by='pk', **extra):
+        url = reverse('recipes-detail', kwargs={'pk': getattr(recipe, by)})
+        return self.client.get(url, **extra)
+
+    def test_anonymous_detail_is_cached_by_id_and_slug(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+
+        resp = self.get(recipe)
+        with self.assertNumQueries(0):
+            cached_by_pk = self.get(recipe)
+            cached_by_slug = self.get(recipe, by='slug')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_by_pk.json(), resp.json())
+        self.assertEqual(cached_by_slug.json(), resp.json())
+        self.assertEqual(cached_by_slug['ETag'], resp['ETag'])
+        self.assertEqual(resp.json()['tags'], ['soup'])
+
+    def test_conditional_get_is_answered_from_cache(self):
+        recipe = RecipeFactory(author=self.user1)
+        etag = self.get(recipe)['ETag']
+
+        with self.assertNumQueries(0):
+            resp = self.get(recipe, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cache_is_invalidated_when_recipe_is_saved(self):
+        recipe = RecipeFactory(author=self.user1, name='original name')
+        self.get(recipe, by='slug')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'updated name'
+            recipe.save()
+
+        self.assertEqual(self.get(recipe).json()['name'], 'updated name')
+        self.assertEqual(self.get(recipe, by='slug').json()['name'], 'updated name')
+
+    def test_cache_is_invalidated_when_tags_change(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+        self.get(recipe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add('stew')
+
+        self.assertEqual(self.get(recipe).json()['tags'], ['soup', 'stew'])
+
+    def test_cache_is_invalidated_when_a_tag_is_renamed_or_deleted(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+        etag = self.get(recipe)['ETag']
+        tag = RecipeTag.objects.get(name='soup')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Soups'
+            tag.save()
+
+        resp = self.get(recipe, by='slug')
+        self.assertEqual(resp.json()['tags'], ['Soups'])
+        self.assertNotEqual(resp['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+
+        self.assertEqual(self.get(recipe).json()['tags'], [])
+
+    def test_cache_is_invalidated_when_tagged_from_the_tag_side(self):
+        recipe = RecipeFactory(author=self.user1)
+        self.get(recipe)
+        tag = RecipeTag.objects.create(name='stew')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaggedRecipe.objects.create(tag=tag, content_object=recipe)
+            m2m_changed.send(
+                sender=TaggedRecipe, instance=tag, action='post_add', reverse=True,
+                model=Recipe, pk_set={recipe.pk}, using='default',
+            )
+
+        self.assertEqual(self.get(recipe).json()['tags'], ['stew'])
+
+    def test_cache_is_invalidated_when_the_owner_changes_email(self):
+        recipe = RecipeFactory(author=self.user1)
+        self.get(recipe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user1.email = 'renamed@test.com'
+            self.user1.save()
+
+        self.assertEqual(self.get(recipe).json()['owner'], 'renamed@test.com')
+
+    def test_cache_is_invalidated_when_recipe_is_deleted(self):
+        recipe = RecipeFactory(author=self.user1)
+        self.get(recipe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+        self.assertEqual(self.get(recipe).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(recipe, by='slug').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_fetch_racing_an_invalidation_is_not_cached(self):
+        recipe = RecipeFactory(author=self.user1)
+        lookup = {'pk': recipe.pk}
+
+        def fetch():
+            entry = load_recipe_detail(lookup)
+            # The recipe changes after it's been read, but before the
+            # entry is stored
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_recipe_detail(recipe)
+            return entry
+
+        entry = get_recipe_detail('pk', recipe.pk, fetch)
+
+        self.assertEqual(entry['pk'], str(recipe.pk))
+        self.assertIsNone(get_cache().get(cache_key('pk', recipe.pk)))
+        self.assertIsNone(get_cache().get(cache_key('slug', recipe.slug)))
+        # The next fetch is stored
+        get_recipe_detail('pk', recipe.pk, lambda: load_recipe_detail(lookup))
+        self.assertIsNotNone(get_cache().get(cache_key('pk', recipe.pk)))
+
+    def test_authenticated_requests_are_not_cached(self):
+        recipe = RecipeFactory(author=self.user1)
+        self.client.force_authenticate(self.user1)
+        self.get(recipe)
+
+        with self.assertNumQueries(2):
+            self.get(recipe)
+
+    def test_file_based_cache(self):
+        recipe = RecipeFactory(author=self.user1)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cache_dir,
+            }}):
+                resp = self.get(recipe)
+                with self.assertNumQueries(0):
+                    cached = self.get(recipe, by='slug')
+
+        self.assertEqual(cached.json(), resp.json())
+
+
+@override_settings(RECIPES_TAG_COUNTS_CACHE_TIMEOUT=300)
+class TagCountsCacheTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tags.get_cache().clear()
+        self.addCleanup(tags.get_cache().clear)
+        self.recipe = RecipeFactory(author=self.user1, tags=['soup'])
+
+    def get_counts(self, **params):
+        resp = self.client.get(reverse('recipe-tags'), params)
+        return {tag['slug']: tag['count'] for tag in resp.json()}
+
+    def test_counts_are_cached(self):
+        self.assertEqual(self.get_counts(), {'soup': 1})
+
+        with self.assertNumQueries(0):
+            # Filtered from the cached counts
+            self.assertEqual(self.get_counts(min_count=2), {})
+
+    def test_cache_is_invalidated_when_tags_change(self):
+        other = RecipeFactory(author=self.user1)
+        self.get_counts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.tags.add('soup', 'stew')
+        self.assertEqual(self.get_counts(), {'soup': 2, 'stew': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.remove('soup')
+        self.assertEqual(self.get_counts(), {'soup': 1, 'stew': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.get_counts(), {})
+
+    def test_cache_is_invalidated_for_users_with_access(self):
+        ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        self.client.force_authenticate(self.user2)
+        self.get_counts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeFactory(author=self.user1).tags.add('stew')
+        self.assertEqual(self.get_counts(), {'soup': 1, 'stew': 1})
+
+    def test_cache_is_invalidated_when_sharing_changes(self):
+        self.client.force_authenticate(self.user2)
+        self.assertEqual(self.get_counts(), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            share = ShareConfigFactory(granter=self.user1, grantee=self.user2)
+        self.assertEqual(self.get_counts(), {'soup': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            share.delete()
+        self.assertEqual(self.get_counts(), {})
+
+    def test_cache_is_invalidated_by_copies(self):
+        self.client.force_authenticate(self.user2)
+        self.get_counts()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.copy_for_user(self.recipe.pk, self.user2.pk)
+        self.assertEqual(self.get_counts(), {'soup': 1})
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def test_concurrent_misses_fetch_once(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'pk': 'abc', 'slug': 'abc-soup', 'data': {}}
+
+        results = []
+        start = threading.Barrier(10)
+
+        def request():
+            start.wait()
+            results.append(get_recipe_detail('slug', 'abc-soup', fetch))
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(get_recipe_detail('pk', 'abc', fetch)['slug'], 'abc-soup')
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_another_process_holding_the_lock(self):
+        cache = get_cache()
+        cache.add('recipe-detail:pk:abc:lock', 1)
+
+        def other_process():
+            time.sleep(0.1)
+            cache.set('recipe-detail:pk:abc', {'pk': 'abc', 'slug': 'abc-soup'})
+            cache.delete('recipe-detail:pk:abc:lock')
+
+        thread = threading.Thread(target=other_process)
+        thread.start()
+        entry = get_recipe_detail('pk', 'abc', lambda: self.fail('fetched twice'))
+        thread.join()
+
+        self.assertEqual(entry['slug'], 'abc-soup')
+
+    def test_missing_recipes_are_not_cached(self):
+        self.assertIsNone(get_recipe_detail('pk', 'abc', lambda: None))
+        self.assertIsNone(get_cache().get('recipe-detail:pk:abc'))
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import httpx
+import requests
+from django.test import SimpleTestCase
+
+from recipes_api.http_client import AsyncHTTPClient, CircuitOpenError, HTTPClient
+
+from .jwks_stub import StubJWKSServer
+from .test_authentication import PUBLIC_JWK_1, FakeClock
+
+
+class HTTPClientTestCase(SimpleTestCase):
+    client_class = HTTPClient
+    timeout_error = requests.Timeout
+    connection_error = requests.ConnectionError
+    status_error = requests.HTTPError
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.stub = StubJWKSServer(keys=[PUBLIC_JWK_1]).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        self.http = self.client_class(
+            connect_timeout=1,
+            read_timeout=0.2,
+            failure_threshold=2,
+            reset_timeout=30,
+            clock=self.clock,
+        )
+
+    def get_json(self):
+        return self.http.get_json(self.stub.url)
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.assertEqual(self.get_json()['keys'][0]['kid'], 'key-1')
+
+        self.assertEqual(self.stub.request_count, 3)
+        self.assertEqual(self.stub.connection_count, 1)
+
+    def test_slow_responses_time_out(self):
+        self.stub.delay = 1
+
+        start = time.monotonic()
+        with self.assertRaises(self.timeout_error):
+            self.get_json()
+
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_dropped_connections_fail(self):
+        self.stub.drop = True
+
+        with self.assertRaises(self.connection_error):
+            self.get_json()
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.stub.status = 503
+        for _ in range(2):
+            with self.assertRaises(self.status_error):
+                self.get_json()
+
+        with self.assertRaises(CircuitOpenError):
+            self.get_json()
+        self.assertEqual(self.stub.request_count, 2)
+
+    def test_circuit_closes_after_successful_trial(self):
+        self.stub.status = 503
+        for _ in range(2):
+            with self.assertRaises(self.status_error):
+                self.get_json()
+
+        self.stub.status = 200
+        self.clock.now += 30
+        self.get_json()
+        self.get_json()
+
+        self.assertEqual(self.stub.request_count, 4)
+
+    def test_failed_trial_reopens_circuit(self):
+        self.stub.status = 503
+        for _ in range(2):
+            with self.assertRaises(self.status_error):
+                self.get_json()
+
+        self.clock.now += 30
+        with self.assertRaises(self.status_error):
+            self.get_json()
+        with self.assertRaises(CircuitOpenError):
+            self.get_json()
+
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_client_errors_dont_open_circuit(self):
+        self.stub.status = 404
+        for _ in range(3):
+            with self.assertRaises(self.status_error):
+                self.get_json()
+
+        self.assertEqual(self.stub.request_count, 3)
+
+
+class AsyncHTTPClientTestCase(HTTPClientTestCase):
+    client_class = AsyncHTTPClient
+    timeout_error = httpx.TimeoutException
+    connection_error = httpx.TransportError
+    status_error = httpx.HTTPStatusError
+
+    def get_json(self):
+        async def get_json():
+            try:
+                return await self.http.get_json(self.stub.url)
+            finally:
+                await self.http.aclose()
+        return asyncio.run(get_json())
+
+    def test_connections_are_reused(self):
+        async def get_json():
+            try:
+                for _ in range(3):
+                    await self.http.get_json(self.stub.url)
+            finally:
+                await self.http.aclose()
+
+        asyncio.run(get_json())
+
+        self.assertEqual(self.stub.request_count, 3)
+        self.assertEqual(self.stub.connection_count, 1)
@@ -0,0 +1,206 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+
+from recipes import importer
+from recipes.importer import RecipeFileError, RecipeFileReader
+from recipes.models import Recipe
+
+from .test_views import BaseRecipesTestCase
+
+
+def ndjson(items):
+    return ''.join(json.dumps(item) + '\n' for item in items).encode()
+
+
+class RecipeFileReaderTestCase(SimpleTestCase):
+    items = [
+        {'name': 'Crème brûlée', 'tags': ['dessert']},
+        {'name': 'Dal', 'notes': 'x' * 20},
+        {'name': '麻婆豆腐'},
+    ]
+
+    def read(self, data, **kwargs):
+        # A tiny read size splits recipes (and multi-byte characters)
+        # across reads
+        return list(RecipeFileReader(io.BytesIO(data), read_size=3, **kwargs))
+
+    def test_ndjson(self):
+        self.assertEqual(self.read(ndjson(self.items)), self.items)
+
+    def test_json_array(self):
+        data = json.dumps(self.items, ensure_ascii=False, indent=2).encode()
+        self.assertEqual(self.read(data), self.items)
+
+    def test_empty_files(self):
+        self.assertEqual(self.read(b''), [])
+        self.assertEqual(self.read(b' [ ] '), [])
+
+    def test_resume_from_offset(self):
+        for data in [ndjson(self.items), json.dumps(self.items, ensure_ascii=False).encode()]:
+            reader = RecipeFileReader(io.BytesIO(data), read_size=3)
+            iterator = iter(reader)
+            self.assertEqual(next(iterator), self.items[0])
+
+            resumed = RecipeFileReader(
+                io.BytesIO(data),
+                offset=reader.offset,
+                in_array=reader.in_array,
+                read_size=3,
+            )
+            self.assertEqual(list(resumed), self.items[1:])
+
+    def test_invalid_files(self):
+        for data in [b'{"name": "a"}\n{"name": ', b'[{"name": "a"} {"name": "b"}]', b'[{"name": "a"},']:
+            with self.subTest(data=data), self.assertRaises(RecipeFileError):
+                self.read(data)
+
+    def test_recipes_are_not_buffered_without_limit(self):
+        with mock.patch.object(importer, 'MAX_ITEM_SIZE', 10):
+            with self.assertRaisesMessage(RecipeFileError, 'Recipe is too large'):
+                self.read(ndjson([{'name': 'x' * 20}]))
+
+
+class ImportRecipesCommandTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'recipes.ndjson')
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def call(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_recipes', self.path, '--author', self.user1.email, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import(self):
+        self.write(ndjson([
+            {'name': 'Red lentils', 'tags': ['indian']},
+            {'notes': 'no name'},
+            {'name': 'Chana masala'},
+        ]))
+
+        stdout, stderr = self.call('--batch-size', '2')
+
+        self.assertIn('Imported 2 recipes (1 failed)', stdout)
+        self.assertIn('rows/s', stdout)
+        self.assertIn('Recipe 1:', stderr)
+        recipe = Recipe.objects.get(name='Red lentils')
+        self.assertEqual(recipe.author, self.user1)
+        self.assertEqual(recipe.slug, Recipe.generate_slug(recipe.pk, recipe.name))
+        self.assertEqual(list(recipe.tags.names()), ['indian'])
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_interrupted_import_resumes(self):
+        self.write(json.dumps([{'name': f'recipe {i}'} for i in range(5)]).encode())
+        bulk_create_recipes = importer.bulk_create_recipes
+        calls = []
+
+        def interrupt_second_chunk(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return bulk_create_recipes(*args, **kwargs)
+
+        with mock.patch.object(importer, 'bulk_create_recipes', interrupt_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.call('--batch-size', '2')
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        stdout, _ = self.call('--batch-size', '2')
+
+        self.assertIn('Resuming from byte', stdout)
+        self.assertIn('Imported 5 recipes', stdout)
+        self.assertCountEqual(
+            Recipe.objects.values_list('name', flat=True),
+            [f'recipe {i}' for i in range(5)],
+        )
+
+    def test_chunk_committed_before_its_checkpoint_is_not_imported_twice(self):
+        self.write(json.dumps([{'name': f'recipe {i}', 'tags': ['soup']} for i in range(5)]).encode())
+        save = importer.Checkpoint.save
+        saves = []
+
+        def interrupt_second_chunk_save(checkpoint, **state):
+            # The first save is before anything is imported
+            saves.append(state)
+            if len(saves) == 3:
+                raise KeyboardInterrupt
+            save(checkpoint, **state)
+
+        with mock.patch.object(importer.Checkpoint, 'save', interrupt_second_chunk_save):
+            with self.assertRaises(KeyboardInterrupt):
+                self.call('--batch-size', '2')
+        self.assertEqual(Recipe.objects.count(), 4)
+
+        stdout, _ = self.call('--batch-size', '2')
+
+        self.assertIn('Imported 5 recipes (0 failed)', stdout)
+        self.assertCountEqual(
+            Recipe.objects.values_list('name', flat=True),
+            [f'recipe {i}' for i in range(5)],
+        )
+        for recipe in Recipe.objects.all():
+            self.assertEqual(list(recipe.tags.names()), ['soup'])
+
+    def test_checkpoint_for_another_file(self):
+        self.write(ndjson([{'name': 'recipe'}]))
+        importer.Checkpoint(f'{self.path}.checkpoint').save(
+            size=1, offset=0, in_array=None, imported=0, failed=0,
+        )
+
+        with self.assertRaises(CommandError):
+            self.call()
+        self.call('--restart')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_invalid_file(self):
+        self.write(b'{"name": "ok"}\n{"name": ')
+
+        with self.assertRaisesMessage(CommandError, 'Invalid JSON'):
+            self.call('--batch-size', '1')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+class ImportRecipesEndpointTestCase(BaseRecipesTestCase):
+    url = reverse('recipes-import')
+
+    def upload(self, data):
+        upload = SimpleUploadedFile('recipes.ndjson', data)
+        return self.client.post(self.url, {'file': upload}, format='multipart')
+
+    def test_import_upload(self):
+        resp = self.upload(ndjson([{'name': 'Red lentils'}, {'name': 'Dal'}]))
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(resp.json(), {'imported': 2, 'failed': 0, 'errors': []})
+        self.assertEqual(Recipe.objects.filter(author=self.user1).count(), 2)
+
+    def test_import_reports_errors(self):
+        resp = self.upload(ndjson([{'name': 'Red lentils'}, {'name': ''}]))
+
+        self.assertEqual(resp.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(resp.json()['errors'][0]['item'], 1)
+
+    def test_invalid_file(self):
+        resp = self.upload(b'[{"name": "Red lentils"}')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expected "]"', resp.json()['detail'])
+
+    def test_file_is_required(self):
+        resp = self.client.post(self.url, {}, format='multipart')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,110 @@
+import json
+import re
+
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from recipes.factories import RecipeFactory
+from recipes_api import performance
+from recipes_api.performance import MetricsRegistry, metrics_view
+
+from .test_views import BaseRecipesTestCase
+
+
+def parse_server_timing(header):
+    """
+    Returns {name: (duration, description)} for a Server-Timing header.
+    """
+    timings = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        timings[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return timings
+
+
+@override_settings(PERFORMANCE_SERVER_TIMING=True)
+class PerformanceMiddlewareTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        RecipeFactory.create_batch(3, author=self.user1, tags=['soup'])
+
+    def test_server_timing_header(self):
+        with self.assertNumQueries(2 + 1) as ctx:
+            resp = self.client.get(reverse('recipes-list'))
+
+        timings = parse_server_timing(resp['Server-Timing'])
+        self.assertEqual(timings['db'][1], f'{len(ctx.captured_queries)} queries')
+        self.assertGreater(timings['total'][0], 0)
+        self.assertLessEqual(timings['db'][0], timings['total'][0])
+        self.assertIn('serialize', timings)
+        self.assertIn('auth', timings)
+
+    async def test_async_views_are_measured(self):
+        token = await Token.objects.acreate(user=self.user1)
+
+        resp = await self.async_client.get(
+            reverse('async-recipes-list'),
+            headers={'Authorization': f'Token {token.key}'},
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        timings = parse_server_timing(resp['Server-Timing'])
+        self.assertNotEqual(timings['db'][1], '0 queries')
+        self.assertIn('serialize', timings)
+        self.assertIn('auth', timings)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        resp = self.client.get(reverse('recipes-list'))
+
+        self.assertNotIn('Server-Timing', resp)
+
+    def test_structured_log_line(self):
+        with self.assertLogs('recipes_api.performance', level='INFO') as logs:
+            self.client.get(reverse('recipes-list'))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['route'], 'recipes-list')
+        self.assertEqual(line['method'], 'GET')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['db_queries'], 3)
+        self.assertNotIn('queries', line)
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=1, PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with self.assertLogs('recipes_api.performance', level='WARNING') as logs:
+            self.client.get(reverse('recipes-list'))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertTrue(line['slow'])
+        self.assertEqual(len(line['queries']), 3)
+        self.assertIn('"recipes_recipe"', line['queries'][0]['sql'])
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=1, PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE=0)
+    def test_slow_requests_are_sampled(self):
+        with self.assertNoLogs('recipes_api.performance', level='WARNING'):
+            self.client.get(reverse('recipes-list'))
+
+    @override_settings(PERFORMANCE_METRICS=True)
+    def test_metrics(self):
+        registry = MetricsRegistry()
+        self.patch_registry(registry)
+        self.client.get(reverse('recipes-list'))
+        self.client.get(reverse('recipes-list'))
+
+        body = metrics_view(RequestFactory().get('/metrics')).content.decode()
+
+        labels = 'route="recipes-list",method="GET",status="200"'
+        self.assertIn(f'recipes_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'recipes_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertIn(f'recipes_db_queries_total{{{labels}}} 6.0', body)
+        self.assertRegex(body, re.escape(f'recipes_serialize_duration_seconds_total{{{labels}}} ') + r'\d')
+
+    def patch_registry(self, registry):
+        original = performance.registry
+        performance.registry = registry
+        self.addCleanup(setattr, performance, 'registry', original)
+
@@ -0,0 +1,128 @@
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
+from rest_framework import status
+
+from recipes.factories import ShareConfigFactory
+from recipes.models import Recipe, RecipeTag, TaggedRecipe
+
+from .test_views import BaseRecipesTestCase
+
+
+def create_recipes(author, count, tag_names=('indian', 'quick')):
+    """
+    Quickly create `count` tagged recipes for `author`.
+    """
+    tags = [
+        RecipeTag.objects.get_or_create(name=name, defaults={'slug': name})[0]
+        for name in tag_names
+    ]
+    recipes = []
+    for i in range(count):
+        pk = uuid.uuid4()
+        name = f'recipe {i}'
+        recipes.append(Recipe(
+            id=pk,
+            author=author,
+            name=name,
+            slug=Recipe.generate_slug(pk, name),
+            ingredients='1 cup of rice',
+        ))
+    Recipe.objects.bulk_create(recipes)
+
+    content_type = ContentType.objects.get_for_model(Recipe)
+    TaggedRecipe.objects.bulk_create([
+        TaggedRecipe(content_type=content_type, object_id=recipe.pk, tag=tag)
+        for recipe in recipes
+        for tag in tags
+    ])
+    return recipes
+
+
+class QueryCountTestCase(BaseRecipesTestCase):
+    """
+    The number of queries an endpoint runs must not grow with the number
+    of recipes. If one of these fails, something is being loaded per row.
+    """
+    sizes = [1, 100, 1000]
+    # One aggregate query builds the list's ETag
+    list_queries = 2 + 1
+
+    def setUp(self) -> None:
+        super().setUp()
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        # Make sure the content type lookup is cached before counting
+        ContentType.objects.get_for_model(Recipe)
+
+    def grow_to(self, size):
+        """
+        Split recipes between user1 and the user sharing with them.
+        """
+        existing = Recipe.objects.count()
+        for i, author in enumerate([self.user1, self.user2]):
+            count = (size - existing + 1 - i) // 2
+            create_recipes(author, count)
+        self.assertEqual(Recipe.objects.count(), size)
+
+    def test_list(self):
+        url = reverse('recipes-list')
+        for size in self.sizes:
+            self.grow_to(size)
+            with self.subTest(size=size), self.assertNumQueries(self.list_queries):
+                resp = self.client.get(url)
+                self.assertEqual(len(resp.json()), size)
+
+    def test_list_summary(self):
+        url = reverse('recipes-list')
+        for size in self.sizes:
+            self.grow_to(size)
+            with self.subTest(size=size), self.assertNumQueries(self.list_queries):
+                resp = self.client.get(f'{url}?view=summary')
+                self.assertEqual(len(resp.json()), size)
+
+    def test_list_filtered_by_tag(self):
+        url = reverse('recipes-list')
+        for size in self.sizes:
+            self.grow_to(size)
+            with self.subTest(size=size), self.assertNumQueries(self.list_queries):
+                resp = self.client.get(f'{url}?tags=indian')
+                self.assertEqual(len(resp.json()), size)
+
+    def test_retrieve(self):
+        for size in self.sizes:
+            self.grow_to(size)
+            recipe = Recipe.objects.order_by('-author_id').first()
+            url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+            with self.subTest(size=size), self.assertNumQueries(2):
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_tag_list(self):
+        url = reverse('recipe-tags')
+        for size in self.sizes:
+            self.grow_to(size)
+            with self.subTest(size=size), self.assertNumQueries(1):
+                resp = self.client.get(url)
+                self.assertEqual(len(resp.json()), 2)
+
+    def test_copy(self):
+        for size in self.sizes:
+            self.grow_to(size)
+            recipe = Recipe.objects.order_by('-author_id').first()
+            url = reverse('recipes-copy-for-user', kwargs={'pk': recipe.pk})
+            # Copying (with tags) takes 6, serializing the copy 2
+            with self.subTest(size=size), self.assertNumQueries(8):
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            Recipe.objects.filter(pk=resp.json()['id']).delete()
+
+    def test_batch_copy(self):
+        url = reverse('recipes-copy')
+        for size in self.sizes:
+            self.grow_to(size)
+            # Select recipes, select taggings, savepoint, two inserts, release
+            with self.subTest(size=size), self.assertNumQueries(6):
+                resp = self.client.post(url, {'tags': ['indian']}, format='json')
+                self.assertEqual(len(resp.json()), size)
+            Recipe.objects.filter(pk__in=[item['id'] for item in resp.json()]).delete()
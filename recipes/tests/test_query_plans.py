@@ -0,0 +1,35 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from recipes import bench, query_plans
+from recipes.models import Recipe, ShareConfig
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    The hot queries must be answerable from indexes, however much data
+    there is.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        bench.seed(users=20, recipes_per_user=20, fanout=3, tags=30)
+        cls.user = bench.bench_users().order_by('pk').first()
+        cls.other_user = cls.user.get_recipes().exclude(author=cls.user).first().author
+        cls.recipe = Recipe.objects.filter(author=cls.user).first()
+
+    def test_hot_queries_use_indexes(self):
+        queries = query_plans.get_hot_queries(self.user, self.other_user, self.recipe)
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                self.assertEqual(query_plans.sequential_scans(queryset), [])
+
+    def test_finds_sequential_scans(self):
+        queryset = Recipe.objects.filter(notes='unindexed')
+
+        self.assertEqual(query_plans.sequential_scans(queryset), ['recipes_recipe'])
+
+    def test_share_configs_are_unique(self):
+        share = ShareConfig.objects.filter(granter=self.user).first()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ShareConfig.objects.create(granter=share.granter, grantee=share.grantee, role=ShareConfig.VIEWER)
@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from recipes import bench, replay
+from recipes.factories import RecipeFactory
+from recipes.models import RecipeTag
+from recipes_api.traffic import read_capture
+
+from .test_views import BaseRecipesTestCase
+
+
+class TrafficCaptureTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'capture-{pid}.jsonl')
+        settings_override = override_settings(
+            TRAFFIC_CAPTURE_PATH=self.path,
+            MIDDLEWARE=['recipes_api.traffic.TrafficCaptureMiddleware', *settings.MIDDLEWARE],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def read(self):
+        return list(read_capture(self.path.format(pid=os.getpid())))
+
+    def test_captures_requests(self):
+        recipe = RecipeFactory(author=self.user1)
+        self.client.get(reverse('recipes-list') + '?tags=soup')
+        self.client.post(reverse('recipes-copy'), {'ids': [str(recipe.pk)]}, format='json')
+        self.client.logout()
+        self.client.get(reverse('recipes-detail', kwargs={'pk': recipe.slug}))
+
+        listed, copied, viewed = self.read()
+        self.assertEqual(listed['method'], 'GET')
+        self.assertEqual(listed['path'], reverse('recipes-list'))
+        self.assertEqual(listed['query'], 'tags=soup')
+        self.assertEqual(listed['user'], self.user1.pk)
+        self.assertEqual(listed['status'], 200)
+        self.assertGreater(listed['duration_ms'], 0)
+        self.assertEqual(copied['body'], {'ids': [str(recipe.pk)]})
+        self.assertIsNone(viewed['user'])
+        self.assertLessEqual(listed['ts'], copied['ts'])
+
+    async def test_captures_async_requests(self):
+        # A sync only middleware would run the whole chain in sync mode
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('request_logging.')]
+        with override_settings(MIDDLEWARE=middleware), \
+                mock.patch('recipes_api.traffic.sync_to_async', wraps=sync_to_async) as offloaded:
+            await self.async_client.get(reverse('async-recipes-list'))
+
+        (request,) = self.read()
+        self.assertEqual(request['path'], reverse('async-recipes-list'))
+        self.assertEqual(request['status'], 401)
+        # The file is written from a thread, not the event loop
+        offloaded.assert_called_once()
+
+    @override_settings(TRAFFIC_CAPTURE_SAMPLE_RATE=0)
+    def test_sampling(self):
+        self.client.get(reverse('recipes-list'))
+
+        self.assertFalse(os.path.exists(self.path.format(pid=os.getpid())))
+
+
+class DataMapperTestCase(TestCase):
+    def setUp(self) -> None:
+        bench.seed(users=3, recipes_per_user=4, fanout=1, tags=5)
+        self.users = list(bench.bench_users().order_by('pk'))
+        self.mapper = replay.DataMapper(self.users)
+
+    def record(self, path, user=1, **kwargs):
+        return {'ts': 0, 'method': 'GET', 'path': path, 'query': '', 'body': None, 'user': user, **kwargs}
+
+    def test_maps_users_in_order(self):
+        self.assertEqual([self.mapper.user(user_id) for user_id in (9, 7, 9, 5, 3)], [
+            self.users[0], self.users[1], self.users[0], self.users[2], self.users[0],
+        ])
+        self.assertIsNone(self.mapper.user(None))
+
+    def test_maps_recipes_onto_accessible_recipes(self):
+        by_id = self.mapper.map(self.record('/recipes/f0d3b4a8-0b0e-4d2b-9d1a-3c1b2a0e9f11/'))
+        by_slug = self.mapper.map(self.record('/async/recipes/tomato-soup-abc/'))
+        again = self.mapper.map(self.record('/recipes/tomato-soup-abc/can_user_edit/'))
+
+        accessible = self.users[0].get_recipes()
+        pk = by_id.path.split('/')[2]
+        self.assertTrue(accessible.filter(pk=pk).exists())
+        slug = by_slug.path.split('/')[3]
+        self.assertTrue(accessible.filter(slug=slug).exists())
+        self.assertEqual(again.path, f'/recipes/{slug}/can_user_edit/')
+        self.assertEqual(by_id.route, 'recipes-detail')
+        self.assertEqual(by_slug.route, 'async-recipes-detail')
+
+    def test_maps_tags_and_bodies(self):
+        mapped = self.mapper.map(self.record(
+            '/recipes/copy/',
+            method='POST',
+            query='tags=soup,dessert&view=summary',
+            body={'ids': ['a-1', 'b-2']},
+        ))
+
+        path, query = mapped.path.split('?')
+        tags, view = query.split('&')
+        self.assertTrue(set(tags[len('tags='):].split(',')) <= set(RecipeTag.objects.values_list('slug', flat=True)))
+        self.assertEqual(view, 'view=summary')
+        self.assertEqual(len(set(mapped.body['ids'])), 2)
+        self.assertEqual(
+            self.users[0].get_recipes().filter(slug__in=mapped.body['ids']).count(), 2,
+        )
+
+    def test_prepare(self):
+        records = [self.record('/recipes/'), self.record('/recipes/', user=None, method='POST')]
+
+        requests = replay.prepare(records, self.users)
+        self.assertIsNotNone(requests[0].token)
+        self.assertIsNone(requests[1].token)
+        self.assertEqual(len(replay.prepare(records, self.users, read_only=True)), 1)
+
+
+class FakeTarget:
+    def __init__(self, statuses):
+        self.statuses = iter(statuses)
+        self.sent = []
+
+    def send(self, request):
+        self.sent.append(request.path)
+        status = next(self.statuses)
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+    def close(self):
+        pass
+
+
+class ReplayTestCase(SimpleTestCase):
+    def request(self, ts, path='/recipes/'):
+        return replay.ReplayRequest(ts=ts, method='GET', path=path, body=None, user=None, route='recipes-list')
+
+    def test_report(self):
+        target = FakeTarget([200, 404, 500, ConnectionError()])
+
+        report = replay.replay(
+            [self.request(ts) for ts in range(4)], target, speed=0, concurrency=1,
+        ).as_dict()
+
+        self.assertEqual(target.sent, ['/recipes/'] * 4)
+        self.assertEqual(report['requests'], 4)
+        self.assertEqual(report['errors'], 2)
+        self.assertEqual(report['error_rate'], 0.5)
+        self.assertEqual(report['client_errors'], 1)
+        self.assertEqual(report['exceptions'], {'ConnectionError': 1})
+        self.assertEqual(sum(report['histogram'].values()), 3)
+        self.assertEqual(report['routes']['recipes-list']['requests'], 4)
+
+    def test_preserves_timing(self):
+        delays = []
+        now = [0.0]
+
+        def sleep(seconds):
+            delays.append(round(seconds, 6))
+            now[0] += seconds
+
+        replay.replay(
+            [self.request(ts) for ts in (100, 100, 101, 104)],
+            FakeTarget([200] * 4),
+            speed=2,
+            concurrency=2,
+            clock=lambda: now[0],
+            sleep=sleep,
+        )
+
+        self.assertEqual(delays, [0.5, 1.5])
+
+
+class ReplayTrafficCommandTestCase(TransactionTestCase):
+    # The test client runs in the replay's threads, so their database
+    # connections need to see the seeded data
+
+    def test_replay_traffic(self):
+        bench.seed(users=2, recipes_per_user=3, fanout=1, tags=5)
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            for i, path in enumerate(['/recipes/', '/recipes/some-recipe/', '/async/recipe-tags/']):
+                f.write(json.dumps({
+                    'ts': i / 100, 'method': 'GET', 'path': path, 'query': '', 'body': None, 'user': 42,
+                }) + '\n')
+        self.addCleanup(os.remove, f.name)
+        stdout = io.StringIO()
+
+        call_command('replay_traffic', f.name, '--speed', '0', '--concurrency', '2', stdout=stdout)
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['client_errors'], 0)
+        self.assertCountEqual(report['routes'], ['recipes-list', 'recipes-detail', 'async-recipe-tags'])
+
+    def test_requires_users(self):
+        with self.assertRaises(CommandError):
+            call_command('replay_traffic', 'missing.jsonl', stdout=io.StringIO())
@@ -0,0 +1,234 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import cache as recipe_cache
+from recipes.factories import RecipeFactory
+from recipes.models import Recipe
+from recipes_api.replicas import ReplicaMiddleware, ReplicaRouter, cache_key, get_cache, use_primary
+from users.models import User
+
+router = ReplicaRouter()
+
+
+def read_database(request):
+    # What the view sees: the URL is resolved once the request has been
+    # through the middleware
+    request.resolver_match = resolve(request.path)
+    return HttpResponse(router.db_for_read(Recipe) or 'default')
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+        self.user = User(pk=1, email='user1@test.com', username='user1@test.com')
+        self.addCleanup(get_cache().delete, cache_key(self.user.pk))
+
+    def read_from(self, request, user=None, write=False):
+        def get_response(request):
+            # As the view authenticates the request
+            request.user = user
+            if write:
+                router.db_for_write(Recipe)
+            return read_database(request)
+
+        return ReplicaMiddleware(get_response)(request).content.decode()
+
+    def test_reads_from_replicas(self):
+        for url in [
+            reverse('recipes-list'),
+            reverse('recipes-detail', kwargs={'pk': 'some-recipe'}),
+            reverse('recipes-can-user-edit', kwargs={'pk': 'some-recipe'}),
+            reverse('recipe-tags'),
+            reverse('async-recipes-detail', kwargs={'pk': 'some-recipe'}),
+        ]:
+            with self.subTest(url=url):
+                self.assertIn(self.read_from(self.factory.get(url)), settings.REPLICA_DATABASES)
+
+    def test_other_routes_read_from_the_primary(self):
+        self.assertEqual(self.read_from(self.factory.get(reverse('recipes-autocomplete'))), 'default')
+
+    def test_writes_go_to_the_primary(self):
+        request = self.factory.patch(reverse('recipes-detail', kwargs={'pk': 'some-recipe'}))
+
+        self.assertEqual(self.read_from(request, self.user, write=True), 'default')
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    def test_reads_from_the_primary_after_a_write(self):
+        self.read_from(self.factory.post(reverse('recipes-copy')), self.user, write=True)
+        # Another client (no cookies, a different origin) of the same user
+        request = self.factory.get(reverse('recipes-list'), HTTP_ORIGIN='https://other.example.com')
+
+        self.assertEqual(self.read_from(request, self.user), 'default')
+
+        other_user = User(pk=2, email='user2@test.com', username='user2@test.com')
+        self.assertIn(self.read_from(self.factory.get(reverse('recipes-list')), other_user), settings.REPLICA_DATABASES)
+        self.assertIn(self.read_from(self.factory.get(reverse('recipes-list'))), settings.REPLICA_DATABASES)
+
+        get_cache().delete(cache_key(self.user.pk))
+        self.assertIn(self.read_from(self.factory.get(reverse('recipes-list')), self.user), settings.REPLICA_DATABASES)
+
+    def test_reads_from_the_primary_after_a_get_that_writes(self):
+        # copy_for_user is a GET, but creates a Recipe
+        url = reverse('recipes-copy-for-user', kwargs={'pk': 'some-recipe'})
+        self.read_from(self.factory.get(url), self.user, write=True)
+
+        self.assertEqual(self.read_from(self.factory.get(reverse('recipes-list')), self.user), 'default')
+
+    def test_requests_that_dont_write_arent_sticky(self):
+        self.read_from(self.factory.post(reverse('recipes-copy')), self.user)
+
+        self.assertIn(self.read_from(self.factory.get(reverse('recipes-list')), self.user), settings.REPLICA_DATABASES)
+
+    def test_reads_after_a_write_in_the_same_request(self):
+        def get_response(request):
+            request.resolver_match = resolve(request.path)
+            before = router.db_for_read(Recipe)
+            router.db_for_write(Recipe)
+            return HttpResponse(f'{before},{router.db_for_read(Recipe) or "default"}')
+
+        response = ReplicaMiddleware(get_response)(self.factory.get(reverse('recipes-list')))
+
+        before, after = response.content.decode().split(',')
+        self.assertIn(before, settings.REPLICA_DATABASES)
+        self.assertEqual(after, 'default')
+
+    async def test_async_reads_from_the_primary_after_a_write(self):
+        async def get_response(request):
+            request.user = self.user
+            if request.method == 'POST':
+                router.db_for_write(Recipe)
+            return read_database(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        await middleware(self.factory.post(reverse('recipes-copy')))
+        response = await middleware(self.factory.get(reverse('async-recipes-list')))
+
+        self.assertEqual(response.content.decode(), 'default')
+
+    def test_use_primary(self):
+        def get_response(request):
+            request.resolver_match = resolve(request.path)
+            with use_primary():
+                return HttpResponse(router.db_for_read(Recipe) or 'default')
+
+        response = ReplicaMiddleware(get_response)(self.factory.get(reverse('recipes-list')))
+
+        self.assertEqual(response.content.decode(), 'default')
+
+    def test_cache_fills_read_from_the_primary(self):
+        def get_response(request):
+            request.resolver_match = resolve(request.path)
+            entry = recipe_cache.get_recipe_detail('pk', 'some-recipe', lambda: {
+                'pk': 'some-recipe',
+                'slug': 'some-recipe',
+                'database': router.db_for_read(Recipe) or 'default',
+            })
+            return HttpResponse(entry['database'])
+
+        self.addCleanup(recipe_cache.get_cache().delete_many, recipe_cache.entry_keys('some-recipe', 'some-recipe'))
+        url = reverse('recipes-detail', kwargs={'pk': 'some-recipe'})
+        response = ReplicaMiddleware(get_response)(self.factory.get(url))
+
+        self.assertEqual(response.content.decode(), 'default')
+
+    def test_streaming_responses(self):
+        def get_response(request):
+            request.resolver_match = resolve(request.path)
+            return StreamingHttpResponse(router.db_for_read(Recipe) for _ in range(2))
+
+        response = ReplicaMiddleware(get_response)(self.factory.get(reverse('recipes-export')))
+
+        replica, again = [chunk.decode() for chunk in response.streaming_content]
+        self.assertIn(replica, settings.REPLICA_DATABASES)
+        self.assertEqual(again, replica)
+
+    def test_outside_of_requests(self):
+        self.assertIsNone(router.db_for_read(Recipe))
+
+    async def test_async(self):
+        async def get_response(request):
+            return read_database(request)
+
+        response = await ReplicaMiddleware(get_response)(self.factory.get(reverse('async-recipes-list')))
+
+        self.assertIn(response.content.decode(), settings.REPLICA_DATABASES)
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'Set DJANGO_DB_REPLICA_HOSTS to test with a replica')
+class ReplicaTestCase(TransactionTestCase):
+    # Replicas are test mirrors of the primary, which only see committed
+    # data. Run with, e.g.:
+    # DJANGO_DB_REPLICA_HOSTS=localhost manage.py test recipes.tests.test_replicas
+    databases = '__all__'
+
+    def setUp(self) -> None:
+        self.replica = settings.REPLICA_DATABASES[0]
+        settings_override = override_settings(REPLICA_DATABASES=[self.replica])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create(email='user1@test.com', username='user1@test.com')
+        self.addCleanup(get_cache().delete, cache_key(self.user.pk))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_databases(self, method, url, **kwargs):
+        """
+        Returns the response to a request, and the databases it queried.
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[self.replica]) as replica:
+            response = getattr(self.client, method)(url, format='json', **kwargs)
+        databases = {'default': len(primary), self.replica: len(replica)}
+        return response, {alias for alias, count in databases.items() if count}
+
+    def test_read_your_writes(self):
+        recipe = RecipeFactory(author=self.user, name='soup')
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+
+        response, databases = self.get_databases('get', url)
+        self.assertEqual(response.data['name'], 'soup')
+        self.assertEqual(databases, {self.replica})
+
+        response, databases = self.get_databases('patch', url, data={'name': 'stew'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(databases, {'default'})
+
+        response, databases = self.get_databases('get', url)
+        self.assertEqual(response.data['name'], 'stew')
+        self.assertEqual(databases, {'default'})
+
+        get_cache().delete(cache_key(self.user.pk))
+        _, databases = self.get_databases('get', reverse('recipes-list'))
+        self.assertEqual(databases, {self.replica})
+
+    def test_read_your_copies(self):
+        other_user = User.objects.create(email='user2@test.com', username='user2@test.com')
+        recipe = RecipeFactory(author=other_user, name='soup')
+
+        response, databases = self.get_databases('get', reverse('recipes-copy-for-user', kwargs={'pk': recipe.pk}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(databases, {'default'})
+
+        response, databases = self.get_databases('get', reverse('recipes-list'))
+        self.assertEqual([r['name'] for r in response.data], ['soup'])
+        self.assertEqual(databases, {'default'})
+
+    def test_authenticated_async_detail_reads_from_the_replica(self):
+        recipe = RecipeFactory(author=self.user, name='soup')
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        url = reverse('async-recipes-detail', kwargs={'pk': recipe.pk})
+        response, databases = self.get_databases('get', url)
+        self.assertEqual(response.json()['name'], 'soup')
+        self.assertEqual(databases, {self.replica})
@@ -0,0 +1,92 @@
+import uuid
+
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from recipes import slugs
+from recipes.factories import RecipeFactory
+from recipes.models import Recipe
+
+from .test_views import BaseRecipesTestCase
+
+
+class SlugLookupTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        slugs.slug_cache.clear()
+        self.addCleanup(slugs.slug_cache.clear)
+        self.recipe = RecipeFactory(author=self.user1, name='Red lentil soup')
+
+    def get_where(self, slug):
+        url = reverse('recipes-detail', kwargs={'pk': slug})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return ctx.captured_queries[0]['sql'].split(' WHERE ')[1]
+
+    def test_slug_lookups_use_slug_then_id(self):
+        where = self.get_where(self.recipe.slug)
+        self.assertIn(f'"recipes_recipe"."slug" = \'{self.recipe.slug}\'', where)
+        self.assertNotIn('"recipes_recipe"."id"', where)
+        self.assertEqual(slugs.slug_cache.get(self.recipe.slug), self.recipe.pk)
+
+        where = self.get_where(self.recipe.slug)
+        self.assertIn(f'"recipes_recipe"."id" = \'{self.recipe.pk}\'', where)
+
+    def test_slugs_that_dont_start_with_the_id(self):
+        for slug in ['deadbeef-legacy', 'legacy-soup']:
+            with self.subTest(slug=slug):
+                RecipeFactory(author=self.user1, slug=slug)
+
+                self.get_where(slug)
+
+    def test_stale_entries_dont_match_other_recipes(self):
+        other = RecipeFactory(author=self.user1)
+        slugs.slug_cache.set(self.recipe.slug, other.pk)
+
+        url = reverse('recipes-detail', kwargs={'pk': self.recipe.slug})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_forgets_slug(self):
+        slugs.remember(self.recipe)
+
+        self.recipe.delete()
+
+        self.assertIsNone(slugs.slug_cache.get(self.recipe.slug))
+
+    def test_slugs_are_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeFactory(author=self.user1, slug=self.recipe.slug)
+
+    def test_long_names_are_truncated(self):
+        recipe = RecipeFactory(author=self.user1, name='soup ' * 50)
+
+        self.assertEqual(len(recipe.slug), 75)
+        self.assertTrue(recipe.slug.startswith(str(recipe.pk)[:8]))
+
+
+class NarrowTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        slugs.slug_cache.clear()
+        self.addCleanup(slugs.slug_cache.clear)
+
+    def test_narrow(self):
+        pk = uuid.UUID('285e25b4-b396-4057-825c-b200105ada6b')
+        slug = Recipe.generate_slug(pk, 'Oat miso')
+
+        self.assertEqual(slugs.narrow({'slug': slug}), {'slug': slug})
+        self.assertEqual(slugs.narrow({'pk': str(pk)}), {'pk': str(pk)})
+
+        slugs.slug_cache.set(slug, pk)
+        self.assertEqual(slugs.narrow({'slug': slug}), {'pk': pk, 'slug': slug})
+
+    def test_cache_is_bounded(self):
+        cache = slugs.SlugCache(max_size=2)
+        for i in range(3):
+            cache.set(f'slug-{i}', i)
+
+        self.assertIsNone(cache.get('slug-0'))
+        self.assertEqual(cache.get('slug-2'), 2)
@@ -1,14 +1,28 @@
+import gzip
 import json
+import uuid
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from recipes.factories import RecipeFactory, ShareConfigFactory
-from recipes.models import Recipe
+from recipes.models import Recipe, ShareConfig
 from users.models import User
 
 
+def list_queries(ctx):
+    """
+    Returns the queries captured while listing recipes, minus the
+    aggregates that compute the list's ETag.
+    """
+    return [q for q in ctx.captured_queries if 'COUNT(' not in q['sql']]
+
+
 class BaseRecipesTestCase(APITestCase):
     def setUp(self) -> None:
         self.user1 = User.objects.create(email='user1@test.com', username='user1@test.com')
@@ -90,6 +104,273 @@ class RecipeListTestCase(BaseRecipesTestCase):
         self.assertEqual(len(json_content), 0)
 
 
+class RecipeListPaginationTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        # Duplicate names make sure ties are broken by id
+        for name in ['a', 'b', 'b', 'b', 'c', 'd', 'e']:
+            RecipeFactory(author=self.user1, name=name)
+        self.expected = list(
+            Recipe.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+
+    def get_page(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return json.loads(resp.content)
+
+    def test_list_is_not_paginated_by_default(self):
+        json_content = self.get_page(reverse('recipes-list'))
+
+        self.assertEqual(len(json_content), 7)
+
+    def test_walk_forwards_and_backwards_through_pages(self):
+        page = self.get_page(f"{reverse('recipes-list')}?page_size=3")
+        self.assertIsNone(page['previous'])
+
+        fetched = []
+        pages = [page]
+        while True:
+            fetched += [r['id'] for r in page['results']]
+            if page['next'] is None:
+                break
+            page = self.get_page(page['next'])
+            pages.append(page)
+
+        self.assertEqual(fetched, [str(pk) for pk in self.expected])
+        self.assertEqual(len(pages), 3)
+
+        previous_page = self.get_page(pages[-1]['previous'])
+        self.assertEqual(previous_page['results'], pages[1]['results'])
+        first_page = self.get_page(previous_page['previous'])
+        self.assertEqual(first_page['results'], pages[0]['results'])
+        self.assertIsNone(first_page['previous'])
+
+    def test_page_size_is_capped(self):
+        with self.settings(RECIPES_MAX_PAGE_SIZE=2):
+            page = self.get_page(f"{reverse('recipes-list')}?page_size=100")
+
+        self.assertEqual(len(page['results']), 2)
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(f"{reverse('recipes-list')}?cursor=not-a-cursor")
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pages_are_fetched_by_keyset_not_offset(self):
+        page = self.get_page(f"{reverse('recipes-list')}?page_size=2")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(page['next'])
+
+        recipe_query = list_queries(ctx)[0]['sql']
+        self.assertIn('"recipes_recipe"."name" >', recipe_query)
+        self.assertIn('LIMIT 3', recipe_query)
+        self.assertNotIn('OFFSET', recipe_query)
+
+
+class RecipeListFieldsTestCase(BaseRecipesTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for i in range(5):
+            RecipeFactory(
+                author=self.user1,
+                name=f'recipe {i}',
+                ingredients='1 cup flour\n' * 50,
+                instructions='Mix everything together.\n' * 50,
+                tags=['baking'],
+            )
+
+    def test_summary_view(self):
+        url = reverse('recipes-list')
+        full_resp = self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            summary_resp = self.client.get(f'{url}?view=summary')
+        json_content = json.loads(summary_resp.content)
+
+        self.assertEqual(summary_resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json_content), 5)
+        self.assertCountEqual(json_content[0].keys(), ['id', 'name', 'owner', 'slug', 'tags'])
+        self.assertEqual(json_content[0]['owner'], 'user1@test.com')
+        self.assertEqual(json_content[0]['tags'], ['baking'])
+        self.assertLess(len(summary_resp.content) * 10, len(full_resp.content))
+        self.assertNotIn('ingredients', list_queries(ctx)[0]['sql'])
+
+    def test_sparse_fieldset(self):
+        url = reverse('recipes-list')
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f'{url}?fields=name,slug')
+        json_content = json.loads(resp.content)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(json_content[0].keys(), ['id', 'name', 'slug'])
+        # Neither owner nor tags were asked for, so neither is queried for
+        self.assertEqual(len(list_queries(ctx)), 1)
+        self.assertNotIn('instructions', list_queries(ctx)[0]['sql'])
+
+    def test_detail_returns_full_payload(self):
+        recipe = Recipe.objects.first()
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        resp = self.client.get(f'{url}?view=summary&fields=name')
+        json_content = json.loads(resp.content)
+
+        self.assertIn('ingredients', json_content)
+        self.assertIn('instructions', json_content)
+
+
+class RecipeSearchTestCase(BaseRecipesTestCase):
+    def search(self, query):
+        resp = self.client.get(reverse('recipes-list'), {'q': query})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [r['name'] for r in json.loads(resp.content)]
+
+    def test_search_matches_all_text_fields(self):
+        RecipeFactory(author=self.user1, name='Chana masala')
+        RecipeFactory(author=self.user1, name='Dal', ingredients='2 cups red lentils')
+        RecipeFactory(author=self.user1, name='Rice', instructions='Rinse the basmati.')
+        RecipeFactory(author=self.user1, name='Stew', notes='Freezes well')
+        RecipeFactory(author=self.user1, name='Pizza')
+
+        self.assertEqual(self.search('masala'), ['Chana masala'])
+        self.assertEqual(self.search('lentil'), ['Dal'])
+        self.assertEqual(self.search('basmati'), ['Rice'])
+        self.assertEqual(self.search('freezing'), ['Stew'])
+        self.assertEqual(self.search('sushi'), [])
+
+    def test_results_are_ranked(self):
+        RecipeFactory(author=self.user1, name='Weeknight stew', notes='Good with lentils')
+        RecipeFactory(author=self.user1, name='Lentil soup')
+        RecipeFactory(author=self.user1, name='Dal', ingredients='1 cup lentils')
+
+        self.assertEqual(self.search('lentils'), ['Lentil soup', 'Dal', 'Weeknight stew'])
+
+    def test_search_respects_access(self):
+        RecipeFactory(author=self.user1, name='My lentil soup')
+        RecipeFactory(author=self.user2, name='Their lentil soup')
+
+        self.assertEqual(self.search('lentil'), ['My lentil soup'])
+
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        self.assertCountEqual(self.search('lentil'), ['My lentil soup', 'Their lentil soup'])
+
+    def test_search_index_follows_updates(self):
+        recipe = RecipeFactory(author=self.user1, name='Soup')
+        recipe.name = 'Gazpacho'
+        recipe.save()
+
+        self.assertEqual(self.search('soup'), [])
+        self.assertEqual(self.search('gazpacho'), ['Gazpacho'])
+
+    def test_search_results_are_capped(self):
+        for i in range(3):
+            RecipeFactory(author=self.user1, name=f'Soup {i}')
+
+        with self.settings(RECIPES_SEARCH_MAX_RESULTS=2):
+            self.assertEqual(len(self.search('soup')), 2)
+
+
+class RecipeAutocompleteTestCase(BaseRecipesTestCase):
+    def autocomplete(self, query):
+        resp = self.client.get(reverse('recipes-autocomplete'), {'q': query})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return json.loads(resp.content)
+
+    def test_matches_name_prefix(self):
+        recipe = RecipeFactory(author=self.user1, name='Chana masala', tags=['Chinese'])
+        RecipeFactory(author=self.user1, name='Pizza')
+
+        json_content = self.autocomplete('ch')
+
+        self.assertEqual(json_content['recipes'], [
+            {'id': str(recipe.id), 'slug': recipe.slug, 'name': 'Chana masala'},
+        ])
+        self.assertEqual(json_content['tags'], [{'name': 'Chinese', 'slug': 'chinese'}])
+
+    def test_matches_similar_words(self):
+        RecipeFactory(author=self.user1, name='Chana masala')
+        RecipeFactory(author=self.user1, name='Pizza')
+
+        json_content = self.autocomplete('masalla')
+
+        self.assertEqual([r['name'] for r in json_content['recipes']], ['Chana masala'])
+
+    def test_only_matches_accessible_recipes_and_tags(self):
+        RecipeFactory(author=self.user1, name='My soup', tags=['Soups'])
+        RecipeFactory(author=self.user2, name='Their soup', tags=['Soup kitchen'])
+
+        json_content = self.autocomplete('soup')
+
+        self.assertEqual([r['name'] for r in json_content['recipes']], ['My soup'])
+        self.assertEqual([t['name'] for t in json_content['tags']], ['Soups'])
+
+    def test_results_are_limited(self):
+        for i in range(5):
+            RecipeFactory(author=self.user1, name=f'Soup {i}')
+
+        with self.settings(RECIPES_AUTOCOMPLETE_LIMIT=3):
+            json_content = self.autocomplete('soup')
+
+        self.assertEqual(len(json_content['recipes']), 3)
+
+    def test_like_wildcards_are_escaped(self):
+        RecipeFactory(author=self.user1, name='Soup')
+
+        self.assertEqual(self.autocomplete('%')['recipes'], [])
+
+    def test_empty_query(self):
+        RecipeFactory(author=self.user1, name='Soup')
+
+        self.assertEqual(self.autocomplete(''), {'recipes': [], 'tags': []})
+
+
+class RecipeExportTestCase(BaseRecipesTestCase):
+    url = reverse('recipes-export')
+
+    def setUp(self) -> None:
+        super().setUp()
+        ContentType.objects.get_for_model(Recipe)
+
+    def read_lines(self, resp):
+        return [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+
+    def test_export_streams_accessible_recipes(self):
+        r1 = RecipeFactory(author=self.user1, name='Red lentils', tags=['indian', 'lentils'])
+        r2 = RecipeFactory(author=self.user2, name='Chana masala')
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        RecipeFactory(author=User.objects.create(email='user3@test.com', username='user3@test.com'))
+
+        resp = self.client.get(self.url)
+        lines = self.read_lines(resp)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([line['id'] for line in lines], [str(r2.pk), str(r1.pk)])
+        self.assertEqual(lines[1]['tags'], ['indian', 'lentils'])
+        self.assertEqual(lines[1]['owner'], self.user1.email)
+        self.assertEqual(lines[0]['tags'], [])
+
+    def test_export_gzip(self):
+        RecipeFactory(author=self.user1, name='Red lentils')
+
+        resp = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        content = gzip.decompress(b''.join(resp.streaming_content))
+
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(content)['name'], 'Red lentils')
+
+    @override_settings(RECIPES_EXPORT_CHUNK_SIZE=2)
+    def test_tags_are_fetched_per_chunk(self):
+        for i in range(5):
+            RecipeFactory(author=self.user1, name=f'recipe {i}', tags=[f'tag {i}'])
+
+        # One cursor over the recipes, plus one tag query for each of the 3 chunks
+        with self.assertNumQueries(4):
+            lines = self.read_lines(self.client.get(self.url))
+
+        self.assertEqual([line['tags'] for line in lines], [[f'tag {i}'] for i in range(5)])
+
+
 class RecipeCreateTestCase(BaseRecipesTestCase):
     def test_create_recipe_with_required_fields(self):
         url = reverse('recipes-list')
@@ -134,6 +415,112 @@ class RecipeDetailsTestCase(BaseRecipesTestCase):
         self.assertEqual(json_content['name'], recipe.name)
 
 
+class RecipeConditionalGetTestCase(BaseRecipesTestCase):
+    def test_detail_returns_validators(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', resp)
+
+    def test_detail_not_modified(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+        url = reverse('recipes-detail', kwargs={'pk': recipe.slug})
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_detail_not_modified_since(self):
+        recipe = RecipeFactory(author=self.user1)
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_recipe_and_tags(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        etags = [self.client.get(url)['ETag']]
+
+        recipe.name = 'updated name'
+        recipe.save()
+        etags.append(self.client.get(url)['ETag'])
+        recipe.tags.add('stew')
+        etags.append(self.client.get(url)['ETag'])
+
+        self.assertEqual(len(set(etags)), 3)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json()['tags'], ['soup', 'stew'])
+
+    def test_conditional_get_of_missing_recipe(self):
+        url = reverse('recipes-detail', kwargs={'pk': 'missing-recipe'})
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH='"abc"')
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_not_modified(self):
+        RecipeFactory(author=self.user1, tags=['soup'])
+        url = reverse('recipes-list')
+        etag = self.client.get(url)['ETag']
+
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.content, b'')
+
+    def test_list_etag_changes_with_contents(self):
+        recipe = RecipeFactory(author=self.user1, tags=['soup'])
+        RecipeFactory(author=self.user2)
+        url = reverse('recipes-list')
+
+        def etag():
+            return self.client.get(url)['ETag']
+
+        etags = [etag()]
+        other_recipe = RecipeFactory(author=self.user1)
+        etags.append(etag())
+        recipe.tags.remove('soup')
+        etags.append(etag())
+        share_config = ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        etags.append(etag())
+        share_config.delete()
+        etags.append(etag())
+        other_recipe.delete()
+        etags.append(etag())
+
+        for before, after in zip(etags, etags[1:]):
+            self.assertNotEqual(before, after)
+        # Query params change the response, so they change the ETag too
+        self.assertNotEqual(etag(), self.client.get(f'{url}?view=summary')['ETag'])
+
+    def test_list_etag_is_a_single_query(self):
+        RecipeFactory.create_batch(2, author=self.user1, tags=['soup'])
+        url = reverse('recipes-list')
+
+        # The ETag, the page and the page's tags
+        with self.assertNumQueries(3):
+            resp = self.client.get(url)
+        self.assertIn('ETag', resp)
+
+        for params in ['?tags=soup', '?q=recipe']:
+            with self.subTest(params=params):
+                etag = self.client.get(url + params)['ETag']
+                resp = self.client.get(url + params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
 class RecipeUpdateTestCase(BaseRecipesTestCase):
     def test_user_can_update_a_recipe_they_own(self):
         recipe = RecipeFactory(author=self.user1, name='original name')
@@ -172,6 +559,31 @@ class RecipeUpdateTestCase(BaseRecipesTestCase):
 
         self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_user_gets_403_when_recipe_is_shared_with_them_as_viewer(self):
+        recipe = RecipeFactory(author=self.user2, name='original name')
+        ShareConfigFactory(granter=self.user2, grantee=self.user1, role=ShareConfig.VIEWER)
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        resp = self.client.patch(url, data={'name': 'updated name'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).name, 'original name')
+
+    def test_update_by_slug(self):
+        recipe = RecipeFactory(author=self.user1, name='original name')
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.slug})
+        resp = self.client.patch(url, data={'name': 'updated name'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).name, 'updated name')
+
+    def test_user_gets_404_when_updating_missing_recipe(self):
+        url = reverse('recipes-detail', kwargs={'pk': uuid.uuid4()})
+        resp = self.client.patch(url, data={'name': 'updated name'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_slug_does_not_change_when_updating_name(self):
         recipe = RecipeFactory(author=self.user1, name='my test recipe')
         old_slug = recipe.slug
@@ -212,6 +624,30 @@ class RecipeDeleteTestCase(BaseRecipesTestCase):
 
         self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_user_gets_403_when_recipe_is_shared_with_them_as_viewer(self):
+        recipe = RecipeFactory(author=self.user2)
+        ShareConfigFactory(granter=self.user1, grantee=self.user2, role=ShareConfig.VIEWER)
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        resp = self.client.delete(url)
+
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+    def test_user_gets_403_when_their_editor_grant_is_not_returned(self):
+        # user1 lets user2 edit their recipes, but user2 only lets user1
+        # view theirs
+        recipe = RecipeFactory(author=self.user2, name='original name')
+        ShareConfigFactory(granter=self.user2, grantee=self.user1, role=ShareConfig.VIEWER)
+        ShareConfigFactory(granter=self.user1, grantee=self.user2, role=ShareConfig.EDITOR)
+
+        url = reverse('recipes-detail', kwargs={'pk': recipe.pk})
+        resp = self.client.patch(url, data={'name': 'updated name'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'original name')
+
 
 class RecipeTagTestCase(BaseRecipesTestCase):
     def test_get_tags_for_recipes_owned_by_user(self):
@@ -223,13 +659,13 @@ class RecipeTagTestCase(BaseRecipesTestCase):
         resp = self.client.get(url)
         json_content = json.loads(resp.content)
         expected_tags = [
-            {'name': 'Chinese Food', 'slug': 'chinese-food'},
-            {'name': 'Indian', 'slug': 'indian'},
+            {'name': 'Indian', 'slug': 'indian', 'count': 2},
+            {'name': 'Chinese Food', 'slug': 'chinese-food', 'count': 1},
         ]
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(len(json_content), 2)
-        self.assertCountEqual(json_content, expected_tags)
+        self.assertEqual(json_content, expected_tags)
 
     def test_get_tags_for_recipes_shared_with_user(self):
         RecipeFactory(author=self.user1, tags=['Indian'])
@@ -241,13 +677,13 @@ class RecipeTagTestCase(BaseRecipesTestCase):
         resp = self.client.get(url)
         json_content = json.loads(resp.content)
         expected_tags = [
-            {'name': 'Chinese Food', 'slug': 'chinese-food'},
-            {'name': 'Indian', 'slug': 'indian'},
+            {'name': 'Indian', 'slug': 'indian', 'count': 2},
+            {'name': 'Chinese Food', 'slug': 'chinese-food', 'count': 1},
         ]
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(len(json_content), 2)
-        self.assertCountEqual(json_content, expected_tags)
+        self.assertEqual(json_content, expected_tags)
 
     def test_user_doesnt_see_tags_for_recipes_they_cant_access(self):
         RecipeFactory(author=self.user1, tags=['Indian'])
@@ -258,12 +694,31 @@ class RecipeTagTestCase(BaseRecipesTestCase):
         resp = self.client.get(url)
         json_content = json.loads(resp.content)
         expected_tags = [
-            {'name': 'Indian', 'slug': 'indian'},
+            {'name': 'Indian', 'slug': 'indian', 'count': 2},
         ]
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(len(json_content), 1)
-        self.assertCountEqual(json_content, expected_tags)
+        self.assertEqual(json_content, expected_tags)
+
+    def test_min_count_and_limit(self):
+        RecipeFactory.create_batch(3, author=self.user1, tags=['Indian', 'Curry'])
+        RecipeFactory(author=self.user1, tags=['Curry', 'Quick'])
+        RecipeFactory(author=self.user1, tags=['Soup'])
+
+        url = reverse('recipe-tags')
+        resp = self.client.get(url, {'min_count': 2})
+        self.assertEqual([(t['slug'], t['count']) for t in resp.json()], [('curry', 4), ('indian', 3)])
+
+        resp = self.client.get(url, {'limit': 3})
+        self.assertEqual([t['slug'] for t in resp.json()], ['curry', 'indian', 'quick'])
+
+    def test_invalid_params(self):
+        url = reverse('recipe-tags')
+        for params in [{'min_count': 0}, {'min_count': 'many'}, {'limit': -1}]:
+            with self.subTest(params=params):
+                resp = self.client.get(url, params)
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class CanUserEditRecipeTestCase(BaseRecipesTestCase):
@@ -288,6 +743,23 @@ class CanUserEditRecipeTestCase(BaseRecipesTestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertFalse(json_content['can_edit'])
 
+    def test_false_if_recipe_is_shared_with_user_as_viewer(self):
+        r = RecipeFactory(author=self.user2)
+        ShareConfigFactory(granter=self.user2, grantee=self.user1, role=ShareConfig.VIEWER)
+
+        url = reverse('recipes-can-user-edit', kwargs={'pk': r.slug})
+        with self.assertNumQueries(1):
+            resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(resp.json()['can_edit'])
+
+    def test_404_for_missing_recipe(self):
+        url = reverse('recipes-can-user-edit', kwargs={'pk': 'no-such-recipe'})
+        resp = self.client.get(url)
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class CopyRecipeForUserTestCase(BaseRecipesTestCase):
     def test_copy_recipe_for_user(self):
@@ -301,9 +773,95 @@ class CopyRecipeForUserTestCase(BaseRecipesTestCase):
         json_content = json.loads(resp.content)
 
         # user1 should now have 1 recipe
-        user_1_recipe = Recipe.objects.first()
+        user_1_recipe = Recipe.objects.get(author=self.user1)
 
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(Recipe.objects.filter(author=self.user1)), 1)
         self.assertNotEqual(user_2_recipe.pk, user_1_recipe.pk)
         self.assertNotEqual(user_2_recipe.slug, user_1_recipe.slug)
+
+    def test_copy_includes_tags(self):
+        recipe = RecipeFactory(author=self.user2, tags=['soup', 'stew'])
+
+        url = reverse('recipes-copy-for-user', kwargs={'pk': recipe.pk})
+        resp = self.client.get(url)
+
+        copy = Recipe.objects.get(author=self.user1)
+        self.assertEqual(resp.json()['tags'], ['soup', 'stew'])
+        self.assertCountEqual(copy.tags.names(), ['soup', 'stew'])
+        self.assertCountEqual(recipe.tags.names(), ['soup', 'stew'])
+
+    def test_copy_by_slug(self):
+        recipe = RecipeFactory(author=self.user2)
+
+        resp = self.client.get(reverse('recipes-copy-for-user', kwargs={'pk': recipe.slug}))
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.get(author=self.user1).name, recipe.name)
+
+    def test_copy_missing_recipe(self):
+        for pk in [uuid.uuid4(), 'missing-recipe']:
+            with self.subTest(pk=pk):
+                resp = self.client.get(reverse('recipes-copy-for-user', kwargs={'pk': pk}))
+                self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Recipe.objects.filter(author=self.user1).exists())
+
+
+class BatchCopyRecipesTestCase(BaseRecipesTestCase):
+    url = reverse('recipes-copy')
+
+    def test_copy_by_id_and_slug(self):
+        r1 = RecipeFactory(author=self.user2, name='Red lentils', tags=['indian'])
+        r2 = RecipeFactory(author=self.user2, name='Chana masala')
+        RecipeFactory(author=self.user2, name='Not copied')
+
+        resp = self.client.post(self.url, {'ids': [str(r1.pk), r2.slug]}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertCountEqual(
+            [(item['name'], item['copied_from']) for item in resp.json()],
+            [('Red lentils', str(r1.pk)), ('Chana masala', str(r2.pk))],
+        )
+        copy = Recipe.objects.get(author=self.user1, name='Red lentils')
+        self.assertEqual(copy.slug, Recipe.generate_slug(copy.pk, copy.name))
+        self.assertEqual(list(copy.tags.names()), ['indian'])
+        self.assertEqual(Recipe.objects.filter(author=self.user2).count(), 3)
+
+    def test_copy_by_id_copies_recipes_that_are_not_shared(self):
+        # Recipe links are public, so any recipe can be copied by its id
+        user3 = User.objects.create(email='user3@test.com', username='user3@test.com')
+        recipe = RecipeFactory(author=user3)
+        self.assertFalse(self.user1.get_recipes().filter(pk=recipe.pk).exists())
+
+        resp = self.client.post(self.url, {'ids': [str(recipe.pk)]}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['copied_from'] for item in resp.json()], [str(recipe.pk)])
+
+    def test_copy_by_tag_only_copies_accessible_recipes(self):
+        shared = RecipeFactory(author=self.user2, tags=['indian'])
+        RecipeFactory(author=self.user2, tags=['italian'])
+        ShareConfigFactory(granter=self.user2, grantee=self.user1)
+        user3 = User.objects.create(email='user3@test.com', username='user3@test.com')
+        RecipeFactory(author=user3, tags=['indian'])
+
+        resp = self.client.post(self.url, {'tags': ['indian']}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['copied_from'] for item in resp.json()], [str(shared.pk)])
+
+    @override_settings(RECIPES_BULK_MAX_ITEMS=1)
+    def test_too_many_recipes(self):
+        RecipeFactory(author=self.user1, tags=['indian'])
+        RecipeFactory(author=self.user1, tags=['indian'])
+
+        resp = self.client.post(self.url, {'tags': ['indian']}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_ids_or_tags_are_required(self):
+        for data in [{}, {'ids': ['a'], 'tags': ['b']}, {'ids': []}]:
+            with self.subTest(data=data):
+                resp = self.client.post(self.url, data, format='json')
+                self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
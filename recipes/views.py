@@ -1,9 +1,24 @@
+import re
 from uuid import UUID
-from django.db.models import Q
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, Q
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.text import compress_sequence
 from rest_framework import status, viewsets
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.generics import ListAPIView
 
@@ -11,38 +26,86 @@ from recipes_api.authentication import (
     DRFAuth0Authentication,
     RecipeDetailsAuthentication,
 )
-from .models import Recipe, RecipeTag, ShareConfig
-from .serializers import RecipeSerializer, RecipeTagSerializer
+from recipes_api.performance import TimedAuthenticationMixin
+from .bulk import bulk_create_recipes, bulk_delete_recipes, bulk_update_recipes
+from .cache import get_recipe_detail, load_recipe_detail, recipe_detail_queryset
+from .conditional import (
+    get_not_modified_response,
+    get_recipe_list_etag,
+    get_recipe_validators,
+    recipe_validators,
+    set_validators,
+)
+from .export import iter_recipe_lines
+from .importer import ImportStats, RecipeFileError, RecipeFileReader, import_recipes
+from .lookups import IPrefix
+from .models import Recipe, RecipeTag, TaggedRecipe
+from .pagination import RecipeCursorPagination
+from . import slugs
+from .parsers import NDJSONParser
+from .permissions import CanEditRecipe, with_can_edit
+from .renderers import NDJSONRenderer
+from .serializers import (
+    RecipeCopySerializer,
+    RecipeSerializer,
+    RecipeSummarySerializer,
+    RecipeTagSerializer,
+)
+from .tags import get_count_params, get_tag_counts
+
+accepts_gzip = re.compile(r'\bgzip\b')
 
 
-class RecipeTagView(ListAPIView):
+class RecipeTagView(TimedAuthenticationMixin, ListAPIView):
     """
     Fetch all RecipeTags for Recipes that the current user
-    has access to.
+    has access to, with how many of those Recipes have each tag,
+    most used first.
+    Supports the `min_count` and `limit` query params.
     """
     serializer_class = RecipeTagSerializer
 
-    def get_queryset(self):
-        recipe_ids = self.request.user.get_recipe_ids()
-        return RecipeTag.objects.filter(
-            recipe__id__in=recipe_ids
-        ).distinct()
+    def list(self, request, *args, **kwargs):
+        try:
+            min_count, limit = get_count_params(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        counts = get_tag_counts(request.user, min_count, limit)
+        return Response(self.get_serializer(counts, many=True).data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(TimedAuthenticationMixin, viewsets.ModelViewSet):
     authentication_classes = [
+        RecipeDetailsAuthentication,
         TokenAuthentication,
         DRFAuth0Authentication,
-        RecipeDetailsAuthentication,
     ]
+    permission_classes = [IsAuthenticated, CanEditRecipe]
     serializer_class = RecipeSerializer
+    pagination_class = RecipeCursorPagination
+    # Actions anyone can GET, see RecipeDetailsAuthentication
+    public_actions = ['retrieve']
+    # Actions that change a single Recipe, see CanEditRecipe
+    write_actions = ['update', 'partial_update', 'destroy']
+
+    def is_public_request(self):
+        return self.action in self.public_actions and self.request.method == 'GET'
+
+    def get_permissions(self):
+        if self.is_public_request():
+            return [AllowAny()]
+        return super().get_permissions()
 
     def get_queryset(self):
         # TODO: I think this runs for all operations... confirm and only check shared items for list
         # Start by building a queryset for all Recipes the user has access to,
         # including Recipes that've been shared.
-        recipe_ids = self.request.user.get_recipe_ids()
-        queryset = Recipe.objects.filter(pk__in=recipe_ids).order_by('name')
+        if self.action in self.write_actions:
+            # Recipes the user can't edit are rejected by CanEditRecipe
+            # (403), rather than not found
+            queryset = with_can_edit(Recipe.objects.all(), self.request.user)
+        else:
+            queryset = self.request.user.get_recipes().order_by('name', 'id')
 
         # Filter by tag slugs if `tags` query param is present
         try:
@@ -51,39 +114,316 @@ class RecipeViewSet(viewsets.ModelViewSet):
         except AttributeError:
             pass
 
+        # Full-text search, ranked by relevance, if `q` query param is present
+        search_query = self.get_search_query()
+        if search_query is not None:
+            queryset = queryset.filter(
+                search_vector=search_query
+            ).annotate(
+                rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-rank', 'name', 'id')
+
+        # Only load what the list's serializer is going to use.
+        # `name` is always needed for pagination.
+        if self.action == 'list':
+            fields = self.get_requested_fields()
+            queryset = self.get_serializer_class().prepare_queryset(
+                queryset,
+                fields=None if fields is None else ['name', *fields],
+            )
+        else:
+            # Instances may be saved, so all of their columns are loaded
+            queryset = queryset.select_related('author').prefetch_related('tags')
+
+        if search_query is not None:
+            queryset = queryset[:settings.RECIPES_SEARCH_MAX_RESULTS]
+
         return queryset
 
+    def get_search_query(self):
+        query = self.request.query_params.get('q', '').strip()
+        if self.action != 'list' or not query:
+            return None
+        return SearchQuery(query, search_type='websearch', config='english')
+
+    def paginate_queryset(self, queryset):
+        # Search results are ranked and capped instead of paginated
+        if self.get_search_query() is not None:
+            return None
+        return super().paginate_queryset(queryset)
+
+    def get_requested_fields(self):
+        """
+        Returns the fields a list request asked for with `?fields=`,
+        or None to serialize all of the serializer's fields.
+        """
+        fields = self.request.query_params.get('fields')
+        if self.action != 'list' or not fields:
+            return None
+        return ['id', *fields.split(',')]
+
+    def get_object(self):
+        # Recipes can be looked up by id or slug
+        lookup = slugs.narrow(Recipe.get_lookup(self.kwargs['pk']))
+        recipe = get_object_or_404(self.get_queryset(), **lookup)
+        slugs.remember(recipe)
+        self.check_object_permissions(self.request, recipe)
+        return recipe
+
+    def get_serializer_class(self):
+        # `?view=summary` returns just what the recipe index page needs
+        if self.action == 'list' and self.request.query_params.get('view') == 'summary':
+            return RecipeSummarySerializer
+        return RecipeSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        etag = get_recipe_list_etag(
+            request, self.filter_queryset(self.get_queryset())
+        )
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
     def retrieve(self, request, *args, **kwargs):
-        try:
-            # If kwargs['pk'] is not a valid UUID, an error is raised,
-            # and you can assume you need to look the recipe up by slug
-            UUID(kwargs['pk'])
-            recipe = get_object_or_404(Recipe, pk=kwargs['pk'])
-        except ValueError as e:
-            recipe = get_object_or_404(Recipe, slug=kwargs['pk'])
-
-        # Check if current user is allowed access to the recipe.
-        # Don't run this when GETting a Recipe to view!
-        if request.method != 'GET':
-            user_owns_recipe = recipe.author == self.request.user
-            recipe_is_shared_with_user = ShareConfig.objects.filter(
-                (Q(granter=recipe.author) & Q(grantee=self.request.user))
-                | (Q(granter=self.request.user) & Q(grantee=recipe.author))
-            ).exists()
-            user_has_access = user_owns_recipe or recipe_is_shared_with_user
-            if not user_has_access:
-                return Response(status=status.HTTP_403_FORBIDDEN)
+        lookup = Recipe.get_lookup(kwargs['pk'])
+
+        if request.method == 'GET' and request.user.is_anonymous:
+            return self.retrieve_cached(request, lookup)
+
+        # Answer conditional GETs from the recipe's validators alone,
+        # without loading and serializing the recipe.
+        is_conditional = (
+            'HTTP_IF_NONE_MATCH' in request.META
+            or 'HTTP_IF_MODIFIED_SINCE' in request.META
+        )
+        if request.method == 'GET' and is_conditional:
+            validators = get_recipe_validators(Recipe.objects.filter(**slugs.narrow(lookup)))
+            if validators is None:
+                raise Http404
+            not_modified = get_not_modified_response(request, *validators)
+            if not_modified is not None:
+                return not_modified
 
+        recipe = get_object_or_404(recipe_detail_queryset(), **slugs.narrow(lookup))
+        slugs.remember(recipe)
         serializer = RecipeSerializer(recipe)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        if request.method == 'GET':
+            set_validators(response, *recipe_validators(recipe))
+        return response
+
+    def retrieve_cached(self, request, lookup):
+        """
+        Serves public Recipe pages from the recipe detail cache.
+        """
+        (field, value), = lookup.items()
+        detail = get_recipe_detail(field, value, lambda: load_recipe_detail(lookup))
+        if detail is None:
+            raise Http404
+
+        etag, last_modified = detail['etag'], detail['last_modified']
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(detail['data']), etag, last_modified)
 
     @action(detail=True, methods=['get'])
     def can_user_edit(self, request, pk):
-        can_edit = Recipe.can_user_edit_recipe(pk, request.user.pk)
+        can_edit = get_object_or_404(
+            with_can_edit(Recipe.objects.filter(**slugs.narrow(Recipe.get_lookup(pk))), request.user)
+            .values_list('can_edit', flat=True)
+        )
         return Response({'can_edit': can_edit})
 
     @action(detail=True, methods=['get'])
     def copy_for_user(self, request, pk):
-        recipe = Recipe.copy_for_user(pk, request.user.pk)
+        """
+        Copies a recipe, by id or slug, to the current user. Like viewing a
+        single recipe, this works for any recipe, not only the ones the
+        user has access to: anyone with a recipe's link can copy it.
+        """
+        try:
+            recipe = Recipe.copy_for_user(pk, request.user.pk)
+        except Recipe.DoesNotExist:
+            raise Http404
         serializer = RecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def copy(self, request):
+        """
+        Copies many recipes, with their tags, to the current user.
+        Recipes are selected by `ids` (ids or slugs of any recipes, like
+        copy_for_user, since the links are public) or by `tags` (tag slugs,
+        among the recipes the user has access to).
+        """
+        serializer = RecipeCopySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if 'tags' in serializer.validated_data:
+            queryset = request.user.get_recipes().filter(
+                tags__slug__in=serializer.validated_data['tags']
+            ).distinct()
+        else:
+            ids, recipe_slugs = [], []
+            for value in serializer.validated_data['ids']:
+                try:
+                    ids.append(UUID(value))
+                except ValueError:
+                    recipe_slugs.append(value)
+            queryset = Recipe.objects.filter(Q(pk__in=ids) | Q(slug__in=recipe_slugs))
+
+        max_items = settings.RECIPES_BULK_MAX_ITEMS
+        recipes = list(queryset[:max_items + 1])
+        if len(recipes) > max_items:
+            return Response(
+                {'non_field_errors': [f'Ensure there are no more than {max_items} recipes to copy.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        copies = Recipe.copy_many_for_user(recipes, request.user.pk)
+
+        return Response(
+            [
+                {
+                    'id': str(recipe.pk),
+                    'slug': recipe.slug,
+                    'name': recipe.name,
+                    'copied_from': str(recipe.copied_from),
+                }
+                for recipe in copies
+            ],
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'patch', 'delete'],
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def bulk(self, request):
+        """
+        Creates (POST), partially updates (PATCH) or deletes (DELETE) many
+        recipes at once. The body is a JSON array or NDJSON, with one recipe
+        per item; updates and deletes identify recipes by `id`.
+        Responds with the `results` and `errors` of each item by index.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'non_field_errors': ['Expected a list of items.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = settings.RECIPES_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            return Response(
+                {'non_field_errors': [f'Ensure there are no more than {max_items} items.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        recipes = with_can_edit(request.user.get_recipes(), request.user)
+        if request.method == 'DELETE':
+            result = bulk_delete_recipes(items, recipes)
+        elif request.method == 'PATCH':
+            serializer = self.get_serializer(data=items, many=True, partial=True)
+            result = bulk_update_recipes(serializer, items, recipes)
+        else:
+            serializer = self.get_serializer(data=items, many=True)
+            result = bulk_create_recipes(serializer, items)
+        return Response(result.data, status=result.status)
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, JSONRenderer])
+    def export(self, request):
+        """
+        Streams every recipe the user has access to as NDJSON, gzipped
+        if the client accepts it.
+        """
+        lines = iter_recipe_lines(
+            request.user.get_recipes().order_by('name', 'id'),
+            chunk_size=settings.RECIPES_EXPORT_CHUNK_SIZE,
+        )
+        encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        use_gzip = accepts_gzip.search(encoding) is not None
+        if use_gzip:
+            lines = compress_sequence(line.encode() for line in lines)
+
+        response = StreamingHttpResponse(lines, content_type=NDJSONRenderer.media_type)
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        response['Vary'] = 'Accept-Encoding'
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        url_name='import',
+        parser_classes=[MultiPartParser],
+    )
+    def import_file(self, request):
+        """
+        Imports recipes for the user from an uploaded (`file`) NDJSON or
+        JSON array file, like the ones /recipes/export/ returns.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'file': ['No file was submitted.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stats = ImportStats()
+        data = {}
+        try:
+            import_recipes(RecipeFileReader(upload), request.user, stats=stats)
+        except RecipeFileError as e:
+            data['detail'] = str(e)
+        data.update(imported=stats.imported, failed=stats.failed, errors=stats.errors)
+
+        if 'detail' in data or not stats.imported and stats.failed:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif stats.failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(data, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Type-ahead over the names of the recipes and tags the user has
+        access to. Matches name prefixes and similar words (so typos still
+        match), using the pg_trgm indexes on both names.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'recipes': [], 'tags': []})
+
+        limit = settings.RECIPES_AUTOCOMPLETE_LIMIT
+        prefix = connection.ops.prep_for_like_query(query)
+
+        def matches(queryset):
+            return queryset.filter(
+                Q(IPrefix(F('name'), prefix)) | Q(name__trigram_word_similar=query)
+            ).annotate(
+                similarity=TrigramWordSimilarity(query, 'name')
+            ).order_by('-similarity', 'name')
+
+        recipes = matches(request.user.get_recipes()).values('id', 'slug', 'name')[:limit]
+        tag_ids = TaggedRecipe.objects.filter(
+            object_id__in=request.user.get_recipe_ids()
+        ).values('tag_id')
+        tags = matches(RecipeTag.objects.filter(pk__in=tag_ids)).values('name', 'slug')[:limit]
+
+        return Response({'recipes': list(recipes), 'tags': list(tags)})
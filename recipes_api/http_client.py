@@ -0,0 +1,240 @@
+"""
+Pooled HTTP clients for calls to the identity provider (Auth0).
+
+Connections are kept alive and reused, every request has strict connect
+and read timeouts, and a circuit breaker per host stops requests to a
+provider that keeps failing, so a slow or down provider can't tie up
+workers waiting on it. `HTTPClient` is for sync code, `AsyncHTTPClient`
+for the async views under ASGI.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request to a host whose circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open,
+    requests fail straight away, until `reset_timeout` seconds have passed.
+    Then a single trial request is let through: if it succeeds the circuit
+    closes, otherwise it stays open for another `reset_timeout`.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_request(self):
+        """
+        Raises CircuitOpenError if the request mustn't be made.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_in_flight or self._clock() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class BaseHTTPClient:
+    def __init__(
+        self,
+        connect_timeout=3,
+        read_timeout=5,
+        pool_size=10,
+        failure_threshold=5,
+        reset_timeout=30,
+        clock=time.monotonic,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def get_breaker(self, url):
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout=self.reset_timeout,
+                    clock=self._clock,
+                )
+            return self._breakers[host]
+
+    def _before_request(self, url):
+        try:
+            self.get_breaker(url).before_request()
+        except CircuitOpenError:
+            raise CircuitOpenError(f'Circuit for {urlsplit(url).netloc} is open')
+
+    def _record(self, url, failed):
+        breaker = self.get_breaker(url)
+        if not failed:
+            breaker.record_success()
+            return
+        breaker.record_failure()
+        if breaker.is_open:
+            logger.warning('Circuit for %s is open', urlsplit(url).netloc)
+
+
+class HTTPClient(BaseHTTPClient):
+    """
+    A requests.Session with a connection pool, timeouts and circuit
+    breakers. Safe to share between threads.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_json(self, url):
+        """
+        GETs `url` and returns the decoded JSON body. Raises
+        requests.RequestException (or ValueError for an invalid body)
+        if the request fails, or CircuitOpenError.
+        """
+        self._before_request(url)
+        try:
+            r = self.session.get(url, timeout=(self.connect_timeout, self.read_timeout))
+            r.raise_for_status()
+            data = r.json()
+        except requests.HTTPError as e:
+            # Only server errors mean the provider is unhealthy
+            self._record(url, failed=e.response.status_code >= 500)
+            raise
+        except (requests.RequestException, ValueError):
+            self._record(url, failed=True)
+            raise
+        self._record(url, failed=False)
+        return data
+
+
+class AsyncHTTPClient(BaseHTTPClient):
+    """
+    The async version of HTTPClient, built on httpx. An httpx.AsyncClient
+    is tied to the event loop it was first used on, so there's one per loop.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._clients[loop]
+
+    async def get_json(self, url):
+        """
+        GETs `url` and returns the decoded JSON body. Raises httpx.HTTPError
+        (or ValueError for an invalid body) if the request fails, or
+        CircuitOpenError.
+        """
+        self._before_request(url)
+        try:
+            r = await self.get_client().get(url)
+            r.raise_for_status()
+            data = r.json()
+        except httpx.HTTPStatusError as e:
+            self._record(url, failed=e.response.status_code >= 500)
+            raise
+        except (httpx.HTTPError, ValueError, asyncio.CancelledError):
+            # A cancelled request counts as a failure too, otherwise a
+            # cancelled trial request would leave the circuit open for good.
+            self._record(url, failed=True)
+            raise
+        self._record(url, failed=False)
+        return data
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def get_client_options():
+    return {
+        'connect_timeout': settings.AUTH0_HTTP_CONNECT_TIMEOUT,
+        'read_timeout': settings.AUTH0_HTTP_READ_TIMEOUT,
+        'pool_size': settings.AUTH0_HTTP_POOL_SIZE,
+        'failure_threshold': settings.AUTH0_HTTP_FAILURE_THRESHOLD,
+        'reset_timeout': settings.AUTH0_HTTP_RESET_TIMEOUT,
+    }
+
+
+_http_client = None
+_async_http_client = None
+_clients_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Returns the process-wide HTTPClient for identity provider calls.
+    """
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = HTTPClient(**get_client_options())
+        return _http_client
+
+
+def get_async_http_client():
+    """
+    Returns the process-wide AsyncHTTPClient for identity provider calls.
+    """
+    global _async_http_client
+    with _clients_lock:
+        if _async_http_client is None:
+            _async_http_client = AsyncHTTPClient(**get_client_options())
+        return _async_http_client
@@ -0,0 +1,206 @@
+"""
+Process-wide cache of the JSON Web Key Sets used to verify Auth0 tokens.
+
+Fetching the JWKS on every request puts an outbound HTTPS round trip on
+every authenticated API call, so keys are cached here, indexed by `kid`.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+
+from .http_client import CircuitOpenError, get_async_http_client, get_http_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeyStore:
+    """
+    Caches the signing keys published at a JWKS url.
+
+    - Keys are served from memory until `ttl` seconds after the last
+      successful fetch.
+    - Within `refresh_margin` seconds of expiring, a background thread
+      refreshes the keys so requests never wait on the fetch.
+    - An unknown `kid` triggers a fetch (Auth0 rotated its keys), but no
+      more than once every `min_refresh_interval` seconds, so a flood of
+      bad tokens can't cause a flood of fetches.
+    - If a fetch fails, the previously fetched keys keep being served, and
+      the keys aren't refetched for another `min_refresh_interval`
+      seconds, so an outage doesn't send every request to the provider.
+      Until the first fetch succeeds, requests wait for the fetch in
+      flight, if there is one.
+
+    Keys are fetched with the shared identity provider HTTP client (see
+    `recipes_api.http_client`), and `aget_key()` is the async version of
+    `get_key()`, for the async views.
+    """
+    def __init__(
+        self,
+        url,
+        ttl=600,
+        refresh_margin=60,
+        min_refresh_interval=30,
+        client=None,
+        async_client=None,
+        clock=time.monotonic,
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.client = client or get_http_client()
+        self.async_client = async_client or get_async_http_client()
+        self._clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt_at = None
+        self._attempts = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._refreshing_lock = threading.Lock()
+        self._async_refresh = None
+
+    def get_key(self, kid):
+        """
+        Returns the key dict for `kid`, or None if it isn't published.
+        """
+        if self._needs_refresh():
+            if self._may_refetch() or (self._fetched_at is None and self._lock.locked()):
+                self.refresh()
+        elif self._needs_background_refresh() and self._may_refetch():
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._may_refetch():
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def aget_key(self, kid):
+        if self._needs_refresh():
+            if self._may_refetch() or (self._fetched_at is None and self._arefresh_in_flight()):
+                await self.arefresh()
+        elif self._needs_background_refresh() and self._may_refetch():
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._may_refetch():
+            await self.arefresh()
+            key = self._keys.get(kid)
+        return key
+
+    def refresh(self):
+        """
+        Fetch the key set now. Returns True if the keys were replaced.
+        """
+        attempts = self._attempts
+        with self._lock:
+            # Another thread fetched while this one waited for the lock,
+            # so there's nothing newer to fetch.
+            if self._attempts != attempts:
+                return False
+            self._attempts += 1
+            self._last_attempt_at = self._clock()
+            try:
+                keys = self._parse(self.client.get_json(self.url))
+            except (requests.RequestException, CircuitOpenError, ValueError, KeyError) as e:
+                logger.warning('Unable to fetch JWKS from %s: %s', self.url, e)
+                return False
+            self._set_keys(keys)
+            return True
+
+    async def arefresh(self):
+        """
+        The async version of `refresh()`. Concurrent calls on the same event
+        loop share a single fetch.
+        """
+        if not self._arefresh_in_flight():
+            # Counted as an attempt straight away, so requests that come in
+            # while it's running serve the keys they have, if any
+            self._attempts += 1
+            self._last_attempt_at = self._clock()
+            self._async_refresh = asyncio.ensure_future(self._arefresh())
+        return await asyncio.shield(self._async_refresh)
+
+    async def _arefresh(self):
+        try:
+            keys = self._parse(await self.async_client.get_json(self.url))
+        except (httpx.HTTPError, CircuitOpenError, ValueError, KeyError) as e:
+            logger.warning('Unable to fetch JWKS from %s: %s', self.url, e)
+            return False
+        with self._lock:
+            self._set_keys(keys)
+        return True
+
+    def _set_keys(self, keys):
+        self._keys = keys
+        self._fetched_at = self._clock()
+
+    @staticmethod
+    def _parse(jwks):
+        return {
+            key['kid']: {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e'],
+            }
+            for key in jwks['keys']
+        }
+
+    def _needs_refresh(self):
+        return self._fetched_at is None or self._clock() - self._fetched_at >= self.ttl
+
+    def _needs_background_refresh(self):
+        return self._clock() - self._fetched_at >= self.ttl - self.refresh_margin
+
+    def _may_refetch(self):
+        return (
+            self._last_attempt_at is None
+            or self._clock() - self._last_attempt_at >= self.min_refresh_interval
+        )
+
+    def _arefresh_in_flight(self):
+        task = self._async_refresh
+        return task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop()
+
+    def _refresh_in_background(self):
+        with self._refreshing_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_jwks_store(auth0_domain):
+    """
+    Returns the process-wide key store for `auth0_domain`.
+    """
+    url = f'https://{auth0_domain}/.well-known/jwks.json'
+    with _stores_lock:
+        if url not in _stores:
+            _stores[url] = JWKSKeyStore(
+                url,
+                ttl=settings.AUTH0_JWKS_CACHE_TTL,
+                refresh_margin=settings.AUTH0_JWKS_REFRESH_MARGIN,
+                min_refresh_interval=settings.AUTH0_JWKS_MIN_REFRESH_INTERVAL,
+            )
+        return _stores[url]
@@ -0,0 +1,295 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware records, for each request, the route, the total
+time, the number of SQL queries and the time spent running them, and the
+time spent in the named sections timed with `timer()` ("serialize" and
+"auth" are timed by the API). They're reported in a structured log line,
+optionally with the full query list for slow requests, and optionally in
+a `Server-Timing` header and in the Prometheus text format.
+
+The current request's metrics are kept in a context variable, so the
+async views (whose queries run in other threads) are measured too.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework import serializers
+
+
+logger = logging.getLogger(__name__)
+
+# Queries kept per request for slow request samples
+MAX_SAMPLED_QUERIES = 200
+
+# Upper bounds (in seconds) of the request duration histogram's buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, record_queries=False, clock=time.perf_counter):
+        self.route = None
+        self.query_count = 0
+        self.db_time = 0.0
+        # Time spent in each section timed with `timer()`
+        self.timings = defaultdict(float)
+        self.queries = [] if record_queries else None
+        self._clock = clock
+        self._started = clock()
+        self.duration = None
+
+    def add_query(self, sql, duration):
+        self.query_count += 1
+        self.db_time += duration
+        if self.queries is not None and len(self.queries) < MAX_SAMPLED_QUERIES:
+            self.queries.append({'sql': sql, 'ms': round(duration * 1000, 2)})
+
+    def finish(self):
+        self.duration = self._clock() - self._started
+
+    def server_timing(self):
+        """
+        Returns the metrics as a Server-Timing header value.
+        """
+        entries = [
+            f'total;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+        ]
+        entries += [
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in self.timings.items()
+        ]
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            'route': self.route,
+            'duration_ms': round(self.duration * 1000, 2),
+            'db_queries': self.query_count,
+            'db_ms': round(self.db_time * 1000, 2),
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in self.timings.items()},
+        }
+
+
+def get_current_metrics():
+    """
+    Returns the RequestMetrics for the request being handled, or None.
+    """
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """
+    Adds the time spent in the block to the current request's `name` timing.
+    Does nothing outside of a request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Adds `record_query()` to a connection's execute wrappers. Connections
+    belong to threads, so rather than wrapping the connection for each
+    request, every connection always has the recorder, which only records
+    while a request is being measured.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class MetricsRegistry:
+    """
+    Totals for the `/metrics` endpoint, per route, method and status.
+    Each process keeps its own, so every worker is a separate target.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._sums = defaultdict(float)
+        self._buckets = defaultdict(int)
+
+    def add(self, metrics, method, status):
+        labels = (metrics.route or '', method, str(status))
+        with self._lock:
+            self._requests[labels] += 1
+            self._sums[('request_duration_seconds', labels)] += metrics.duration
+            self._sums[('db_queries', labels)] += metrics.query_count
+            self._sums[('db_duration_seconds', labels)] += metrics.db_time
+            for name, duration in metrics.timings.items():
+                self._sums[(f'{name}_duration_seconds', labels)] += duration
+            for bound in DURATION_BUCKETS:
+                if metrics.duration <= bound:
+                    self._buckets[(bound, labels)] += 1
+
+    @staticmethod
+    def _labels(labels, **extra):
+        route, method, status = labels
+        pairs = {'route': route, 'method': method, 'status': status, **extra}
+        return ','.join(f'{key}={json.dumps(value)}' for key, value in pairs.items())
+
+    def render(self):
+        """
+        Returns the totals in the Prometheus text format.
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            sums = dict(self._sums)
+            buckets = dict(self._buckets)
+
+        lines = [
+            '# TYPE recipes_request_duration_seconds histogram',
+        ]
+        for labels, count in sorted(requests.items()):
+            for bound in DURATION_BUCKETS:
+                lines.append(
+                    f'recipes_request_duration_seconds_bucket{{{self._labels(labels, le=str(bound))}}} '
+                    f'{buckets.get((bound, labels), 0)}'
+                )
+            lines.append(f'recipes_request_duration_seconds_bucket{{{self._labels(labels, le="+Inf")}}} {count}')
+            lines.append(
+                f'recipes_request_duration_seconds_sum{{{self._labels(labels)}}} '
+                f'{sums[("request_duration_seconds", labels)]}'
+            )
+            lines.append(f'recipes_request_duration_seconds_count{{{self._labels(labels)}}} {count}')
+
+        names = sorted({name for name, _ in sums} - {'request_duration_seconds'})
+        for name in names:
+            lines.append(f'# TYPE recipes_{name}_total counter')
+            for (metric, labels), value in sorted(sums.items()):
+                if metric == name:
+                    lines.append(f'recipes_{name}_total{{{self._labels(labels)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
+
+class PerformanceMiddleware:
+    """
+    Measures each request, see the module docstring. Configured with the
+    PERFORMANCE_* settings.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported don't have
+        # the recorder yet.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        metrics = RequestMetrics(record_queries=self.should_sample())
+        return metrics, _current.set(metrics)
+
+    def should_sample(self):
+        return (
+            settings.PERFORMANCE_SLOW_REQUEST_MS > 0
+            and random.random() < settings.PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE
+        )
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        match = request.resolver_match
+        metrics.route = match.view_name if match is not None else None
+
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        if settings.PERFORMANCE_METRICS:
+            registry.add(metrics, request.method, response.status_code)
+
+        slow = (
+            metrics.queries is not None
+            and metrics.duration * 1000 >= settings.PERFORMANCE_SLOW_REQUEST_MS
+        )
+        if slow or logger.isEnabledFor(logging.INFO):
+            line = {'method': request.method, 'status': response.status_code, **metrics.as_dict()}
+            if slow:
+                logger.warning(json.dumps({**line, 'slow': True, 'queries': metrics.queries}))
+            else:
+                logger.info(json.dumps(line))
+        return response
+
+
+class TimedSerializerMixin:
+    """
+    Times building a serializer's `data` as the request's "serialize" timing.
+    """
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class TimedAuthenticationMixin:
+    """
+    Times a DRF view's authentication as the request's "auth" timing.
+    """
+    def perform_authentication(self, request):
+        with timer('auth'):
+            super().perform_authentication(request)
@@ -0,0 +1,195 @@
+"""
+Sends the API's safe reads to read replicas, and everything else to the
+primary (`default`) database.
+
+A request's queries go to a replica when:
+- it's a GET, HEAD or OPTIONS request
+- its route is in REPLICA_READ_ROUTES (the list, detail, can_user_edit,
+  export and recipe-tags endpoints, and their async versions)
+- it hasn't written anything yet, and its user hasn't made a write in the
+  last REPLICA_STICKY_SECONDS
+
+The router marks the request whenever a write goes to the primary,
+whatever the HTTP method (e.g. copy_for_user is a GET). After such a
+request, ReplicaMiddleware records the user in the
+REPLICA_STICKY_CACHE_ALIAS cache, which sends their reads to the primary
+until the entry expires, so a user who just edited a recipe doesn't read
+it back from a replica that hasn't caught up yet, whichever client or
+worker their next request goes through. Queries made outside of a request
+(management commands, signals run by writes) always go to the primary.
+
+Anything stored in a shared cache must be read with `use_primary()`, or
+a lagging replica could put stale data back into the cache right after a
+write invalidated it.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import LazyObject
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+KEY_PREFIX = 'read-primary:'
+
+_current = ContextVar('replica_request', default=None)
+_use_primary = ContextVar('use_primary', default=False)
+
+
+def get_cache():
+    return caches[settings.REPLICA_STICKY_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def get_read_replica():
+    """
+    Returns the replica the current request reads from, or None if it
+    reads from the primary.
+    """
+    request = _current.get()
+    if request is None or request.read_replica is None or request.wrote or _use_primary.get():
+        return None
+    # Routes are only known once the URL has been resolved, so decide on
+    # each query rather than when the request comes in
+    match = request.resolver_match
+    if match is None or match.view_name not in settings.REPLICA_READ_ROUTES:
+        return None
+    if is_sticky(request):
+        return None
+    return request.read_replica
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends the reads made in the block to the primary.
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return get_read_replica()
+
+    def db_for_write(self, model, **hints):
+        request = _current.get()
+        if request is not None:
+            request.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+def get_api_user(request):
+    """
+    Returns the user the API authenticated `request` as, or None before
+    it's been authenticated. DRF and the async views set `request.user`;
+    Django's session based (lazy) user isn't used by the API.
+    """
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, LazyObject) or not user.is_authenticated:
+        return None
+    return user
+
+
+def is_sticky(request):
+    """
+    Returns whether the request's user made a write recently enough that
+    they should read from the primary. Checked once per request.
+    """
+    user = get_api_user(request)
+    if user is None:
+        return False
+    if request.sticky_user_id != user.pk:
+        request.sticky_user_id = user.pk
+        request.sticky = get_cache().get(cache_key(user.pk)) is not None
+    return request.sticky
+
+
+def with_request(content, request):
+    """
+    Wraps a streaming response's content, so the queries made while it's
+    generated are routed like the request's own.
+    """
+    iterator = iter(content)
+    while True:
+        token = _current.set(request)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """
+    Picks a replica for each request that may read from one, and makes
+    its user read from the primary for a while after it writes. Configured with the REPLICA_* settings.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        user = self.written_by(request)
+        if user is not None:
+            get_cache().set(cache_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        user = self.written_by(request)
+        if user is not None:
+            await get_cache().aset(cache_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request.read_replica = None
+        request.wrote = False
+        request.sticky_user_id = request.sticky = None
+        if request.method in SAFE_METHODS and settings.REPLICA_DATABASES:
+            request.read_replica = random.choice(settings.REPLICA_DATABASES)
+        return _current.set(request)
+
+    @staticmethod
+    def written_by(request):
+        """
+        Returns the user who made `request`, if it wrote to the primary.
+        """
+        if not request.wrote:
+            return None
+        return get_api_user(request)
+
+    def finish(self, request, response):
+        if response.streaming and not response.is_async and request.read_replica is not None:
+            response.streaming_content = with_request(response.streaming_content, request)
+        return response
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken',
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'recipes_api.performance.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,9 +60,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'request_logging.middleware.LoggingMiddleware',
 ]
 
+# LoggingMiddleware is sync only, so under ASGI every request (including
+# requests to the async views) would be run through a thread for it.
+# Set DJANGO_REQUEST_LOGGING=false when serving with uvicorn workers.
+if os.getenv('DJANGO_REQUEST_LOGGING', 'true') == 'true':
+    MIDDLEWARE.append('request_logging.middleware.LoggingMiddleware')
+
 CORS_ALLOWED_ORIGINS = [
     'http://127.0.0.1:3000',
     'http://localhost:3000',
@@ -101,6 +108,38 @@ DATABASES = {
     }
 }
 
+# Read replicas, see recipes_api/replicas.py. DJANGO_DB_REPLICA_HOSTS is a
+# comma separated list of replica hosts, which use the primary's other
+# connection settings (and DJANGO_DB_REPLICA_NAME as the database name, if
+# it's set). Safe reads on REPLICA_READ_ROUTES go to a random replica,
+# unless the user made a write in the last REPLICA_STICKY_SECONDS. Recent
+# writers are recorded in the REPLICA_STICKY_CACHE_ALIAS cache; use a
+# shared cache backend when running more than one process.
+REPLICA_DATABASES = []
+for i, host in enumerate(filter(None, os.getenv('DJANGO_DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{i}'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DJANGO_DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{i}')
+REPLICA_READ_ROUTES = os.getenv('DJANGO_REPLICA_READ_ROUTES', ','.join([
+    'recipes-list',
+    'recipes-detail',
+    'recipes-can-user-edit',
+    'recipes-export',
+    'recipe-tags',
+    'async-recipes-list',
+    'async-recipes-detail',
+    'async-recipe-tags',
+])).split(',')
+REPLICA_STICKY_SECONDS = int(os.getenv('DJANGO_REPLICA_STICKY_SECONDS', 10))
+REPLICA_STICKY_CACHE_ALIAS = os.getenv('DJANGO_REPLICA_STICKY_CACHE_ALIAS', 'default')
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['recipes_api.replicas.ReplicaRouter']
+    MIDDLEWARE.append('recipes_api.replicas.ReplicaMiddleware')
+
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -156,6 +195,96 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Page sizes for the recipes list endpoint, when a client asks for a page
+RECIPES_PAGE_SIZE = int(os.getenv('DJANGO_RECIPES_PAGE_SIZE', 50))
+RECIPES_MAX_PAGE_SIZE = int(os.getenv('DJANGO_RECIPES_MAX_PAGE_SIZE', 500))
+
+# Maximum number of ranked results returned by recipe search (`?q=`)
+RECIPES_SEARCH_MAX_RESULTS = int(os.getenv('DJANGO_RECIPES_SEARCH_MAX_RESULTS', 100))
+
+# Maximum number of recipes and of tags returned by recipe autocomplete
+RECIPES_AUTOCOMPLETE_LIMIT = int(os.getenv('DJANGO_RECIPES_AUTOCOMPLETE_LIMIT', 8))
+
+# Bulk recipe requests accept at most RECIPES_BULK_MAX_ITEMS items, and are
+# written in transactions of RECIPES_BULK_BATCH_SIZE items
+RECIPES_BULK_MAX_ITEMS = int(os.getenv('DJANGO_RECIPES_BULK_MAX_ITEMS', 1000))
+RECIPES_BULK_BATCH_SIZE = int(os.getenv('DJANGO_RECIPES_BULK_BATCH_SIZE', 100))
+
+# Number of recipes read from the database cursor (and tagged with one
+# query) at a time by the recipe export
+RECIPES_EXPORT_CHUNK_SIZE = int(os.getenv('DJANGO_RECIPES_EXPORT_CHUNK_SIZE', 500))
+
+# Anonymous recipe detail responses are cached in this CACHES alias for
+# RECIPES_DETAIL_CACHE_TIMEOUT seconds. On a miss, other requests for the
+# same recipe wait up to RECIPES_DETAIL_CACHE_LOCK_TIMEOUT seconds for the
+# first one to fill the cache instead of querying too.
+RECIPES_DETAIL_CACHE_ALIAS = os.getenv('DJANGO_RECIPES_DETAIL_CACHE_ALIAS', 'default')
+RECIPES_DETAIL_CACHE_TIMEOUT = int(os.getenv('DJANGO_RECIPES_DETAIL_CACHE_TIMEOUT', 300))
+RECIPES_DETAIL_CACHE_LOCK_TIMEOUT = int(os.getenv('DJANGO_RECIPES_DETAIL_CACHE_LOCK_TIMEOUT', 10))
+
+# How many recipe slug -> id mappings each process keeps, see recipes/slugs.py
+RECIPES_SLUG_CACHE_SIZE = int(os.getenv('DJANGO_RECIPES_SLUG_CACHE_SIZE', 10000))
+
+# Per-user tag counts (the recipe-tags endpoints) are cached in this CACHES
+# alias for RECIPES_TAG_COUNTS_CACHE_TIMEOUT seconds, and dropped when tags
+# or sharing change. 0 turns the cache off. Use a shared cache backend when
+# running more than one process, so every process sees the invalidations.
+RECIPES_TAG_COUNTS_CACHE_ALIAS = os.getenv('DJANGO_RECIPES_TAG_COUNTS_CACHE_ALIAS', 'default')
+RECIPES_TAG_COUNTS_CACHE_TIMEOUT = int(os.getenv('DJANGO_RECIPES_TAG_COUNTS_CACHE_TIMEOUT', 0))
+
+# How long (in seconds) Auth0's JWKS signing keys are cached for. Keys are
+# refreshed in the background during the last AUTH0_JWKS_REFRESH_MARGIN
+# seconds, and an unknown `kid` triggers at most one refetch per
+# AUTH0_JWKS_MIN_REFRESH_INTERVAL seconds.
+AUTH0_JWKS_CACHE_TTL = int(os.getenv('DJANGO_AUTH0_JWKS_CACHE_TTL', 600))
+AUTH0_JWKS_REFRESH_MARGIN = int(os.getenv('DJANGO_AUTH0_JWKS_REFRESH_MARGIN', 60))
+AUTH0_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('DJANGO_AUTH0_JWKS_MIN_REFRESH_INTERVAL', 30))
+
+# Calls to Auth0 time out after AUTH0_HTTP_CONNECT_TIMEOUT seconds waiting
+# to connect and AUTH0_HTTP_READ_TIMEOUT seconds waiting for a response.
+# After AUTH0_HTTP_FAILURE_THRESHOLD failures in a row, calls fail straight
+# away for AUTH0_HTTP_RESET_TIMEOUT seconds.
+AUTH0_HTTP_CONNECT_TIMEOUT = float(os.getenv('DJANGO_AUTH0_HTTP_CONNECT_TIMEOUT', 3))
+AUTH0_HTTP_READ_TIMEOUT = float(os.getenv('DJANGO_AUTH0_HTTP_READ_TIMEOUT', 5))
+AUTH0_HTTP_POOL_SIZE = int(os.getenv('DJANGO_AUTH0_HTTP_POOL_SIZE', 10))
+AUTH0_HTTP_FAILURE_THRESHOLD = int(os.getenv('DJANGO_AUTH0_HTTP_FAILURE_THRESHOLD', 5))
+AUTH0_HTTP_RESET_TIMEOUT = int(os.getenv('DJANGO_AUTH0_HTTP_RESET_TIMEOUT', 30))
+
+# Verified Auth0 tokens are cached until they expire. LocalTokenCache is a
+# per-process LRU; use DjangoTokenCache with a shared CACHES backend to
+# share entries between gunicorn workers.
+AUTH0_TOKEN_CACHE_BACKEND = os.getenv(
+    'DJANGO_AUTH0_TOKEN_CACHE_BACKEND',
+    'recipes_api.token_cache.LocalTokenCache',
+)
+AUTH0_TOKEN_CACHE_OPTIONS = {
+    'max_size': int(os.getenv('DJANGO_AUTH0_TOKEN_CACHE_MAX_SIZE', 10000)),
+    'alias': os.getenv('DJANGO_AUTH0_TOKEN_CACHE_ALIAS', 'default'),
+}
+
+# Per-request performance instrumentation, see recipes_api/performance.py.
+# Set PERFORMANCE_SERVER_TIMING to send timings to clients in a
+# Server-Timing header. It's off by default, since the header tells any
+# client (anonymous ones included) how many queries a request ran and how
+# long they took. Set PERFORMANCE_SLOW_REQUEST_MS to log the queries of
+# requests slower than that, for a PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE
+# fraction of requests.
+# PERFORMANCE_METRICS serves Prometheus metrics at /metrics.
+PERFORMANCE_SERVER_TIMING = os.getenv('DJANGO_PERFORMANCE_SERVER_TIMING', 'false') == 'true'
+PERFORMANCE_SLOW_REQUEST_MS = int(os.getenv('DJANGO_PERFORMANCE_SLOW_REQUEST_MS', 0))
+PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('DJANGO_PERFORMANCE_SLOW_REQUEST_SAMPLE_RATE', 1))
+PERFORMANCE_METRICS = os.getenv('DJANGO_PERFORMANCE_METRICS', 'false') == 'true'
+
+# Set TRAFFIC_CAPTURE_PATH to record a TRAFFIC_CAPTURE_SAMPLE_RATE fraction
+# of requests as JSON lines, for `manage.py replay_traffic`. See
+# recipes_api/traffic.py.
+TRAFFIC_CAPTURE_PATH = os.getenv('DJANGO_TRAFFIC_CAPTURE_PATH')
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('DJANGO_TRAFFIC_CAPTURE_SAMPLE_RATE', 1))
+if TRAFFIC_CAPTURE_PATH:
+    # Outside PerformanceMiddleware, so writing captures isn't counted in
+    # request timings
+    MIDDLEWARE.insert(0, 'recipes_api.traffic.TrafficCaptureMiddleware')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -170,5 +299,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # Set to INFO to log every request's timings
+        'recipes_api.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('DJANGO_PERFORMANCE_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
     },
 }
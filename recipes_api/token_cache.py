@@ -0,0 +1,92 @@
+"""
+Caches verified Auth0 tokens so that repeat requests carrying the same
+bearer token skip RS256 verification and the `get_or_create` user lookup.
+
+Entries are keyed by a SHA-256 digest of the token (the token itself is
+never stored) and expire at the token's `exp` claim.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class LocalTokenCache:
+    """
+    Bounded, per-process LRU cache.
+    """
+    def __init__(self, max_size=10000, clock=time.time, **kwargs):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoTokenCache:
+    """
+    Stores entries in one of Django's CACHES, so a shared backend
+    (memcached, redis, file based) lets all gunicorn workers share them.
+    Bounding the size is left to the cache backend. There's no `clear()`,
+    since the alias is usually shared with other caches; entries expire
+    with their tokens.
+    """
+    key_prefix = 'auth0-token:'
+
+    def __init__(self, alias='default', clock=time.time, **kwargs):
+        self.cache = caches[alias]
+        self._clock = clock
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, value, expires_at):
+        timeout = int(expires_at - self._clock())
+        if timeout > 0:
+            self.cache.set(self.key_prefix + key, value, timeout)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Returns the token cache configured by the AUTH0_TOKEN_CACHE_* settings.
+    """
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            backend = import_string(settings.AUTH0_TOKEN_CACHE_BACKEND)
+            _token_cache = backend(**settings.AUTH0_TOKEN_CACHE_OPTIONS)
+        return _token_cache
@@ -0,0 +1,97 @@
+"""
+Captures API traffic as JSON lines, for replaying with
+`manage.py replay_traffic`.
+
+Each line records when a request was made, what it was (method, path,
+query string and small JSON bodies), who made it, and how it went. Enable
+it by setting TRAFFIC_CAPTURE_PATH. `{pid}` in the path is replaced with
+the process id, so each worker can write its own file.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+# Request bodies larger than this aren't captured
+MAX_BODY_SIZE = 64 * 1024
+
+
+class TrafficCaptureMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.path = settings.TRAFFIC_CAPTURE_PATH.format(pid=os.getpid())
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, body = time.time(), self.get_body(request)
+        response = self.get_response(request)
+        line = self.capture(request, response, started, body)
+        if line is not None:
+            self.write(line)
+        return response
+
+    async def __acall__(self, request):
+        started, body = time.time(), self.get_body(request)
+        response = await self.get_response(request)
+        line = self.capture(request, response, started, body)
+        if line is not None:
+            # Writing to the file blocks, so keep it off the event loop
+            await sync_to_async(self.write, thread_sensitive=False)(line)
+        return response
+
+    @staticmethod
+    def get_body(request):
+        # Read before the view does, since the body can only be read once
+        if request.content_type != 'application/json':
+            return None
+        if int(request.META.get('CONTENT_LENGTH') or 0) > MAX_BODY_SIZE:
+            return None
+        try:
+            return json.loads(request.body or 'null')
+        except ValueError:
+            return None
+
+    def capture(self, request, response, started, body):
+        """
+        Returns the capture line for a request, or None if it isn't sampled.
+        """
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE_RATE:
+            return None
+        # DRF sets the authenticated user on the underlying request too
+        user = getattr(request, 'user', None)
+        line = json.dumps({
+            'ts': round(started, 6),
+            'method': request.method,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', ''),
+            'body': body,
+            'user': user.pk if user is not None and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round((time.time() - started) * 1000, 3),
+        }, default=str)
+        return line + '\n'
+
+    def write(self, line):
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+
+def read_capture(path):
+    """
+    Yields the requests in a capture file, skipping blank lines.
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -13,12 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from rest_framework import routers
 # from rest_framework.schemas import get_schema_view
 
+from recipes import async_views as recipe_async_views
 from recipes import views as recipe_views
+from recipes_api.performance import metrics_view
 
 router = routers.SimpleRouter()
 router.register(r'recipes', recipe_views.RecipeViewSet, basename='recipes')
@@ -30,6 +33,22 @@ urlpatterns = [
         recipe_views.RecipeTagView.as_view(),
         name='recipe-tags'
     ),
+    # Async versions of the read-only endpoints, for ASGI deployments
+    path(
+        'async/recipes/',
+        recipe_async_views.recipe_list,
+        name='async-recipes-list'
+    ),
+    path(
+        'async/recipes/<str:pk>/',
+        recipe_async_views.recipe_detail,
+        name='async-recipes-detail'
+    ),
+    path(
+        'async/recipe-tags/',
+        recipe_async_views.recipe_tags,
+        name='async-recipe-tags'
+    ),
     # path('openapi', get_schema_view(
     #     title='Recipe Book',
     #     description='API for Recipe Book',
@@ -37,3 +56,6 @@ urlpatterns = [
     # ), name='openapi-schema'),
     path('admin/', admin.site.urls),
 ]
+
+if settings.PERFORMANCE_METRICS:
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
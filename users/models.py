@@ -1,7 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db.models import Q
 
-from recipes.models import Recipe, ShareConfig
+from recipes.models import Recipe, RecipeAccess
 
 
 class User(AbstractUser):
@@ -11,25 +11,26 @@ class User(AbstractUser):
         Recipes with current user.
         Set excludes current user ID.
         """
-        # list of tuples: [(granter_id, grantee_id), (granter_id, grantee_id), ...]
-        user_ids = ShareConfig.objects.filter(
-            Q(granter=self) | Q(grantee=self)
-        ).values_list('granter_id', 'grantee_id')
+        return set(
+            RecipeAccess.objects.filter(user_id=self.id).values_list('author_id', flat=True)
+        )
 
-        return {
-            user_id
-            for sub_list in list(user_ids)
-            for user_id in sub_list
-            if user_id != self.id
-        }
+    def get_recipes(self):
+        """
+        Fetch all Recipes user has access to, taking into consideration
+        recipes that have been shared with the user.
+        Access is resolved in the database, with a single query.
+        """
+        shared_author_ids = RecipeAccess.objects.filter(
+            user_id=self.id
+        ).values('author_id')
+        return Recipe.objects.filter(
+            Q(author_id=self.id) | Q(author_id__in=shared_author_ids)
+        )
 
     def get_recipe_ids(self):
         """
         Fetch IDs of all Recipes user has access to, taking into consideration
         recipes that have been shared with the user.
         """
-        shared_user_ids = self.get_shared_user_ids()
-        recipe_ids = Recipe.objects.filter(
-            author_id__in=[*shared_user_ids, self.id]
-        ).distinct().values_list('id', flat=True)
-        return recipe_ids
+        return self.get_recipes().values_list('id', flat=True)